@@ -0,0 +1,149 @@
+"""
+Activity Buckets
+================
+
+Play time per hour / day / week for the dashboard's activity chart
+(/weekly-data).
+
+One range query reads the end time and length of every session that
+overlaps the range; the bucket edges come from a pandas date_range in the
+user's local time, and the seconds played inside each bucket are computed
+with NumPy in one pass: with F(t) = seconds played before t,
+
+   F(t) = (#starts < t) * t - sum(starts < t) - (#ends < t) * t + sum(ends < t)
+
+evaluated at every edge with searchsorted over sorted start / end times and
+their cumulative sums, and a bucket holds F(right edge) - F(left edge). A
+session is therefore split across the hours (or days) it spans instead of
+landing entirely in the bucket it ended in.
+
+Results are memoized per user, range, granularity and UTC offset until the
+user records a session (invalidate()) or the current bucket rolls over.
+At most `max_entries` results are kept, least recently used dropped first.
+The memo is per process, so with several workers (enabled=False) every
+request is computed from the database.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import shards
+
+
+RANGE_DAYS = (7, 30, 90)
+GRANULARITIES = {"hour": "h", "day": "D", "week": "W-MON"}
+LABEL_FORMATS = {"hour": "%a %H:00", "day": "%a %d", "week": "%d %b"}
+
+
+def bucket_edges(days, granularity, now, utc_offset_minutes=0):
+    """Local-time bucket edges (pandas DatetimeIndex) covering the last `days` days up to now."""
+    local_now = pd.Timestamp(now, unit="s") + pd.Timedelta(minutes=utc_offset_minutes)
+    if granularity == "hour":
+        end = local_now.floor("h") + pd.Timedelta(hours=1)
+        return pd.date_range(end=end, periods=days * 24 + 1, freq="h")
+    today = local_now.normalize()
+    if granularity == "day":
+        return pd.date_range(end=today + pd.Timedelta(days=1), periods=days + 1, freq="D")
+    first_day = today - pd.Timedelta(days=days - 1)
+    start = first_day - pd.Timedelta(days=first_day.dayofweek)  # Monday of that week
+    end = today - pd.Timedelta(days=today.dayofweek) + pd.Timedelta(days=7)
+    return pd.date_range(start=start, end=end, freq="W-MON")
+
+
+def played_seconds(starts, ends, edges):
+    """Seconds of the [start, end) sessions falling in each [edges[i], edges[i+1]) bucket."""
+    starts = np.sort(starts)
+    ends = np.sort(ends)
+    start_sums = np.concatenate(([0], np.cumsum(starts)))
+    end_sums = np.concatenate(([0], np.cumsum(ends)))
+    started = np.searchsorted(starts, edges)
+    ended = np.searchsorted(ends, edges)
+    played_before = started * edges - start_sums[started] - (ended * edges - end_sums[ended])
+    return np.diff(played_before)
+
+
+def compute_activity(conn, user_id, days=7, granularity="day", utc_offset_minutes=0, now=None):
+    """Chart payload for one user: labels, bucket starts and hours played per bucket."""
+    now = time.time() if now is None else now
+    edges = bucket_edges(days, granularity, now, utc_offset_minutes)
+    # Bucket edges as UTC epoch seconds, the unit of the session times below
+    edge_seconds = (edges - pd.Timedelta(minutes=utc_offset_minutes)).asi8 // 10 ** 9
+
+    rows = conn.execute(
+        """
+        SELECT CAST(strftime('%s', played_at) AS INTEGER), play_seconds
+        FROM game_history
+        WHERE user_id = ? AND played_at >= ?
+        """,
+        (user_id, time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(int(edge_seconds[0])))),
+    ).fetchall()
+    sessions = np.array(rows, dtype=np.int64).reshape(-1, 2)
+    ends = sessions[:, 0]
+    seconds = played_seconds(ends - sessions[:, 1], ends, edge_seconds)
+
+    hours = np.round(seconds / 3600, 2)
+    return {
+        "range_days": days,
+        "granularity": granularity,
+        "utc_offset": utc_offset_minutes,
+        "labels": edges[:-1].strftime(LABEL_FORMATS[granularity]).tolist(),
+        "bucket_starts": edges[:-1].strftime("%Y-%m-%dT%H:%M:%S").tolist(),
+        "hours": hours.tolist(),
+        "total_hours": round(float(seconds.sum()) / 3600, 2),
+        "sessions": len(rows),
+    }
+
+
+class ActivityCache:
+    """Memoized compute_activity() per (user, range, granularity, UTC offset)."""
+
+    def __init__(self, db_name, enabled=True, max_entries=100000):
+        self.db_name = db_name
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # (user_id, days, granularity, utc_offset) -> (current bucket, payload)
+        self._generation = {}
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._generation[user_id] = self._generation.get(user_id, 0) + 1
+            for key in [key for key in self._cache if key[0] == user_id]:
+                del self._cache[key]
+
+    def get(self, user_id, days=7, granularity="day", utc_offset_minutes=0, now=None):
+        now = time.time() if now is None else now
+        key = (user_id, days, granularity, utc_offset_minutes)
+        # The last edge moves when the current bucket rolls over
+        current_bucket = bucket_edges(days, granularity, now, utc_offset_minutes)[-1]
+        with self._lock:
+            cached = self._cache.get(key)
+            generation = self._generation.get(user_id, 0)
+            if cached is not None and cached[0] == current_bucket:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        conn = shards.connect(self.db_name, user_id)
+        payload = compute_activity(conn, user_id, days, granularity, utc_offset_minutes, now)
+        conn.close()
+
+        with self._lock:
+            # Skip caching if a session was recorded while we were reading
+            if self.enabled and self._generation.get(user_id, 0) == generation:
+                self._cache[key] = (current_bucket, payload)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return payload
+
+    def stats(self):
+        with self._lock:
+            return {"enabled": self.enabled, "entries": len(self._cache), "hits": self.hits, "misses": self.misses}
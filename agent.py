@@ -0,0 +1,317 @@
+"""
+Headless Monitoring Agent
+=========================
+
+Game detection and session recording without the web app: no Flask,
+Werkzeug, pandas or NumPy are imported, so the agent can run all day on a
+machine that only needs tracking.
+
+A session here is the time game processes are seen running; it ends when
+the last one closes or the agent is stopped. As in the app, its time is
+split between the games running together (monitor_core.attribute_games),
+and a launcher is only charged while no game runs.
+Finished sessions (and, for --server, a detection event whenever a game
+starts, so the server can send game alerts) go to one of two sinks:
+
+   - --db users.db       write straight into the app's SQLite schema, with
+                         crash-safe checkpoints in monitor_journal (the
+                         database must have been created by app.py once)
+   - --server URL        forward to a central server's /api/ingest/events
+                         (the server must have INGEST_TOKEN set; pass the
+                         same value with --token)
+
+Sessions written with --db reach the dashboard's history and totals
+immediately, and its per-game charts with the next change log export
+(analytics.py); the in-memory risk windows and percentile
+sketches of a running app pick them up on its next restart. Use --server
+when the app is running.
+
+Events the sink cannot take (server down, database locked or on an
+unreachable share) wait in an offline spool file (spool.py, --spool) and
+are replayed in batches once the sink is back; --server events always go
+through the spool so a crash mid-request loses nothing.
+
+Usage:
+   python agent.py --user-id 3 --db users.db
+   python agent.py --user-id 3 --server http://192.168.1.10:5000 --token <INGEST_TOKEN>
+"""
+
+import abc
+import argparse
+import gzip
+import json
+import signal
+import sqlite3
+import sys
+import time
+
+import analytics
+import ingest
+import shards
+from games import GameCatalog
+from monitor_core import (
+    attribute_games, charge_games, detect_games_running, game_seconds, list_processes, new_detection_event,
+    new_session_event, record_session, running_games,
+)
+from session_journal import SessionJournal, ensure_schema as ensure_journal_schema
+from spool import EventSpool
+
+
+class SpoolingSink(abc.ABC):
+    """Keeps events the sink could not deliver in an EventSpool and replays them later."""
+
+    def __init__(self, spool, retry_seconds=30.0):
+        self.spool = spool
+        self.retry_seconds = retry_seconds
+        self._retry_at = 0.0
+
+    @abc.abstractmethod
+    def deliver(self, events):
+        """Store or send a batch of events; raise to keep them spooled."""
+
+    def keep_rejected(self, events, rejections):
+        """Move events the sink refused to the spool's dead-letter file."""
+        for rejection in rejections:
+            self.spool.reject(events[rejection["index"]], rejection["error"])
+            print(
+                f"[AGENT] Rejected event {rejection['event_id']} ({rejection['error']}), "
+                f"kept in {self.spool.rejected_path}"
+            )
+
+    def flush(self, now=None):
+        """Replay the spool unless the last attempt failed less than retry_seconds ago."""
+        now = time.time() if now is None else now
+        if now < self._retry_at or not len(self.spool):
+            return
+        report = self.spool.replay(self.deliver)
+        if report["events"]:
+            print(f"[AGENT] Replayed {report['events']} spooled events ({report['events_per_sec']}/s)")
+        if report["error"]:
+            self._retry_at = now + self.retry_seconds
+            print(f"[AGENT ERROR] Replay failed ({report['error']}), {len(self.spool)} events spooled")
+
+
+class SqliteSink(SpoolingSink):
+    """Records sessions into the app database."""
+
+    def __init__(self, db_name, spool, checkpoint_seconds=30.0):
+        super().__init__(spool)
+        # Per-user tables live in shard files once the database is split (see shards.py)
+        checks = [(db_name, {"users", "games"})]
+        checks += [(path, {"user_monitor_stats", "game_history", "game_aggregates"}) for path in shards.databases(db_name)]
+        for path, required in checks:
+            conn = sqlite3.connect(path)
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if not required <= tables:
+                conn.close()
+                raise SystemExit(f"{db_name} has no app schema yet - start app.py once to create it")
+            if "game_history" in required:
+                ensure_journal_schema(conn)
+                analytics.ensure_schema(conn)
+                conn.commit()
+            conn.close()
+
+        self.db_name = db_name
+        self.catalog = GameCatalog(db_name)
+        self.catalog.load()
+        self.journal = SessionJournal(db_name, min_interval=checkpoint_seconds)
+
+    def recover(self, user_id):
+        """Finalize a session journaled by an agent or app that died."""
+        for orphan_user, elapsed, game_name, checkpoint_at, games in self.journal.orphans():
+            if orphan_user != user_id:
+                continue
+            if int(elapsed) <= 0:
+                self.journal.clear(user_id)
+            else:
+                print(f"[AGENT] Recovering {int(elapsed)}s session of {game_name}")
+                event = new_session_event(user_id, game_name, elapsed, checkpoint_at, games=games)
+                self.record(event, recovered=True)
+
+    def checkpoint(self, user_id, elapsed_seconds, game_name, games=None):
+        try:
+            self.journal.checkpoint(user_id, elapsed_seconds, game_name, games=games)
+        except sqlite3.Error as e:
+            print(f"[AGENT ERROR] Checkpoint failed: {e}")
+
+    def deliver(self, events):
+        # Sessions of this machine, checked like record() writes them; anything still refused is kept
+        result = ingest.store_events(self.db_name, events, self.catalog, self.journal, local=True)
+        self.keep_rejected(events, result["rejected"])
+
+    def record(self, event, recovered=False):
+        if event["type"] != "session":
+            return False  # detections only matter to a server that sends alerts
+        try:
+            games = event.get("games") or {event["game_name"]: event["play_seconds"]}
+            game_id, played = charge_games(games, self.catalog.resolve)
+            ended_at = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(event["ended_at"]))
+            conn = shards.connect(self.db_name, event["user_id"])
+            try:
+                if not self.journal.clear(event["user_id"], conn) and recovered:
+                    return False  # already finalized by the app or another agent
+                record_session(conn, event["user_id"], event["play_seconds"], game_id, ended_at, games=played)
+                # Same transaction as the session, like ingest.write_batch, so the analytics store sees it
+                analytics.log_sessions(conn, [(event["user_id"], game_id, seconds, ended_at) for game_id, seconds in played])
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            if recovered:
+                return False  # still journaled; retried on the next start
+            print(f"[AGENT ERROR] Database unavailable ({e}), session spooled")
+            self.spool.append(event)
+            return False
+        return True
+
+
+class HttpSink(SpoolingSink):
+    """Forwards session and detection events to a central server."""
+
+    def __init__(self, server, token, spool, timeout=10.0):
+        super().__init__(spool)
+        self.url = server.rstrip("/") + "/api/ingest/events"
+        self.token = token
+        self.timeout = timeout
+
+    def recover(self, user_id):
+        pass
+
+    def checkpoint(self, user_id, elapsed_seconds, game_name, games=None):
+        pass
+
+    def send(self, events):
+        # Imported here: urllib.request pulls in http.client, email and ssl
+        import urllib.request
+
+        body = gzip.compress(json.dumps({"events": events}).encode("utf-8"))
+        request = urllib.request.Request(
+            self.url,
+            data=body,
+            method="POST",
+            headers={
+                "Content-Type": "application/json",
+                "Content-Encoding": "gzip",
+                "Authorization": f"Bearer {self.token}",
+            },
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def deliver(self, events):
+        self.keep_rejected(events, self.send(events).get("rejected", []))
+
+    def record(self, event):
+        # Spooled first so an event survives a crash while the request is in flight
+        self.spool.append(event)
+        self.flush()
+        return not len(self.spool)
+
+
+class GameSessionTracker:
+    """Turns detection ticks into finished game sessions."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.started_at = None
+        self.session_games = {}
+
+    def elapsed(self, now):
+        return now - self.started_at if self.started_at is not None else 0.0
+
+    def games(self, now):
+        """Process name -> seconds played so far in the running session."""
+        return game_seconds(self.session_games, self.elapsed(now)) if self.started_at is not None else {}
+
+    @property
+    def game_name(self):
+        """Game played longest so far (None between sessions)."""
+        games = {name: seconds for name, (seconds, _) in self.session_games.get("games", {}).items()}
+        return max(games, key=games.get) if games else None
+
+    def finish(self, now):
+        if self.started_at is None:
+            return None
+        games = self.games(now)
+        event = new_session_event(self.user_id, max(games, key=games.get), self.elapsed(now), now, games=games)
+        self.started_at = None
+        self.session_games = {}
+        return event if event["play_seconds"] > 0 else None
+
+    def tick(self, games, now):
+        """
+        Feed the games detected by one poll; returns (finished session event
+        or None, games that started with this poll).
+        """
+        if self.started_at is None:
+            if games:
+                self.started_at = now
+                self.session_games = attribute_games({}, games, 0.0)
+            return None, list(games)
+        if not games:
+            return self.finish(now), []
+        started = [name for name in games if name not in running_games(self.session_games)]
+        self.session_games = attribute_games(self.session_games, games, self.elapsed(now))
+        return None, started
+
+
+def _stop_on_sigterm(signum, frame):
+    raise KeyboardInterrupt
+
+
+def run(sink, user_id, interval=3.0, process_source=list_processes):
+    tracker = GameSessionTracker(user_id)
+    sink.flush()
+    sink.recover(user_id)
+    print(f"[AGENT] Monitoring user {user_id} every {interval:g}s")
+    try:
+        while True:
+            games = detect_games_running(process_source)
+            now = time.time()
+            event, started = tracker.tick(games, now)
+            if event:
+                sink.record(event)
+                print(f"[AGENT] Session recorded: {event['game_name']} {event['play_seconds']}s")
+            for game_name in started:
+                sink.record(new_detection_event(user_id, game_name, now))
+            if tracker.started_at is not None:
+                sink.checkpoint(user_id, tracker.elapsed(now), tracker.game_name, tracker.games(now))
+            sink.flush(now)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        event = tracker.finish(time.time())
+        if event:
+            sink.record(event)
+            print(f"[AGENT] Session recorded: {event['game_name']} {event['play_seconds']}s")
+        if len(sink.spool):
+            print(f"[AGENT] {len(sink.spool)} events left in {sink.spool.path} for the next start")
+        sink.spool.close()
+        print("[AGENT] Stopped")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless game monitoring agent")
+    parser.add_argument("--user-id", type=int, required=True, help="user the sessions belong to")
+    parser.add_argument("--db", default="users.db", help="app database to write to (default: users.db)")
+    parser.add_argument("--server", help="forward sessions to this server instead of writing to --db")
+    parser.add_argument("--token", help="ingest token of the server (INGEST_TOKEN)")
+    parser.add_argument("--interval", type=float, default=3.0, help="seconds between detections (default: 3)")
+    parser.add_argument("--checkpoint", type=float, default=30.0, help="seconds between journal checkpoints (default: 30)")
+    parser.add_argument("--spool", default="agent_spool.bin", help="offline event spool file (default: agent_spool.bin)")
+    parser.add_argument("--spool-mb", type=float, default=4.0, help="spool size in MB (default: 4)")
+    args = parser.parse_args(argv)
+
+    spool = EventSpool(args.spool, capacity_bytes=int(args.spool_mb * 1024 * 1024))
+    if args.server:
+        if not args.token:
+            parser.error("--server needs --token")
+        sink = HttpSink(args.server, args.token, spool)
+    else:
+        sink = SqliteSink(args.db, spool, args.checkpoint)
+
+    signal.signal(signal.SIGTERM, _stop_on_sigterm)
+    run(sink, args.user_id, args.interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+Threshold Alert Scheduler
+=========================
+
+Fires the "play time threshold reached" alert (alert_threshold_minutes in
+user_alert_settings) for every running session without scanning all of
+them on each tick.
+
+   - TimerWheel: hierarchical hashed timer wheel (Varghese & Lauck). Four
+     levels of 64 slots cover 64^4 ticks; scheduling and cancelling are
+     O(1) and a tick only touches the current slot, plus an occasional
+     cascade of higher-level slots into the lower wheels.
+   - ThresholdAlertScheduler: one deadline per user session. start() and
+     resume() arm it from the elapsed time so far, pause() and stop()
+     cancel it, set_threshold() re-arms it after a settings change. Due
+     alerts are handed to the `on_fire(user_id, threshold_minutes)`
+     callback, outside the scheduler lock.
+"""
+
+import math
+import threading
+import time
+
+
+class TimerWheel:
+    """Hierarchical timer wheel keyed by an arbitrary hashable key."""
+
+    SLOT_BITS = 6
+    SLOTS = 1 << SLOT_BITS
+    LEVELS = 4
+
+    def __init__(self, tick_seconds=1.0, start=0.0):
+        self.tick_seconds = tick_seconds
+        self.current = self._to_tick(start)
+        self._wheels = [[{} for _ in range(self.SLOTS)] for _ in range(self.LEVELS)]
+        self._slots = {}
+        self._due = {}
+
+    def __len__(self):
+        return len(self._slots) + len(self._due)
+
+    def _to_tick(self, when):
+        return int(math.ceil(when / self.tick_seconds))
+
+    def _place(self, key, tick):
+        delta = tick - self.current
+        if delta <= 0:
+            self._due[key] = tick
+            self._slots[key] = None
+            return
+        level = 0
+        while level < self.LEVELS - 1 and delta >= 1 << (self.SLOT_BITS * (level + 1)):
+            level += 1
+        # Past the top level: park in the farthest top slot, re-placed when it cascades
+        position = min(tick, self.current + (1 << (self.SLOT_BITS * self.LEVELS)) - 1)
+        slot = (position >> (self.SLOT_BITS * level)) & (self.SLOTS - 1)
+        self._wheels[level][slot][key] = tick
+        self._slots[key] = (level, slot)
+
+    def schedule(self, key, when):
+        """(Re)schedule `key` to expire at time `when` (seconds, same clock as advance())."""
+        self.cancel(key)
+        self._place(key, self._to_tick(when))
+
+    def cancel(self, key):
+        location = self._slots.pop(key, None)
+        if location is None:
+            self._due.pop(key, None)
+        else:
+            level, slot = location
+            self._wheels[level][slot].pop(key, None)
+
+    def _cascade(self, level):
+        slot = (self.current >> (self.SLOT_BITS * level)) & (self.SLOTS - 1)
+        entries = self._wheels[level][slot]
+        self._wheels[level][slot] = {}
+        for key, tick in entries.items():
+            self._place(key, tick)
+
+    def advance(self, now):
+        """Move the wheel to time `now`; returns the keys that expired."""
+        target = int(now // self.tick_seconds)
+        if not self._slots:
+            # Nothing scheduled: jump instead of stepping through every tick (long idle gaps)
+            self.current = max(self.current, target)
+            return []
+        expired = list(self._due)
+        self._due.clear()
+        while self.current < target:
+            self.current += 1
+            # Every lower wheel wrapped: cascade top-down so entries settle in slots not yet passed
+            top = 0
+            while top < self.LEVELS - 1 and not self.current & ((1 << (self.SLOT_BITS * (top + 1))) - 1):
+                top += 1
+            for level in range(top, 0, -1):
+                self._cascade(level)
+            slot = self._wheels[0][self.current & (self.SLOTS - 1)]
+            self._wheels[0][self.current & (self.SLOTS - 1)] = {}
+            expired.extend(slot)
+            expired.extend(self._due)
+            self._due.clear()
+        for key in expired:
+            self._slots.pop(key, None)
+        return expired
+
+
+class ThresholdAlertScheduler:
+    """Per-user play time deadlines on top of a TimerWheel."""
+
+    def __init__(self, on_fire, tick_seconds=1.0, clock=time.time):
+        self.on_fire = on_fire
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._wheel = TimerWheel(tick_seconds, start=clock())
+        # user_id -> {"threshold": minutes, "elapsed": seconds, "since": clock or None, "fired": bool}
+        self._sessions = {}
+
+    def _arm(self, user_id, session):
+        if session["since"] is None or session["fired"] or not session["threshold"]:
+            self._wheel.cancel(user_id)
+            return
+        remaining = session["threshold"] * 60 - session["elapsed"]
+        self._wheel.schedule(user_id, session["since"] + remaining)
+
+    def set_clock(self, clock):
+        """Switch clocks (e.g. to a simulated one); running sessions keep their played time."""
+        with self._lock:
+            now, self.clock = self.clock(), clock
+            self._wheel = TimerWheel(self._wheel.tick_seconds, start=clock())
+            for user_id, session in self._sessions.items():
+                if session["since"] is not None:
+                    session["elapsed"] += now - session["since"]
+                    session["since"] = clock()
+                self._arm(user_id, session)
+
+    def start(self, user_id, threshold_minutes, elapsed_seconds=0.0):
+        """Session started or resumed with `elapsed_seconds` already played."""
+        if not user_id:
+            return
+        with self._lock:
+            session = self._sessions.setdefault(user_id, {"fired": False})
+            session.update(threshold=threshold_minutes, elapsed=elapsed_seconds, since=self.clock())
+            # Already alerted for this session only if it is still past the threshold
+            if not threshold_minutes or elapsed_seconds < threshold_minutes * 60:
+                session["fired"] = False
+            self._arm(user_id, session)
+
+    resume = start
+
+    def pause(self, user_id, elapsed_seconds):
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is not None:
+                session.update(elapsed=elapsed_seconds, since=None)
+                self._arm(user_id, session)
+
+    def stop(self, user_id):
+        with self._lock:
+            self._sessions.pop(user_id, None)
+            self._wheel.cancel(user_id)
+
+    def set_threshold(self, user_id, threshold_minutes):
+        """Settings changed: re-arm, and allow a second alert if the new threshold is still ahead."""
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is None:
+                return
+            played = session["elapsed"]
+            if session["since"] is not None:
+                played += self.clock() - session["since"]
+            session["threshold"] = threshold_minutes
+            if threshold_minutes and played < threshold_minutes * 60:
+                session["fired"] = False
+            self._arm(user_id, session)
+
+    def active_sessions(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def run_pending(self):
+        """Advance to now and fire due alerts. Returns the user ids fired."""
+        with self._lock:
+            fired = []
+            for user_id in self._wheel.advance(self.clock()):
+                session = self._sessions.get(user_id)
+                if session is None or session["fired"] or session["since"] is None:
+                    continue
+                session["fired"] = True
+                fired.append((user_id, session["threshold"]))
+        for user_id, threshold in fired:
+            try:
+                self.on_fire(user_id, threshold)
+            except Exception as e:
+                print(f"[ALERT ERROR] threshold alert for user {user_id}: {e}")
+        return [user_id for user_id, _ in fired]
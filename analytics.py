@@ -0,0 +1,458 @@
+"""
+Analytics Store
+===============
+
+Keeps analytics reads (per-game totals, cohort scans, exports) off the
+tables the monitor and alert paths write to.
+
+   1. every recorded session and logged alert also appends a row to
+      change_log in the same transaction, so the log never disagrees with
+      the tables (each shard has its own change_log)
+   2. ChangeLogConsumer moves the log into a columnar store on disk,
+      partitioned by kind and UTC day, then deletes the rows it consumed:
+         analytics/sessions/2026-10-19/users-1200-1350.json.gz
+      Files are gzip'd JSON holding one list per column (the format of
+      retention.py's archive); once a day has COMPACT_FILES files they are
+      merged into one
+   3. AnalyticsStore reads partitions into pandas DataFrames sorted by user,
+      cached per file (files never change, they are only replaced by merges).
+      At most `max_partitions` (kind, day) partitions stay cached, least
+      recently used dropped first with their files. Only AnalyticsStore
+      imports pandas / NumPy, so writers such as the
+      headless agent (via ingest.py) log changes without them
+
+The app runs the consumer every ANALYTICS_CONSUME_SECONDS (default 5); with
+0 it runs as its own process (`consume --follow`). How far the store is
+behind - the age of the oldest row still in the log - is reported by lag()
+and /api/analytics/store.
+
+Rows written before a database had a change_log (or bulk loaded by
+synthetic.py) are exported once through a 'backfill' row in the log that
+records the highest game_history / alerts_log ids it covers.
+
+A consumer stopped between writing files and deleting the rows exports
+them again on its next run; readers drop duplicates by (log, id, logged_at).
+
+Usage:
+   python analytics.py consume users.db [--follow 5]
+   python analytics.py status users.db
+   python analytics.py games users.db --since 2026-09-01
+   python analytics.py export users.db session sessions.csv --since 2026-09-01 --until 2026-09-30
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import shards
+from retention import read_archive, write_archive
+
+
+# change_log kind -> store folder and the kind-specific column kept
+KINDS = {"session": ("sessions", "seconds"), "alert": ("alerts", "alert_type")}
+KEY_COLUMNS = ("log", "id", "logged_at")
+BATCH_ROWS = 20000
+BACKFILL_ROWS = 200000
+COMPACT_FILES = 32
+
+
+def _utc(epoch):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(epoch))
+
+
+def ensure_schema(conn):
+    """change_log of one database holding per-user tables; a new log queues a backfill of existing rows."""
+    created = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'change_log'").fetchone() is None
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS change_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            game_id INTEGER,
+            seconds INTEGER,
+            detail TEXT,
+            at TEXT NOT NULL,
+            logged_at REAL NOT NULL
+        )
+        """
+    )
+    if created:
+        mark_backfill(conn)
+
+
+def mark_backfill(conn):
+    """Queue the rows now in game_history / alerts_log, which never went through the log, for export."""
+    covered = {table: conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0 for table in ("game_history", "alerts_log")}
+    if any(covered.values()):
+        now = time.time()
+        conn.execute(
+            "INSERT INTO change_log (kind, user_id, detail, at, logged_at) VALUES ('backfill', 0, ?, ?, ?)",
+            (json.dumps(covered), _utc(now), now),
+        )
+
+
+def log_sessions(conn, sessions):
+    """Append (user_id, game_id, seconds, ended_at UTC string) sessions inside the caller's transaction."""
+    now = time.time()
+    conn.executemany(
+        "INSERT INTO change_log (kind, user_id, game_id, seconds, at, logged_at) VALUES ('session', ?, ?, ?, ?, ?)",
+        [(user_id, game_id, int(seconds), at, now) for user_id, game_id, seconds, at in sessions],
+    )
+
+
+def log_alert(conn, user_id, alert_type, game_id, sent_at):
+    """Append one alert inside the caller's transaction."""
+    conn.execute(
+        "INSERT INTO change_log (kind, user_id, game_id, detail, at, logged_at) VALUES ('alert', ?, ?, ?, ?, ?)",
+        (user_id, game_id, alert_type, sent_at, time.time()),
+    )
+
+
+def _log_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _partition_dir(store_dir, kind, day):
+    return os.path.join(store_dir, KINDS[kind][0], day)
+
+
+def _write(store_dir, kind, day, name, rows):
+    """rows: (log, id, logged_at, user_id, game_id, at, seconds | alert_type) tuples."""
+    folder = _partition_dir(store_dir, kind, day)
+    os.makedirs(folder, exist_ok=True)
+    write_archive(os.path.join(folder, name), [*KEY_COLUMNS, "user_id", "game_id", "at", KINDS[kind][1]], rows)
+
+
+class ChangeLogConsumer:
+    """Moves the change_log of every shard into the columnar store."""
+
+    def __init__(self, db_name, store_dir="analytics", batch_rows=BATCH_ROWS):
+        self.db_name = db_name
+        self.store_dir = store_dir
+        self.batch_rows = batch_rows
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.rows = 0
+        self.last_run_at = None
+
+    def consume(self, user_id=None):
+        """Drain every change_log once (only the user's shard with `user_id`). Returns a report dict."""
+        started = time.perf_counter()
+        report = {"rows": 0, "backfilled": 0, "files": 0, "merged": 0}
+        paths = shards.databases(self.db_name) if user_id is None else [shards.router(self.db_name).path_of(user_id)]
+        with self._lock:
+            for path in paths:
+                conn = sqlite3.connect(path, timeout=30)
+                try:
+                    self._drain(conn, _log_name(path), report)
+                finally:
+                    conn.close()
+            self.runs += 1
+            self.rows += report["rows"] + report["backfilled"]
+            self.last_run_at = time.time()
+        report["duration_seconds"] = round(time.perf_counter() - started, 3)
+        return report
+
+    def _drain(self, conn, log, report):
+        touched = set()
+        while True:
+            rows = conn.execute(
+                "SELECT id, kind, user_id, game_id, seconds, detail, at, logged_at FROM change_log ORDER BY id LIMIT ?",
+                (self.batch_rows,),
+            ).fetchall()
+            if not rows:
+                break
+            partitions = {}
+            for row_id, kind, user_id, game_id, seconds, detail, at, logged_at in rows:
+                if kind == "backfill":
+                    report["backfilled"] += self._backfill(conn, log, row_id, json.loads(detail), logged_at, touched)
+                    continue
+                value = seconds if kind == "session" else detail
+                partitions.setdefault((kind, at[:10]), []).append((log, row_id, logged_at, user_id, game_id, at, value))
+            name = f"{log}-{rows[0][0]}-{rows[-1][0]}.json.gz"
+            for (kind, day), part in partitions.items():
+                _write(self.store_dir, kind, day, name, part)
+                report["rows"] += len(part)
+                report["files"] += 1
+                touched.add((kind, day))
+            # Only after the files are in place: a crash in between exports these rows twice, never zero times
+            conn.execute("DELETE FROM change_log WHERE id <= ?", (rows[-1][0],))
+            conn.commit()
+            if len(rows) < self.batch_rows:
+                break
+        for kind, day in touched:
+            report["merged"] += self._merge(kind, day)
+
+    def _backfill(self, conn, log, marker_id, covered, logged_at, touched):
+        """Export rows up to the marker's ids; their keys are the negated source ids."""
+        queries = {
+            "session": ("game_history", "SELECT id, user_id, game_id, played_at, play_seconds FROM game_history"),
+            "alert": ("alerts_log", "SELECT id, user_id, game_id, sent_at, alert_type FROM alerts_log"),
+        }
+        exported = 0
+        for kind, (table, query) in queries.items():
+            after = 0
+            while True:
+                rows = conn.execute(
+                    f"{query} WHERE id > ? AND id <= ? ORDER BY id LIMIT ?", (after, covered.get(table, 0), BACKFILL_ROWS)
+                ).fetchall()
+                if not rows:
+                    break
+                partitions = {}
+                for row_id, user_id, game_id, at, value in rows:
+                    partitions.setdefault(at[:10], []).append((log, -row_id, logged_at, user_id, game_id, at, value))
+                for day, part in partitions.items():
+                    _write(self.store_dir, kind, day, f"{log}-backfill{marker_id}-{after}.json.gz", part)
+                    touched.add((kind, day))
+                exported += len(rows)
+                after = rows[-1][0]
+        return exported
+
+    def _merge(self, kind, day):
+        """Merge a day's files into one once there are COMPACT_FILES of them."""
+        folder = _partition_dir(self.store_dir, kind, day)
+        names = sorted(name for name in os.listdir(folder) if name.endswith(".json.gz"))
+        if len(names) < COMPACT_FILES:
+            return 0
+        merged, seen = [], set()
+        for name in names:
+            columns = read_archive(os.path.join(folder, name))
+            for row in zip(*columns.values()):
+                if row[:3] not in seen:
+                    seen.add(row[:3])
+                    merged.append(row)
+        # Written before the originals go, so readers never miss rows (duplicates are dropped on read)
+        write_archive(os.path.join(folder, f"merged-{time.time_ns()}.json.gz"), list(columns), merged)
+        for name in names:
+            try:
+                os.remove(os.path.join(folder, name))
+            except FileNotFoundError:
+                pass  # merged by another consumer
+        return len(names)
+
+    def pending(self, user_id):
+        """True if the user's shard change_log holds rows of the user not exported yet."""
+        conn = sqlite3.connect(shards.router(self.db_name).path_of(user_id))
+        try:
+            return conn.execute("SELECT 1 FROM change_log WHERE user_id = ? LIMIT 1", (user_id,)).fetchone() is not None
+        finally:
+            conn.close()
+
+    def lag(self):
+        """Rows still in the change logs and the age of the oldest one, in seconds."""
+        pending, oldest = 0, None
+        for path in shards.databases(self.db_name):
+            conn = sqlite3.connect(path)
+            try:
+                count = conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0]
+                first = conn.execute("SELECT logged_at FROM change_log ORDER BY id LIMIT 1").fetchone()
+            finally:
+                conn.close()
+            pending += count
+            if first is not None:
+                oldest = first[0] if oldest is None else min(oldest, first[0])
+        return {"pending": pending, "lag_seconds": round(max(0.0, time.time() - oldest), 3) if oldest else 0.0}
+
+    def stats(self):
+        return {"runs": self.runs, "rows": self.rows, "last_run_at": self.last_run_at}
+
+
+class AnalyticsStore:
+    """Read side: partitions of the columnar store as DataFrames sorted by user_id."""
+
+    def __init__(self, store_dir="analytics", max_partitions=800):
+        self.store_dir = store_dir
+        self.max_partitions = max_partitions
+        self._lock = threading.Lock()
+        self._files = {}
+        self._partitions = OrderedDict()
+        self._day_totals = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _forget_files(self, folder, keep=()):
+        for path in [path for path in self._files if os.path.dirname(path) == folder]:
+            if os.path.basename(path) not in keep:
+                del self._files[path]
+
+    def _evict(self):
+        """Drop least recently used partitions (with their files and day totals) beyond max_partitions."""
+        while len(self._partitions) > self.max_partitions:
+            (kind, day), _ = self._partitions.popitem(last=False)
+            self._forget_files(_partition_dir(self.store_dir, kind, day))
+            if kind == "session":
+                self._day_totals.pop(day, None)
+            self.evictions += 1
+
+    def days(self, kind):
+        folder = os.path.join(self.store_dir, KINDS[kind][0])
+        return sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+
+    def _file(self, path):
+        import pandas as pd
+
+        frame = self._files.get(path)
+        if frame is None:
+            frame = pd.DataFrame(read_archive(path))
+            frame["game_id"] = frame["game_id"].astype("Int64")
+            self._files[path] = frame
+        return frame
+
+    def partition(self, kind, day):
+        import pandas as pd
+
+        folder = _partition_dir(self.store_dir, kind, day)
+        while True:
+            names = tuple(sorted(name for name in os.listdir(folder) if name.endswith(".json.gz")))
+            with self._lock:
+                cached = self._partitions.get((kind, day))
+                if cached is not None and cached[0] == names:
+                    self._partitions.move_to_end((kind, day))
+                    self.hits += 1
+                    return cached[1]
+                try:
+                    frames = [self._file(os.path.join(folder, name)) for name in names]
+                except FileNotFoundError:
+                    continue  # merged while we listed; list again
+                self.misses += 1
+                self._forget_files(folder, names)
+                frame = pd.concat(frames, ignore_index=True).drop_duplicates(list(KEY_COLUMNS))
+                frame = frame.sort_values("user_id", kind="stable", ignore_index=True)
+                self._partitions[(kind, day)] = (names, frame)
+                self._partitions.move_to_end((kind, day))
+                self._evict()
+                return frame
+
+    def frame(self, kind, since=None, until=None, user_id=None):
+        """Rows of `kind` for UTC days since..until (inclusive, YYYY-MM-DD), optionally one user's."""
+        import numpy as np
+        import pandas as pd
+
+        parts = []
+        for day in self.days(kind):
+            if (since and day < since) or (until and day > until):
+                continue
+            part = self.partition(kind, day)
+            if user_id is not None:
+                users = part["user_id"].to_numpy()
+                part = part.iloc[np.searchsorted(users, user_id, "left"):np.searchsorted(users, user_id, "right")]
+            parts.append(part)
+        if not parts:
+            columns = [*KEY_COLUMNS, "user_id", "game_id", "at", KINDS[kind][1]]
+            return pd.DataFrame({column: [] for column in columns})
+        return pd.concat(parts, ignore_index=True)
+
+    def _totals_of_day(self, day):
+        """Per (user, game) seconds / sessions / last play of one day, as arrays sorted by user."""
+        import numpy as np
+
+        frame = self.partition("session", day)
+        with self._lock:
+            cached = self._day_totals.get(day)
+            if cached is not None and cached[0] is frame:
+                return cached[1]
+        grouped = frame[frame["game_id"].notna()].groupby(["user_id", "game_id"]).agg(
+            seconds=("seconds", "sum"), sessions=("seconds", "size"), last=("at", "max")
+        ).reset_index()
+        totals = {
+            "user_id": grouped["user_id"].to_numpy(np.int64),
+            "game_id": grouped["game_id"].to_numpy(np.int64),
+            "seconds": grouped["seconds"].to_numpy(np.int64),
+            "sessions": grouped["sessions"].to_numpy(np.int64),
+            "last": grouped["last"].to_numpy(object),
+        }
+        with self._lock:
+            # Only while its partition is cached, so evicting the partition frees both
+            if ("session", day) in self._partitions:
+                self._day_totals[day] = (frame, totals)
+        return totals
+
+    def game_totals(self, user_id=None, since=None, until=None):
+        """Per-game seconds, sessions and last play (one user or everyone), most played first."""
+        import numpy as np
+        import pandas as pd
+
+        days = [self._totals_of_day(day) for day in self.days("session")
+                if not (since and day < since) and not (until and day > until)]
+        if user_id is not None:
+            # A few rows per day: slice each day's arrays instead of filtering frames
+            bounds = [(np.searchsorted(day["user_id"], user_id, "left"), np.searchsorted(day["user_id"], user_id, "right"))
+                      for day in days]
+            days = [{name: values[low:high] for name, values in day.items()} for day, (low, high) in zip(days, bounds) if high > low]
+        rows = {name: np.concatenate([day[name] for day in days]) for name in ("game_id", "seconds", "sessions", "last")} if days else {
+            "game_id": np.zeros(0, np.int64), "seconds": np.zeros(0, np.int64), "sessions": np.zeros(0, np.int64), "last": np.zeros(0, object)
+        }
+        # NumPy instead of DataFrame.groupby: its fixed overhead is most of a one-user query
+        game_ids, group = np.unique(rows["game_id"], return_inverse=True)
+        order = np.lexsort((rows["last"], group))
+        last_of_group = np.r_[np.flatnonzero(np.diff(group[order])), len(order) - 1] if len(order) else order
+        totals = pd.DataFrame({
+            "game_id": game_ids,
+            "total_seconds": np.bincount(group, rows["seconds"], len(game_ids)).astype(np.int64),
+            "session_count": np.bincount(group, rows["sessions"], len(game_ids)).astype(np.int64),
+            "last_played": rows["last"][order][last_of_group],
+        })
+        return totals.sort_values("total_seconds", ascending=False, kind="stable", ignore_index=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "partitions": len(self._partitions),
+                "max_partitions": self.max_partitions,
+                "files": len(self._files),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar analytics store fed by the change log")
+    parser.add_argument("command", choices=("consume", "status", "games", "export"))
+    parser.add_argument("db", help="app database (users.db)")
+    parser.add_argument("kind", nargs="?", choices=tuple(KINDS), help="for export: session or alert")
+    parser.add_argument("out", nargs="?", help="for export: CSV file to write")
+    parser.add_argument("--store", default=os.environ.get("ANALYTICS_STORE_DIR", "analytics"))
+    parser.add_argument("--follow", type=float, help="keep consuming every N seconds")
+    parser.add_argument("--since", help="first UTC day, YYYY-MM-DD")
+    parser.add_argument("--until", help="last UTC day, YYYY-MM-DD")
+    args = parser.parse_args(argv)
+
+    consumer = ChangeLogConsumer(args.db, args.store)
+    store = AnalyticsStore(args.store)
+    if args.command == "consume":
+        while True:
+            report = consumer.consume()
+            if report["rows"] or report["backfilled"] or not args.follow:
+                print(f"[ANALYTICS] {report['rows']} changes, {report['backfilled']} backfilled rows, "
+                      f"{report['files']} files in {report['duration_seconds']}s")
+            if not args.follow:
+                break
+            time.sleep(args.follow)
+    elif args.command == "status":
+        print(json.dumps(dict(consumer.lag(), sessions_days=len(store.days("session")), alerts_days=len(store.days("alert"))), indent=2))
+    elif args.command == "games":
+        totals = store.game_totals(since=args.since, until=args.until)
+        conn = sqlite3.connect(args.db)
+        titles = dict(conn.execute("SELECT id, title FROM games"))
+        conn.close()
+        totals.insert(1, "title", totals["game_id"].map(titles))
+        print(totals.to_string(index=False))
+    else:
+        if not args.kind or not args.out:
+            parser.error("export needs a kind (session / alert) and an output file")
+        frame = store.frame(args.kind, args.since, args.until)
+        frame.sort_values("at").to_csv(args.out, index=False)
+        print(f"[ANALYTICS] Exported {len(frame)} {KINDS[args.kind][0]} to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,40 @@
 from flask import Flask, render_template, request, redirect, session, url_for, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import timedelta
 import sqlite3
 import time
 import threading
-import subprocess
-import csv
-import io
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
+import subprocess
+import sys
+import gzip
+import hmac
+import json
+from monitor_state import create_monitor_state, NO_GAME_TITLE
+from monitor_core import (
+    attribute_games, charge_games, detect_games_running, game_seconds, list_processes, new_session_event, record_session,
+    running_games,
+)
+from password_pool import PasswordHasher, HashPoolBusy
+from model import DatabaseRiskScorer, GameAddictionAnalyzer, RollingRiskScorer
+from sketches import PopulationSketches
+from games import GameCatalog, ensure_schema as ensure_games_schema, migrate_game_names
+from retention import RetentionEngine
+import reports
+import risk_snapshots
+import search
+import shards
+import analytics
+from recent_sessions import RecentSessions
+from settings_cache import SettingsCache
+from activity import ActivityCache, GRANULARITIES, RANGE_DAYS, bucket_edges
+from session_journal import SessionJournal, ensure_schema as ensure_journal_schema
+from alert_scheduler import ThresholdAlertScheduler
+import ingest
+from spool import EventSpool
+from http_cache import DataVersions, StaticAssets, IMMUTABLE_MAX_AGE, compress_response, not_modified
 
 app = Flask(__name__)
 app.secret_key = "change_this_secret_key"
@@ -18,33 +42,23 @@ app.permanent_session_lifetime = timedelta(days=7)
 
 DB_NAME = "users.db"
 
-# Monitoring state (shared for app + floating bar)
-_monitor_lock = threading.Lock()
-_monitor_started_at = None
-_monitor_elapsed_seconds = 0.0
-_monitor_running = False
+# Monitoring state (shared for app + floating bar, and across server workers)
+# MONITOR_STATE_BACKEND: memory (default), mmap or sqlite - see monitor_state.py
+_monitor_state = None
 _monitor_event_hook = None
-_monitor_user_id = None
-_game_detected = False
-_game_title = "No game detected"
-_session_game_name = None
-
-GAME_KEYWORDS = (
-    "steam",
-    "epicgameslauncher",
-    "riotclientservices",
-    "valorant",
-    "leagueclient",
-    "dota2",
-    "cs2",
-    "csgo",
-    "fortnite",
-    "minecraft",
-    "roblox",
-    "gta",
-    "fifa",
-    "efootball",
-    "pubg",
+
+# Clock and process list behind the monitor; set_monitor_sources() swaps in
+# simulated ones (see synthetic.py), in which case the caller drives the polls
+_clock = time.time
+_process_source = list_processes
+_monitor_simulated = False
+MONITOR_POLL_SECONDS = 3
+
+# Password hashing runs on a bounded pool - see password_pool.py
+_password_hasher = PasswordHasher(
+    os.environ.get("PASSWORD_HASH_METHOD"),
+    max_workers=int(os.environ.get("PASSWORD_HASH_WORKERS", "2")),
+    max_pending=int(os.environ.get("PASSWORD_HASH_QUEUE", "32")),
 )
 
 
@@ -55,6 +69,11 @@ GAME_KEYWORDS = (
 def init_db():
     conn = sqlite3.connect(DB_NAME)
     c = conn.cursor()
+    # Lets the retention job hand freed pages back to the OS (only applies to new databases)
+    c.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    ensure_games_schema(conn)
+    risk_snapshots.ensure_schema(conn)
+    shards.ensure_schema(conn)
     c.execute(
         """
         CREATE TABLE IF NOT EXISTS users (
@@ -65,6 +84,19 @@ def init_db():
         )
         """
     )
+    search.ensure_games_schema(conn)
+    conn.commit()
+    conn.close()
+    # Per-user tables live in users.db until it is split into shards (see shards.py)
+    for shard in range(len(shards.databases(DB_NAME))):
+        _init_user_tables(shards.connect_shard(DB_NAME, shard))
+    _game_catalog.load()
+
+
+def _init_user_tables(conn):
+    c = conn.cursor()
+    ensure_journal_schema(conn)
+    ingest.ensure_schema(conn)
     c.execute(
         """
         CREATE TABLE IF NOT EXISTS user_monitor_stats (
@@ -82,10 +114,11 @@ def init_db():
         CREATE TABLE IF NOT EXISTS game_history (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER NOT NULL,
-            game_name TEXT NOT NULL,
+            game_id INTEGER NOT NULL,
             play_seconds INTEGER NOT NULL,
             played_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(user_id) REFERENCES users(id)
+            FOREIGN KEY(user_id) REFERENCES users(id),
+            FOREIGN KEY(game_id) REFERENCES games(id)
         )
         """
     )
@@ -111,19 +144,131 @@ def init_db():
             user_id INTEGER NOT NULL,
             alert_type TEXT NOT NULL,
             message TEXT NOT NULL,
-            game_name TEXT,
+            game_id INTEGER,
             sent_via TEXT,
             sent_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(user_id) REFERENCES users(id)
+            FOREIGN KEY(user_id) REFERENCES users(id),
+            FOREIGN KEY(game_id) REFERENCES games(id)
+        )
+        """
+    )
+    # Per-game daily totals: a session adds to the row of every game it ran (monitor_core.charge_games),
+    # the same split as the analytics store's session rows. Kept next to the store for reports.py, whose
+    # pool workers read a week of top games for a chunk of users in one indexed query.
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS game_aggregates (
+            user_id INTEGER NOT NULL,
+            game_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            total_seconds INTEGER NOT NULL DEFAULT 0,
+            session_count INTEGER NOT NULL DEFAULT 0,
+            last_played TEXT,
+            PRIMARY KEY (user_id, game_id, day),
+            FOREIGN KEY(user_id) REFERENCES users(id),
+            FOREIGN KEY(game_id) REFERENCES games(id)
         )
         """
     )
+    # Convert tables created before the games dimension existed (game_name text -> game_id)
+    migrate_game_names(conn, _game_catalog)
+    # After the migration, which may have recreated alerts_log (and dropped its triggers)
+    search.ensure_alerts_schema(conn)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_game_history_user ON game_history(user_id, played_at)")
+    # Used by the retention job to find aged rows without a full scan
+    c.execute("CREATE INDEX IF NOT EXISTS idx_game_history_played_at ON game_history(played_at)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_alerts_log_sent_at ON alerts_log(sent_at)")
+    # Was for the risk snapshot, which now sums game_history; reports.py filters by user (primary key)
+    c.execute("DROP INDEX IF EXISTS idx_game_aggregates_day")
+    # Backfill per-game daily aggregates for databases created before the table existed. Sessions from
+    # then ran one game each, so one game_history row per session is already one row per game.
+    c.execute("SELECT 1 FROM game_aggregates LIMIT 1")
+    if c.fetchone() is None:
+        c.execute(
+            """
+            INSERT INTO game_aggregates (user_id, game_id, day, total_seconds, session_count, last_played)
+            SELECT user_id, game_id, date(played_at), SUM(play_seconds), COUNT(*), MAX(played_at)
+            FROM game_history GROUP BY user_id, game_id, date(played_at)
+            """
+        )
+    # After the tables it backfills from
+    analytics.ensure_schema(conn)
     conn.commit()
     conn.close()
 
 
+# Game titles / process aliases cached in memory (see games.py)
+_game_catalog = GameCatalog(DB_NAME)
 init_db()
 
+_monitor_state = create_monitor_state(
+    os.environ.get("MONITOR_STATE_BACKEND", "memory"),
+    DB_NAME,
+    os.environ.get("MONITOR_STATE_PATH"),
+)
+
+# Periodic checkpoints of running sessions so a crash loses at most one interval
+_session_journal = SessionJournal(
+    DB_NAME, min_interval=float(os.environ.get("MONITOR_CHECKPOINT_SECONDS", "30")), clock=_clock
+)
+
+# Finished sessions wait here while the database cannot be written, replayed in batches
+_event_spool = EventSpool(
+    os.environ.get("SPOOL_PATH", "event_spool.bin"),
+    capacity_bytes=int(float(os.environ.get("SPOOL_CAPACITY_MB", "4")) * 1024 * 1024),
+)
+
+# Last sessions of each user in fixed-size arrays, for history lists and sparklines.
+# Buffers are per process, so they are off (capacity 0) unless one worker serves the app.
+_recent_sessions = RecentSessions(
+    DB_NAME,
+    capacity=int(os.environ.get(
+        "RECENT_SESSIONS_CAPACITY", "32" if os.environ.get("MONITOR_STATE_BACKEND", "memory") == "memory" else "0"
+    )),
+    max_users=int(os.environ.get("RECENT_SESSIONS_MAX_USERS", "100000")),
+)
+
+# Alert settings, recipient addresses and the SMTP config for the alert path.
+# Per process like the buffers above, so users are only cached with the memory backend.
+_settings_cache = SettingsCache(
+    DB_NAME,
+    max_users=int(os.environ.get(
+        "SETTINGS_CACHE_MAX_USERS", "100000" if os.environ.get("MONITOR_STATE_BACKEND", "memory") == "memory" else "0"
+    )),
+)
+
+# Rolling 24h/7d/30d windows of game sessions, rebuilt from game_history.
+# Per process, so other backends read each user's windows from game_history instead.
+if os.environ.get("MONITOR_STATE_BACKEND", "memory") == "memory":
+    _risk_scorer = RollingRiskScorer()
+    _risk_scorer.load_from_db(DB_NAME)
+else:
+    _risk_scorer = DatabaseRiskScorer(DB_NAME)
+
+# Optional learned model trained with `python classifier.py train users.db risk_model.bin`
+_risk_model = None
+_risk_model_path = os.environ.get("RISK_MODEL_PATH", "risk_model.bin")
+if os.path.exists(_risk_model_path):
+    from classifier import RiskClassifier
+    try:
+        _risk_model = RiskClassifier.load(_risk_model_path)
+    except ValueError as e:
+        print(f"[RISK MODEL] not loaded: {e}")
+
+_analyzer = GameAddictionAnalyzer(scorer=_risk_scorer, model=_risk_model)
+
+# Population quantile sketches for percentile ranking (see sketches.py)
+_population_sketches = PopulationSketches(DB_NAME)
+_population_sketches.load()
+
+# Per-user data versions behind ETag / Last-Modified (see http_cache.py).
+# Counters are per process, so JSON 304s are only on for the single-worker memory backend.
+_data_versions = DataVersions()
+_conditional_get = os.environ.get(
+    "HTTP_CONDITIONAL_GET", "1" if os.environ.get("MONITOR_STATE_BACKEND", "memory") == "memory" else "0"
+) == "1"
+_static_assets = StaticAssets(app.static_folder)
+
 
 def set_monitor_event_hook(callback):
     """Register desktop-side callback for monitoring events."""
@@ -134,24 +279,27 @@ def set_monitor_event_hook(callback):
 def _dispatch_monitor_event(event_name):
     if callable(_monitor_event_hook):
         try:
+            state = _monitor_state.load()
             _monitor_event_hook(
                 event_name,
                 {
-                    "status": "running" if _monitor_running else "paused",
-                    "elapsed_seconds": int(_get_elapsed_seconds()),
-                    "game_detected": _game_detected,
-                    "game_title": _game_title,
+                    "status": "running" if state["running"] else "paused",
+                    "elapsed_seconds": int(_get_elapsed_seconds(state)),
+                    "game_detected": state["game_detected"],
+                    "game_title": state["game_title"],
                 },
             )
         except Exception:
             pass
 
 
-def _get_elapsed_seconds():
-    with _monitor_lock:
-        if _monitor_running and _monitor_started_at is not None:
-            return _monitor_elapsed_seconds + (time.monotonic() - _monitor_started_at)
-        return _monitor_elapsed_seconds
+def _get_elapsed_seconds(state=None):
+    # started_at is wall-clock time so every worker process can compute it
+    if state is None:
+        state = _monitor_state.load()
+    if state["running"] and state["started_at"] is not None:
+        return state["elapsed_seconds"] + max(0.0, _clock() - state["started_at"])
+    return state["elapsed_seconds"]
 
 
 def _format_elapsed(seconds):
@@ -162,52 +310,58 @@ def _format_elapsed(seconds):
     return f"{hours:02d}:{minutes:02d}:{sec:02d}"
 
 
-def _detect_game_running():
-    """
-    Best-effort game process detection on Windows using tasklist output.
-    """
-    try:
-        output = subprocess.check_output(
-            ["tasklist", "/fo", "csv", "/nh"],
-            text=True,
-            encoding="utf-8",
-            errors="ignore",
-        )
-        reader = csv.reader(io.StringIO(output))
-        for row in reader:
-            if not row:
-                continue
-            process_name = row[0].strip().lower()
-            for keyword in GAME_KEYWORDS:
-                if keyword in process_name:
-                    return True, process_name
-        return False, "No game detected"
-    except Exception:
-        return False, "No game detected"
+def _monitor_detection_step():
+    """One poll: refresh the detected games, charge them the interval and checkpoint the session."""
+    if not _monitor_state.load()["running"]:
+        return
+
+    games = detect_games_running(_process_source)
+    detected = bool(games)
+    title = ", ".join(sorted(games)) if detected else NO_GAME_TITLE
+
+    def apply_detection(state):
+        # Compare against the shared state so only one worker reacts to a change
+        if not state["running"]:
+            return False, [], None
+        running = running_games(state["session_games"])
+        started = [name for name in games if name not in running]
+        state["session_games"] = attribute_games(state["session_games"], games, _get_elapsed_seconds(state))
+        changed = (detected != state["game_detected"]) or (detected and title != state["game_title"])
+        if changed:
+            state["game_detected"] = detected
+            state["game_title"] = title
+            if detected:
+                state["session_game_name"] = games[0]
+        return changed, started, state["user_id"]
+
+    changed, started, user_id = _monitor_state.update(apply_detection)
+    # Trigger alert when a game is detected
+    for game_name in started:
+        _trigger_game_alert(user_id, game_name)
+    if changed:
+        _dispatch_monitor_event("game_on" if detected else "game_off")
+
+    observed_at = _clock()
+    state = _monitor_state.load()
+    if state["running"]:
+        try:
+            elapsed = _get_elapsed_seconds(state)
+            _session_journal.checkpoint(
+                state["user_id"], elapsed, state["session_game_name"], observed_at=observed_at,
+                games=game_seconds(state["session_games"], elapsed),
+            )
+        except sqlite3.Error as e:
+            print(f"[JOURNAL ERROR] {e}")
 
 
 def _monitor_detection_worker():
-    global _game_detected, _game_title, _session_game_name
     while True:
-        time.sleep(3)
-        with _monitor_lock:
-            running = _monitor_running
-        if not running:
-            continue
-
-        detected, title = _detect_game_running()
-        changed = (detected != _game_detected) or (detected and title != _game_title)
-        if changed:
-            _game_detected = detected
-            _game_title = title
-            if detected:
-                _session_game_name = title
-                # Trigger alert when game is detected
-                _trigger_game_alert(_monitor_user_id, title)
-            _dispatch_monitor_event("game_on" if detected else "game_off")
+        time.sleep(MONITOR_POLL_SECONDS)
+        if not _monitor_simulated:
+            _monitor_detection_step()
 
 
-def get_user_monitor_stats(user_id):
+def get_user_monitor_stats(user_id, conn=None):
     if not user_id:
         return {
             "total_play_seconds": 0,
@@ -216,14 +370,16 @@ def get_user_monitor_stats(user_id):
             "total_play_time_display": "00:00:00",
         }
 
-    conn = sqlite3.connect(DB_NAME)
+    own_conn = conn is None
+    conn = conn or shards.connect(DB_NAME, user_id)
     c = conn.cursor()
     c.execute(
         "SELECT total_play_seconds, total_sessions, last_session_seconds FROM user_monitor_stats WHERE user_id=?",
         (user_id,),
     )
     row = c.fetchone()
-    conn.close()
+    if own_conn:
+        conn.close()
 
     if not row:
         return {
@@ -241,81 +397,255 @@ def get_user_monitor_stats(user_id):
     }
 
 
-def _record_monitor_session(user_id, elapsed_seconds, game_name=None):
-    if not user_id or elapsed_seconds <= 0:
-        return
-
-    conn = sqlite3.connect(DB_NAME)
+def get_game_history(user_id, limit=20, conn=None):
+    """Most recent game sessions of a user."""
+    if limit <= _recent_sessions.capacity:
+        return [
+            {
+                "game_name": _game_catalog.title(game_id),
+                "play_time": _format_elapsed(play_seconds),
+                "played_at": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(ended_at)),
+            }
+            for ended_at, game_id, play_seconds in _recent_sessions.recent(user_id, limit)
+        ]
+
+    own_conn = conn is None
+    conn = conn or shards.connect(DB_NAME, user_id)
     c = conn.cursor()
     c.execute(
-        """
-        INSERT INTO user_monitor_stats (user_id, total_play_seconds, total_sessions, last_session_seconds, updated_at)
-        VALUES (?, ?, 1, ?, CURRENT_TIMESTAMP)
-        ON CONFLICT(user_id) DO UPDATE SET
-            total_play_seconds = total_play_seconds + excluded.total_play_seconds,
-            total_sessions = total_sessions + 1,
-            last_session_seconds = excluded.last_session_seconds,
-            updated_at = CURRENT_TIMESTAMP
-        """,
-        (user_id, int(elapsed_seconds), int(elapsed_seconds)),
+        "SELECT game_id, play_seconds, played_at FROM game_history WHERE user_id = ? ORDER BY played_at DESC LIMIT ?",
+        (user_id, limit),
     )
-    
-    # Record game history if a game was detected
-    if game_name:
-        c.execute(
-            """
-            INSERT INTO game_history (user_id, game_name, play_seconds, played_at)
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-            """,
-            (user_id, game_name, int(elapsed_seconds)),
-        )
-    
-    conn.commit()
-    conn.close()
+    rows = c.fetchall()
+    if own_conn:
+        conn.close()
+
+    history = []
+    for row in rows:
+        history.append({
+            "game_name": _game_catalog.title(row[0]),
+            "play_time": _format_elapsed(row[1]),
+            "played_at": row[2]
+        })
+    return history
+
+
+def _recent_play_seconds(user_id, count=10):
+    """Lengths of the user's last sessions, oldest first (status sparkline)."""
+    return [play_seconds for _, _, play_seconds in reversed(_recent_sessions.recent(user_id, count))]
+
+
+def _monitor_status_payload(state, user_stats, elapsed=None):
+    if elapsed is None:
+        elapsed = _get_elapsed_seconds(state)
+    return {
+        "status": "running" if state["running"] else "paused",
+        "elapsed_seconds": int(elapsed),
+        "elapsed_display": _format_elapsed(elapsed),
+        "game_detected": state["game_detected"],
+        "game_title": state["game_title"],
+        "total_sessions": user_stats["total_sessions"],
+        "total_play_time_display": user_stats["total_play_time_display"],
+    }
+
+
+def _record_monitor_session(user_id, elapsed_seconds, game_name=None, recovered=False, ended_at=None, games=None):
+    """
+    Store a finished session; `ended_at` (epoch seconds) defaults to now.
+
+    `games` maps process name -> seconds played (see monitor_core.game_seconds)
+    for the per-game totals; the session itself is charged to the game
+    played longest. Without it the whole session goes to `game_name`.
+    """
+    if not user_id:
+        return
+    if elapsed_seconds <= 0:
+        _session_journal.clear(user_id)
+        return
+
+    ended_at = _clock() if ended_at is None else ended_at
+    try:
+        # Resolve before opening the write transaction (cache hit in practice)
+        if games is None:
+            games = {game_name: elapsed_seconds} if game_name else {}
+        game_id, played = charge_games(games, _game_catalog.resolve)
+        ended_at_utc = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(ended_at))
+
+        conn = shards.connect(DB_NAME, user_id)
+        try:
+            # Same transaction as the totals below, so a journaled session is never counted twice
+            if not _session_journal.clear(user_id, conn) and recovered:
+                return  # another worker already finalized it
+            record_session(conn, user_id, elapsed_seconds, game_id, ended_at_utc, games=played)
+            analytics.log_sessions(conn, [(user_id, game_id, seconds, ended_at_utc) for game_id, seconds in played])
+            conn.commit()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        if recovered:
+            return  # still journaled; retried on the next start-up
+        if games:
+            game_name = max(games, key=games.get)
+        print(f"[SPOOL] Database unavailable ({e}), spooling session of user {user_id}")
+        _event_spool.append(new_session_event(user_id, game_name, elapsed_seconds, ended_at, games=games))
+        return
+    # One session for the risk windows, sketches and recent sessions, however many games it had
+    _after_sessions_recorded([(user_id, elapsed_seconds, game_id, ended_at)])
+
+
+def _after_sessions_recorded(sessions):
+    """Update the in-memory views derived from recorded (user_id, seconds, game_id, ended_at) sessions."""
+    sketch_rows = []
+    for user_id in {item[0] for item in sessions}:
+        _data_versions.bump(user_id, "stats", "history")
+    for user_id, elapsed_seconds, game_id, ended_at in sorted(sessions, key=lambda item: item[3] or 0):
+        if game_id:
+            _recent_sessions.record(user_id, ended_at or _clock(), game_id, elapsed_seconds)
+            day = time.strftime("%Y-%m-%d", time.gmtime(ended_at)) if ended_at else None
+            _risk_scorer.record_session(user_id, elapsed_seconds, ended_at)
+            sketch_rows.append((user_id, elapsed_seconds, day))
+    _population_sketches.record_sessions(sketch_rows)
+    for user_id in {row[0] for row in sketch_rows}:
+        _activity_cache.invalidate(user_id)
+
+
+def _store_events(events, journal=None, local=False):
+    """Validate and store one event batch, then update in-memory views and send live alerts."""
+    result = ingest.store_events(DB_NAME, events, _game_catalog, journal, local=local)
+    _after_sessions_recorded(
+        [(event["user_id"], event["play_seconds"], event["game_id"], event["at"]) for event in result["sessions"]]
+    )
+    # Only live detections alert; replayed ones are history
+    latest_detection = {}
+    for event in result["detections"]:
+        if event["detected"] and event["at"] >= time.time() - ingest.LIVE_DETECTION_SECONDS:
+            latest_detection[event["user_id"]] = event
+    for user_id, event in latest_detection.items():
+        _trigger_game_alert(user_id, _game_catalog.title(event["game_id"]) or event["game_name"])
+    return result
+
+
+# ==========================
+# PER-GAME ANALYTICS
+# ==========================
+
+# Period -> days before today it starts at (None: everything)
+ANALYTICS_PERIODS = {
+    "today": 0,
+    "week": 6,
+    "month": 29,
+    "all": None,
+}
+
+# Columnar copy of sessions / alerts fed by the change log (see analytics.py)
+_analytics_store = analytics.AnalyticsStore(
+    os.environ.get("ANALYTICS_STORE_DIR", "analytics"),
+    max_partitions=int(os.environ.get("ANALYTICS_CACHE_PARTITIONS", "800")),
+)
+
+
+def get_game_analytics(user_id, period="week"):
+    """Per-game totals for a period, served from the analytics store."""
+    if not user_id:
+        return []
+    # The change log is exported every few seconds; export the user's rows now so a session just stopped is included
+    if _analytics_consumer.pending(user_id):
+        _analytics_consumer.consume(user_id)
+
+    days = ANALYTICS_PERIODS[period]
+    since = None if days is None else time.strftime("%Y-%m-%d", time.gmtime(time.time() - days * 86400))
+    totals = _analytics_store.game_totals(user_id, since)
+
+    games = []
+    for game_id, total_seconds, session_count, last_played in totals.itertuples(index=False):
+        games.append({
+            "game_name": _game_catalog.title(int(game_id)),
+            "total_seconds": int(total_seconds),
+            "play_time": _format_elapsed(total_seconds),
+            "session_count": int(session_count),
+            "last_played": last_played
+        })
+    return games
+
+
+# Hours played per hour / day / week for the activity chart.
+# Memoized per process, so only with the single-worker memory backend by default.
+_activity_cache = ActivityCache(
+    DB_NAME,
+    enabled=os.environ.get(
+        "ACTIVITY_CACHE", "1" if os.environ.get("MONITOR_STATE_BACKEND", "memory") == "memory" else "0"
+    ) == "1",
+    max_entries=int(os.environ.get("ACTIVITY_CACHE_MAX_ENTRIES", "100000")),
+)
 
 
 def _monitor_start(user_id=None):
-    global _monitor_started_at, _monitor_running, _monitor_user_id, _game_detected, _game_title
-    with _monitor_lock:
-        if not _monitor_running:
-            _monitor_started_at = time.monotonic()
-            _monitor_running = True
-            if user_id:
-                _monitor_user_id = user_id
-            _game_detected = False
-            _game_title = "No game detected"
+    def start(state):
+        if state["running"]:
+            return None, 0.0
+        state["started_at"] = _clock()
+        state["running"] = True
+        if user_id:
+            state["user_id"] = user_id
+        state["game_detected"] = False
+        state["game_title"] = NO_GAME_TITLE
+        return state["user_id"], state["elapsed_seconds"]
+
+    owner_id, elapsed = _monitor_state.update(start)
+    if owner_id:
+        settings = get_user_alert_settings(owner_id)
+        _threshold_scheduler.start(owner_id, settings["alert_threshold_minutes"], elapsed)
     _dispatch_monitor_event("start")
 
 
 def _monitor_pause():
-    global _monitor_started_at, _monitor_elapsed_seconds, _monitor_running
-    with _monitor_lock:
-        if _monitor_running and _monitor_started_at is not None:
-            _monitor_elapsed_seconds += time.monotonic() - _monitor_started_at
-            _monitor_started_at = None
-            _monitor_running = False
+    def pause(state):
+        if state["running"] and state["started_at"] is not None:
+            state["elapsed_seconds"] += max(0.0, _clock() - state["started_at"])
+            state["started_at"] = None
+            state["running"] = False
+            # Games are only known to run while monitored; the next poll after resume reopens them
+            state["session_games"] = attribute_games(state["session_games"], (), state["elapsed_seconds"])
+        return (
+            state["user_id"], state["elapsed_seconds"], state["session_game_name"],
+            game_seconds(state["session_games"], state["elapsed_seconds"]),
+        )
+
+    observed_at = _clock()
+    user_id, elapsed, game_name, games = _monitor_state.update(pause)
+    _threshold_scheduler.pause(user_id, elapsed)
+    # A paused session can sit for hours, so journal it right away
+    if elapsed > 0:
+        _session_journal.checkpoint(user_id, elapsed, game_name, force=True, observed_at=observed_at, games=games)
     _dispatch_monitor_event("pause")
 
 
 def _monitor_stop():
-    global _monitor_started_at, _monitor_elapsed_seconds, _monitor_running, _monitor_user_id, _game_detected, _game_title, _session_game_name
-    final_elapsed = 0
-    owner_id = None
-    game_played = _session_game_name
-    with _monitor_lock:
-        if _monitor_running and _monitor_started_at is not None:
-            _monitor_elapsed_seconds += time.monotonic() - _monitor_started_at
-        final_elapsed = _monitor_elapsed_seconds
-        owner_id = _monitor_user_id
-        _monitor_started_at = None
-        _monitor_running = False
-        _monitor_elapsed_seconds = 0.0
-        _monitor_user_id = None
-        _game_detected = False
-        _game_title = "No game detected"
-        _session_game_name = None
-
-    _record_monitor_session(owner_id, final_elapsed, game_played)
+    def stop(state):
+        if state["running"] and state["started_at"] is not None:
+            state["elapsed_seconds"] += max(0.0, _clock() - state["started_at"])
+        finished = (
+            state["user_id"],
+            state["elapsed_seconds"],
+            state["session_game_name"],
+            game_seconds(state["session_games"], state["elapsed_seconds"]),
+        )
+        state.update(
+            running=False,
+            started_at=None,
+            elapsed_seconds=0.0,
+            user_id=None,
+            game_detected=False,
+            game_title=NO_GAME_TITLE,
+            session_game_name=None,
+            session_games={},
+        )
+        return finished
+
+    ended_at = _clock()
+    owner_id, final_elapsed, game_played, games_played = _monitor_state.update(stop)
+    _threshold_scheduler.stop(owner_id)
+    _record_monitor_session(owner_id, final_elapsed, game_played, ended_at=ended_at, games=games_played)
     _dispatch_monitor_event("stop")
 
 
@@ -324,37 +654,10 @@ def _monitor_stop():
 # ==========================
 
 def get_user_alert_settings(user_id):
-    """Get alert settings for a user."""
+    """Get alert settings for a user (cached, see settings_cache.py)."""
     if not user_id:
         return None
-    
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute(
-        """SELECT phone_number, email_alerts_enabled, sms_alerts_enabled, 
-           alert_on_game_detect, alert_threshold_minutes 
-           FROM user_alert_settings WHERE user_id=?""",
-        (user_id,),
-    )
-    row = c.fetchone()
-    conn.close()
-    
-    if not row:
-        return {
-            "phone_number": "",
-            "email_alerts_enabled": True,
-            "sms_alerts_enabled": False,
-            "alert_on_game_detect": True,
-            "alert_threshold_minutes": 30
-        }
-    
-    return {
-        "phone_number": row[0] or "",
-        "email_alerts_enabled": bool(row[1]),
-        "sms_alerts_enabled": bool(row[2]),
-        "alert_on_game_detect": bool(row[3]),
-        "alert_threshold_minutes": row[4]
-    }
+    return _settings_cache.alert_settings(user_id)
 
 
 def save_user_alert_settings(user_id, settings):
@@ -362,7 +665,7 @@ def save_user_alert_settings(user_id, settings):
     if not user_id:
         return False
     
-    conn = sqlite3.connect(DB_NAME)
+    conn = shards.connect(DB_NAME, user_id)
     c = conn.cursor()
     c.execute(
         """
@@ -389,30 +692,34 @@ def save_user_alert_settings(user_id, settings):
     )
     conn.commit()
     conn.close()
+    _settings_cache.invalidate(user_id)
+    _data_versions.bump(user_id, "settings")
     return True
 
 
-def get_alerts_log(user_id, limit=20):
+def get_alerts_log(user_id, limit=20, conn=None):
     """Get alert history for a user."""
     if not user_id:
         return []
     
-    conn = sqlite3.connect(DB_NAME)
+    own_conn = conn is None
+    conn = conn or shards.connect(DB_NAME, user_id)
     c = conn.cursor()
     c.execute(
-        """SELECT alert_type, message, game_name, sent_via, sent_at 
+        """SELECT alert_type, message, game_id, sent_via, sent_at 
            FROM alerts_log WHERE user_id = ? ORDER BY sent_at DESC LIMIT ?""",
         (user_id, limit),
     )
     rows = c.fetchall()
-    conn.close()
+    if own_conn:
+        conn.close()
     
     alerts = []
     for row in rows:
         alerts.append({
             "alert_type": row[0],
             "message": row[1],
-            "game_name": row[2],
+            "game_name": _game_catalog.title(row[2]),
             "sent_via": row[3],
             "sent_at": row[4]
         })
@@ -424,40 +731,35 @@ def _send_alert(user_id, alert_type, message, game_name=None, sent_via=None):
     if not user_id:
         return False
     
-    conn = sqlite3.connect(DB_NAME)
+    game_id = _game_catalog.resolve(game_name)
+    sent_at = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(_clock()))
+    conn = shards.connect(DB_NAME, user_id)
     c = conn.cursor()
     c.execute(
-        """INSERT INTO alerts_log (user_id, alert_type, message, game_name, sent_via, sent_at)
-           VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)""",
-        (user_id, alert_type, message, game_name, sent_via),
+        """INSERT INTO alerts_log (user_id, alert_type, message, game_id, sent_via, sent_at)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        (user_id, alert_type, message, game_id, sent_via, sent_at),
     )
+    analytics.log_alert(conn, user_id, alert_type, game_id, sent_at)
     conn.commit()
     conn.close()
+    _data_versions.bump(user_id, "alerts")
     
     # Real email sending (only if sent_via == "email")
     if sent_via == "email":
         try:
-            # Import secure email configuration
-            from email_config import get_email_config, is_email_configured
+            # Sender config and recipient come from the settings cache, not the database
+            email_config = _settings_cache.email_config()
             
             # Check if email is configured
-            if not is_email_configured():
+            if email_config is None:
                 print(f"[EMAIL ERROR] Email not configured! Please set up your Gmail credentials in email_config.py")
                 print(f"[EMAIL ERROR] See email_config.py for instructions on how to set up Gmail App Password")
                 return False
             
-            # Get email configuration
-            email_config = get_email_config()
             sender_email = email_config['email']
             sender_password = email_config['app_password']
-            
-            # Get recipient email from database
-            conn = sqlite3.connect(DB_NAME)
-            c = conn.cursor()
-            c.execute("SELECT email FROM users WHERE id=?", (user_id,))
-            row = c.fetchone()
-            conn.close()
-            recipient_email = row[0] if row else None
+            recipient_email = _settings_cache.recipient(user_id)
             
             if recipient_email:
                 subject = f"Game Addiction Monitor Alert: {alert_type}"
@@ -489,8 +791,7 @@ def _trigger_game_alert(user_id, game_name):
     if not settings or not settings.get("alert_on_game_detect"):
         return
     
-    from datetime import datetime
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    current_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(_clock()))
     
     message = f"Game detected: {game_name} at {current_time}"
     
@@ -503,14 +804,330 @@ def _trigger_game_alert(user_id, game_name):
         _send_alert(user_id, "game_detected", message, game_name, "sms")
 
 
+def _trigger_threshold_alert(user_id, threshold_minutes):
+    """Trigger alert when a session passes the user's play time threshold."""
+    state = _monitor_state.load()
+    # With shared state backends the session may have been paused or stopped by another worker
+    if state["user_id"] != user_id or not state["running"]:
+        return
+    elapsed = _get_elapsed_seconds(state)
+    if elapsed < threshold_minutes * 60:
+        _threshold_scheduler.start(user_id, threshold_minutes, elapsed)
+        return
+
+    settings = get_user_alert_settings(user_id)
+    game_name = state["session_game_name"]
+    message = f"Play time threshold of {threshold_minutes} minutes reached ({_format_elapsed(elapsed)} this session)"
+
+    if settings.get("email_alerts_enabled"):
+        _send_alert(user_id, "time_threshold", message, game_name, "email")
+
+    if settings.get("sms_alerts_enabled") and settings.get("phone_number"):
+        _send_alert(user_id, "time_threshold", message, game_name, "sms")
+
+
+# Deadlines of running sessions on a timer wheel (see alert_scheduler.py)
+_threshold_scheduler = ThresholdAlertScheduler(on_fire=_trigger_threshold_alert, clock=_clock)
+
+
 # ==========================
 # MONITORING WORKER
 # ==========================
 
+def set_monitor_sources(clock=None, process_source=None):
+    """
+    Run the monitor on another clock and process list (e.g. synthetic.SimulatedClock).
+
+    While a clock is injected the background threads stop polling and the
+    caller drives _monitor_detection_step() and _threshold_scheduler.run_pending();
+    call without arguments to go back to time.time and tasklist.
+    """
+    global _clock, _process_source, _monitor_simulated
+    _clock = clock or time.time
+    _process_source = process_source or list_processes
+    _monitor_simulated = clock is not None
+    _session_journal.clock = _clock
+    _threshold_scheduler.set_clock(_clock)
+
+
+def _replay_spooled_events(events):
+    """Spool sink: store a batch of spooled sessions, retiring their journal rows."""
+    # Checked like the direct write path; anything still refused is kept, not dropped
+    result = _store_events(events, journal=_session_journal, local=True)
+    for rejection in result["rejected"]:
+        _event_spool.reject(events[rejection["index"]], rejection["error"])
+        print(
+            f"[SPOOL] Rejected event {rejection['event_id']} ({rejection['error']}), "
+            f"kept in {_event_spool.rejected_path}"
+        )
+
+
+def _replay_spool():
+    if not len(_event_spool):
+        return
+    report = _event_spool.replay(_replay_spooled_events)
+    if report["events"]:
+        print(f"[SPOOL] Replayed {report['events']} events ({report['events_per_sec']}/s)")
+    if report["error"]:
+        print(f"[SPOOL ERROR] {report['error']}, {len(_event_spool)} events still spooled")
+
+
+def _spool_replay_worker():
+    while True:
+        time.sleep(_spool_replay_seconds)
+        _replay_spool()
+
+
+def _recover_orphaned_sessions():
+    """Finalize sessions journaled by a process that exited without stopping them."""
+    live = _monitor_state.load()
+    for user_id, elapsed, game_name, checkpoint_at, games in _session_journal.orphans():
+        # With the mmap/sqlite backends the session may still be live in the shared state
+        if live["user_id"] == user_id and (live["running"] or live["elapsed_seconds"] > 0):
+            continue
+        print(
+            f"[RECOVERY] Finalizing session of user {user_id}: {_format_elapsed(elapsed)} "
+            f"(last checkpoint {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(checkpoint_at))})"
+        )
+        # The session ended with the process, so it is dated by its last checkpoint
+        _record_monitor_session(user_id, elapsed, game_name, recovered=True, ended_at=checkpoint_at, games=games)
+
+
+# Spooled sessions first: replaying them retires journal rows that would otherwise be recovered twice
+_replay_spool()
+_recover_orphaned_sessions()
+
+_spool_replay_seconds = float(os.environ.get("SPOOL_REPLAY_SECONDS", "10"))
+_spool_replay_thread = threading.Thread(target=_spool_replay_worker, daemon=True)
+_spool_replay_thread.start()
+
 _monitor_worker_thread = threading.Thread(target=_monitor_detection_worker, daemon=True)
 _monitor_worker_thread.start()
 
 
+def _threshold_alert_worker():
+    while True:
+        time.sleep(1)
+        if not _monitor_simulated:
+            _threshold_scheduler.run_pending()
+
+
+# A session restored from the sqlite/mmap state backend keeps its deadline
+_restored_state = _monitor_state.load()
+if _restored_state["running"] and _restored_state["user_id"]:
+    _threshold_scheduler.start(
+        _restored_state["user_id"],
+        get_user_alert_settings(_restored_state["user_id"])["alert_threshold_minutes"],
+        _get_elapsed_seconds(_restored_state),
+    )
+
+_threshold_alert_thread = threading.Thread(target=_threshold_alert_worker, daemon=True)
+_threshold_alert_thread.start()
+
+
+# ==========================
+# RETENTION WORKER
+# ==========================
+
+_retention_engine = RetentionEngine(
+    DB_NAME,
+    archive_dir=os.environ.get("ARCHIVE_DIR", "archive"),
+    retention_days={
+        "alerts_log": int(os.environ.get("RETENTION_ALERTS_DAYS", "90")),
+        "game_history": int(os.environ.get("RETENTION_HISTORY_DAYS", "365")),
+    },
+)
+_retention_interval_hours = float(os.environ.get("RETENTION_INTERVAL_HOURS", "24"))
+
+
+def _retention_worker():
+    """Archive and prune aged history rows on a fixed schedule."""
+    while True:
+        time.sleep(_retention_interval_hours * 3600)
+        try:
+            report = _retention_engine.run()
+            _data_versions.bump(None, "history", "alerts")
+            print(
+                f"[RETENTION] archived {sum(t['rows_archived'] for t in report['tables'].values())} rows, "
+                f"reclaimed {report['bytes_reclaimed']} bytes in {report['duration_seconds']}s"
+            )
+        except Exception as e:
+            print(f"[RETENTION ERROR] {e}")
+
+
+if _retention_interval_hours > 0:
+    _retention_worker_thread = threading.Thread(target=_retention_worker, daemon=True)
+    _retention_worker_thread.start()
+
+
+# ==========================
+# ANALYTICS STORE WORKER
+# ==========================
+
+_analytics_consumer = analytics.ChangeLogConsumer(DB_NAME, _analytics_store.store_dir)
+# 0: the change log is consumed by a separate `python analytics.py consume --follow N`
+_analytics_consume_seconds = float(os.environ.get("ANALYTICS_CONSUME_SECONDS", "5"))
+
+
+def _analytics_worker():
+    """Move new change log rows into the analytics store."""
+    while True:
+        time.sleep(_analytics_consume_seconds)
+        try:
+            _analytics_consumer.consume()
+        except Exception as e:
+            print(f"[ANALYTICS ERROR] {e}")
+
+
+if _analytics_consume_seconds > 0:
+    _analytics_worker_thread = threading.Thread(target=_analytics_worker, daemon=True)
+    _analytics_worker_thread.start()
+
+
+# ==========================
+# QUANTILE SKETCH FLUSH WORKER
+# ==========================
+
+# Sessions reach the persisted sketches (merged with other workers') at this interval
+_sketch_flush_seconds = float(os.environ.get("SKETCH_FLUSH_SECONDS", "30"))
+
+
+def _sketch_flush_worker():
+    """Merge newly recorded sessions into the persisted quantile sketches."""
+    while True:
+        time.sleep(_sketch_flush_seconds)
+        try:
+            _population_sketches.flush()
+        except Exception as e:
+            print(f"[SKETCHES ERROR] {e}")
+
+
+if _sketch_flush_seconds > 0:
+    _sketch_flush_thread = threading.Thread(target=_sketch_flush_worker, daemon=True)
+    _sketch_flush_thread.start()
+
+
+# ==========================
+# WEEKLY REPORTS WORKER
+# ==========================
+
+_weekly_reports_dir = os.environ.get("WEEKLY_REPORTS_DIR", "reports")
+_weekly_reports_email = os.environ.get("WEEKLY_REPORTS_EMAIL", "0") == "1"
+_weekly_reports_workers = os.environ.get("WEEKLY_REPORTS_WORKERS", "")
+
+
+def _weekly_reports_worker():
+    """Run reports.py for the last full week until its checkpoint says finished."""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reports.py")
+    while True:
+        job = reports.WeeklyReportJob(DB_NAME, _weekly_reports_dir)
+        if not job.load_checkpoint()["finished"]:
+            # A separate process, so the pool's workers never re-import the web app
+            command = [sys.executable, script, DB_NAME, "--out", _weekly_reports_dir]
+            if _weekly_reports_workers:
+                command += ["--workers", _weekly_reports_workers]
+            if _weekly_reports_email:
+                command.append("--email")
+            try:
+                result = subprocess.run(command)
+                if _weekly_reports_email:
+                    _data_versions.bump(None, "alerts")
+                if result.returncode != 0:
+                    print(f"[REPORTS ERROR] {job.week}: exited with {result.returncode}, resuming next hour")
+            except Exception as e:
+                print(f"[REPORTS ERROR] {e}")
+        time.sleep(3600)
+
+
+if os.environ.get("WEEKLY_REPORTS", "0") == "1":
+    _weekly_reports_thread = threading.Thread(target=_weekly_reports_worker, daemon=True)
+    _weekly_reports_thread.start()
+
+
+# ==========================
+# RISK SNAPSHOT WORKER
+# ==========================
+
+_risk_snapshot_job = risk_snapshots.RiskSnapshotJob(DB_NAME, _analyzer)
+
+
+def _risk_snapshot_worker():
+    """Snapshot every user's risk for the previous UTC day, shortly after midnight."""
+    while True:
+        day = risk_snapshots.default_day()
+        try:
+            conn = sqlite3.connect(DB_NAME)
+            done = conn.execute("SELECT 1 FROM risk_snapshots WHERE day = ? LIMIT 1", (day,)).fetchone()
+            conn.close()
+            if done is None:
+                report = _risk_snapshot_job.run(day)
+                _data_versions.bump(None, "risk")
+                print(
+                    f"[RISK] {day}: scored {report['users']} users in {report['duration_seconds']}s "
+                    f"({report['classes']['Addicted']} Addicted)"
+                )
+        except Exception as e:
+            print(f"[RISK ERROR] {e}")
+        # Wake up five minutes into the next UTC day
+        time.sleep(86400 - time.time() % 86400 + 300)
+
+
+if os.environ.get("RISK_SNAPSHOTS", "1") == "1":
+    _risk_snapshot_thread = threading.Thread(target=_risk_snapshot_worker, daemon=True)
+    _risk_snapshot_thread.start()
+
+
+# ==========================
+# HTTP CACHING
+# ==========================
+
+@app.url_defaults
+def _versioned_static_url(endpoint, values):
+    """Add the content hash to static URLs so they can be cached forever."""
+    if endpoint == "static" and "filename" in values and "v" not in values:
+        version = _static_assets.version(values["filename"])
+        if version:
+            values["v"] = version
+
+
+@app.after_request
+def _cache_headers(response):
+    cache_key = None
+    if request.endpoint == "static" and response.status_code == 200:
+        version = request.args.get("v")
+        if version and version == _static_assets.version(request.view_args["filename"]):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        cache_key = (request.view_args["filename"], response.get_etag()[0])
+    return compress_response(response, cache_key)
+
+
+def _conditional_json(user_id, scopes, build, extra=None):
+    """
+    jsonify(build()) with validators from the user's data versions.
+    Answers 304 without calling build() when the client is up to date.
+    """
+    if not _conditional_get:
+        return jsonify(build())
+
+    etag, last_modified = _data_versions.validators(user_id, scopes, extra or "")
+    # Responses that also depend on live monitor state (extra) are validated by ETag only
+    if extra:
+        last_modified = None
+    if not_modified(etag, last_modified):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
 # ==========================
 # LANDING PAGE
 # ==========================
@@ -531,7 +1148,10 @@ def register():
     if request.method == "POST":
         name = request.form["name"]
         email = request.form["email"]
-        password = generate_password_hash(request.form["password"])
+        try:
+            password = _password_hasher.hash(request.form["password"])
+        except HashPoolBusy:
+            return "Server busy, please try again", 503
 
         conn = sqlite3.connect(DB_NAME)
         c = conn.cursor()
@@ -544,6 +1164,7 @@ def register():
             )
             created_user_id = c.lastrowid
             conn.commit()
+            _settings_cache.invalidate(created_user_id)
         except sqlite3.IntegrityError:
             conn.close()
             return "Email already exists"
@@ -574,7 +1195,21 @@ def login():
         user = c.fetchone()
         conn.close()
 
-        if user and check_password_hash(user[3], password):
+        if not user:
+            return "Invalid credentials"
+
+        try:
+            valid, upgraded_hash = _password_hasher.verify(user[3], password)
+        except HashPoolBusy:
+            return "Server busy, please try again", 503
+
+        if valid:
+            if upgraded_hash:
+                # Hash parameters changed since this password was stored
+                conn = sqlite3.connect(DB_NAME)
+                conn.execute("UPDATE users SET password=? WHERE id=?", (upgraded_hash, user[0]))
+                conn.commit()
+                conn.close()
             session.permanent = True
             session["user"] = {"id": user[0], "name": user[1], "email": user[2]}
             return redirect(url_for("dashboard"))
@@ -593,11 +1228,13 @@ def dashboard():
         return redirect(url_for("login"))
 
     monitor_stats = get_user_monitor_stats(session["user"].get("id"))
+    risk = _analyzer.analyze_recent(session["user"].get("id"))
     return render_template(
         "dashboard.html",
         user=session["user"],
         monitor_stats=monitor_stats,
-        monitor_state="running" if _monitor_running else "paused",
+        risk=risk,
+        monitor_state="running" if _monitor_state.load()["running"] else "paused",
     )
 
 
@@ -628,37 +1265,96 @@ def stats():
     return jsonify({"today_hours": 4.5, "weekly_avg": 3.2, "risk": "At Risk"})
 
 
+@app.route("/weekly-data")
+def weekly_data():
+    """Hours played per bucket for the dashboard activity chart."""
+    if not session.get("user"):
+        return jsonify({"error": "Not logged in"}), 401
+
+    try:
+        days = int(request.args.get("days", 7))
+        utc_offset = int(request.args.get("utc_offset", 0))
+    except ValueError:
+        return jsonify({"error": "days and utc_offset must be integers"}), 400
+    granularity = request.args.get("granularity", "day")
+    if days not in RANGE_DAYS or granularity not in GRANULARITIES:
+        return jsonify({"error": f"days must be one of {list(RANGE_DAYS)}, granularity one of {list(GRANULARITIES)}"}), 400
+    # Real time zones run from UTC-12:00 to UTC+14:00 in steps of 15 minutes
+    if not -12 * 60 <= utc_offset <= 14 * 60 or utc_offset % 15:
+        return jsonify({"error": "utc_offset must be minutes east of UTC, between -720 and 840 in steps of 15"}), 400
+
+    user_id = session["user"].get("id")
+    # The chart also changes when the current bucket rolls over
+    current_bucket = bucket_edges(days, granularity, time.time(), utc_offset)[-1]
+    return _conditional_json(
+        user_id,
+        ("history",),
+        lambda: _activity_cache.get(user_id, days, granularity, utc_offset),
+        extra=f"{days}|{granularity}|{utc_offset}|{current_bucket}",
+    )
+
+
+@app.route("/api/risk/current")
+def risk_current():
+    """Current risk classification from the user's recorded game sessions."""
+    if not session.get("user"):
+        return jsonify({"error": "Not logged in"}), 401
+
+    result = _analyzer.analyze_recent(session["user"].get("id"))
+    return jsonify(result)
+
+
+@app.route("/api/risk/history")
+def risk_history():
+    """The user's nightly risk snapshots for the last `days` days (default 30)."""
+    if not session.get("user"):
+        return jsonify({"error": "Not logged in"}), 401
+
+    try:
+        days = min(max(int(request.args.get("days", 30)), 1), 365)
+    except ValueError:
+        return jsonify({"error": "days must be an integer"}), 400
+
+    user_id = session["user"].get("id")
+
+    def build():
+        conn = sqlite3.connect(DB_NAME)
+        snapshots = risk_snapshots.user_history(conn, user_id, days)
+        conn.close()
+        return {"days": days, "snapshots": snapshots}
+
+    return _conditional_json(user_id, ("risk",), build, extra=f"{days}|{risk_snapshots.default_day()}")
+
+
 @app.route("/api/monitor/status")
 def monitor_status():
-    elapsed = _get_elapsed_seconds()
-    current_user = session.get("user", {})
-    user_stats = get_user_monitor_stats(current_user.get("id"))
-    return jsonify(
-        {
-            "status": "running" if _monitor_running else "paused",
-            "elapsed_seconds": int(elapsed),
-            "elapsed_display": _format_elapsed(elapsed),
-            "game_detected": _game_detected,
-            "game_title": _game_title,
-            "total_sessions": user_stats["total_sessions"],
-            "total_play_time_display": user_stats["total_play_time_display"],
-        }
-    )
+    state = _monitor_state.load()
+    elapsed = _get_elapsed_seconds(state)
+    user_id = session.get("user", {}).get("id")
+
+    def build():
+        payload = _monitor_status_payload(state, get_user_monitor_stats(user_id), elapsed)
+        payload["recent_play_seconds"] = _recent_play_seconds(user_id)
+        return payload
+
+    live = f"{state['running']}|{int(elapsed)}|{state['game_detected']}|{state['game_title']}"
+    return _conditional_json(user_id, ("stats",), build, extra=live)
 
 
 @app.route("/api/monitor/start", methods=["POST"])
 def monitor_start():
     user = session.get("user", {})
     _monitor_start(user.get("id"))
-    elapsed = _get_elapsed_seconds()
+    state = _monitor_state.load()
+    elapsed = _get_elapsed_seconds(state)
     return jsonify(
         {
             "ok": True,
             "message": "Monitoring started.",
             "status": "running",
             "elapsed_display": _format_elapsed(elapsed),
-            "game_detected": _game_detected,
-            "game_title": _game_title,
+            "game_detected": state["game_detected"],
+            "game_title": state["game_title"],
         }
     )
 
@@ -666,15 +1362,16 @@ def monitor_start():
 @app.route("/api/monitor/pause", methods=["POST"])
 def monitor_pause():
     _monitor_pause()
-    elapsed = _get_elapsed_seconds()
+    state = _monitor_state.load()
+    elapsed = _get_elapsed_seconds(state)
     return jsonify(
         {
             "ok": True,
             "message": "Monitoring paused.",
             "status": "paused",
             "elapsed_display": _format_elapsed(elapsed),
-            "game_detected": _game_detected,
-            "game_title": _game_title,
+            "game_detected": state["game_detected"],
+            "game_title": state["game_title"],
         }
     )
 
@@ -683,6 +1380,7 @@ def monitor_pause():
 def monitor_stop():
     user = session.get("user", {})
     _monitor_stop()
+    state = _monitor_state.load()
     user_stats = get_user_monitor_stats(user.get("id"))
     return jsonify(
         {
@@ -690,8 +1388,8 @@ def monitor_stop():
             "message": "Monitoring stopped.",
             "status": "paused",
             "elapsed_display": "00:00:00",
-            "game_detected": _game_detected,
-            "game_title": _game_title,
+            "game_detected": state["game_detected"],
+            "game_title": state["game_title"],
             "total_sessions": user_stats["total_sessions"],
             "total_play_time_display": user_stats["total_play_time_display"],
         }
@@ -704,24 +1402,180 @@ def game_history():
         return jsonify({"error": "Not logged in"}), 401
     
     user_id = session["user"].get("id")
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute(
-        "SELECT game_name, play_seconds, played_at FROM game_history WHERE user_id = ? ORDER BY played_at DESC LIMIT 20",
-        (user_id,),
-    )
-    rows = c.fetchall()
-    conn.close()
+    return _conditional_json(user_id, ("history",), lambda: {"history": get_game_history(user_id)})
+
+
+@app.route("/api/analytics/games")
+def analytics_games():
+    """Time per game for the logged in user (period: today, week, month, all)."""
+    if not session.get("user"):
+        return jsonify({"error": "Not logged in"}), 401
+
+    period = request.args.get("period", "week")
+    if period not in ANALYTICS_PERIODS:
+        return jsonify({"error": f"Unknown period: {period}"}), 400
+
+    limit = request.args.get("limit", 10, type=int)
+    games = get_game_analytics(session["user"].get("id"), period)
+    return jsonify({"period": period, "games": games[:limit]})
+
+
+@app.route("/api/analytics/store")
+def analytics_store_status():
+    """Change log backlog and lag of the analytics store."""
+    if not _ingest_authorized():
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(dict(
+        _analytics_consumer.lag(), consumer=_analytics_consumer.stats(), reader=_analytics_store.stats()
+    ))
+
+
+@app.route("/api/search")
+def search_api():
+    """
+    Full-text search of the user's alerts or game history.
+    ?q=valorant&in=alerts|history&since=YYYY-MM-DD&until=YYYY-MM-DD&page=1&per_page=20
+    """
+    if not session.get("user"):
+        return jsonify({"error": "Not logged in"}), 401
+
+    text = request.args.get("q", "").strip()
+    if not text:
+        return jsonify({"error": "q is required"}), 400
+    scope = request.args.get("in", "alerts")
+    if scope not in ("alerts", "history"):
+        return jsonify({"error": f"Unknown search scope: {scope}"}), 400
+    since, until = request.args.get("since"), request.args.get("until")
+    try:
+        for day in (since, until):
+            if day:
+                time.strptime(day, "%Y-%m-%d")
+        page = max(int(request.args.get("page", 1)), 1)
+        per_page = min(max(int(request.args.get("per_page", search.PAGE_SIZE)), 1), search.MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "since/until must be YYYY-MM-DD, page/per_page integers"}), 400
+
+    user_id = session["user"].get("id")
+
+    def build():
+        result = search.search_database(DB_NAME, scope, text, user_id, since, until, page, per_page)
+        result.update({"query": text, "in": scope})
+        return result
+
+    return _conditional_json(user_id, (scope,), build, extra=request.query_string.decode())
+
+
+@app.route("/api/analytics/percentiles")
+def analytics_percentiles():
+    """Rank today's play time and the last session against all users."""
+    if not session.get("user"):
+        return jsonify({"error": "Not logged in"}), 401
+
+    user_id = session["user"].get("id")
+    user_stats = get_user_monitor_stats(user_id)
+    result = _population_sketches.user_percentiles(user_id, user_stats["last_session_seconds"])
+    return jsonify(result)
+
+
+# ==========================
+# DASHBOARD BOOTSTRAP
+# ==========================
+
+def _email_status():
+    """Whether email alerts are configured, with the sender address masked."""
+    config = _settings_cache.email_config()
+    configured = config is not None
+    email = None
     
-    history = []
-    for row in rows:
-        history.append({
-            "game_name": row[0],
-            "play_time": _format_elapsed(row[1]),
-            "played_at": row[2]
-        })
+    if configured:
+        # Return masked email
+        email = config.get('email', '')
+        if email and '@' in email:
+            parts = email.split('@')
+            email = parts[0][:2] + '***@' + parts[1] if len(parts[0]) > 2 else '***@' + parts[1]
     
-    return jsonify({"history": history})
+    return {
+        "configured": configured,
+        "email": email
+    }
+
+
+@app.route("/api/dashboard/bootstrap")
+def dashboard_bootstrap():
+    """Everything the dashboard shows on first load, read in one transaction."""
+    if not session.get("user"):
+        return jsonify({"error": "Not logged in"}), 401
+
+    user_id = session["user"].get("id")
+    state = _monitor_state.load()
+
+    conn = shards.connect(DB_NAME, user_id, isolation_level=None)
+    # One read transaction: stats and alerts come from the same snapshot (history is in memory)
+    conn.execute("BEGIN")
+    user_stats = get_user_monitor_stats(user_id, conn)
+    history = get_game_history(user_id, conn=conn)
+    alerts = get_alerts_log(user_id, conn=conn)
+    conn.execute("COMMIT")
+    conn.close()
+
+    status = _monitor_status_payload(state, user_stats)
+    status["recent_play_seconds"] = _recent_play_seconds(user_id)
+    return jsonify({
+        "status": status,
+        "history": history,
+        "alerts": alerts,
+        "email": _email_status(),
+    })
+
+
+# ==========================
+# AGENT INGESTION
+# ==========================
+
+def _ingest_authorized():
+    token = os.environ.get("INGEST_TOKEN", "")
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    return bool(token) and hmac.compare_digest(supplied, token)
+
+
+@app.route("/api/ingest/events", methods=["POST"])
+def ingest_events():
+    """Batches of session / detection events from headless agents (agent.py --server)."""
+    if not _ingest_authorized():
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        body = ingest.read_body(request.get_data(), request.headers.get("Content-Encoding"))
+        events = json.loads(body)["events"]
+        if not isinstance(events, list):
+            raise TypeError("events must be a list")
+    except ingest.BatchTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except (OSError, ValueError, KeyError, TypeError):
+        return jsonify({"error": "Invalid event batch"}), 400
+    if len(events) > ingest.MAX_BATCH_EVENTS:
+        return jsonify({"error": f"At most {ingest.MAX_BATCH_EVENTS} events per batch"}), 413
+
+    try:
+        result = _store_events(events)
+    except sqlite3.Error as e:
+        print(f"[INGEST ERROR] {e}")
+        return jsonify({"error": "Could not store events, retry later"}), 503
+
+    return jsonify({
+        "ok": True,
+        "accepted": result["accepted"],
+        "duplicates": result["duplicates"],
+        "rejected": result["rejected"],
+    })
+
+
+@app.route("/api/ingest/spool")
+def ingest_spool_status():
+    """Backlog and replay rate of this server's offline event spool."""
+    if not _ingest_authorized():
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(_event_spool.stats())
 
 
 # ==========================
@@ -735,8 +1589,7 @@ def alerts_settings_get():
         return jsonify({"error": "Not logged in"}), 401
     
     user_id = session["user"].get("id")
-    settings = get_user_alert_settings(user_id)
-    return jsonify(settings)
+    return _conditional_json(user_id, ("settings",), lambda: get_user_alert_settings(user_id))
 
 
 @app.route("/api/alerts/settings", methods=["POST"])
@@ -750,6 +1603,7 @@ def alerts_settings_save():
     
     success = save_user_alert_settings(user_id, data)
     if success:
+        _threshold_scheduler.set_threshold(user_id, get_user_alert_settings(user_id)["alert_threshold_minutes"])
         return jsonify({"ok": True, "message": "Alert settings saved"})
     return jsonify({"ok": False, "error": "Failed to save settings"}), 500
 
@@ -761,8 +1615,7 @@ def alerts_log_get():
         return jsonify({"error": "Not logged in"}), 401
     
     user_id = session["user"].get("id")
-    alerts = get_alerts_log(user_id)
-    return jsonify({"alerts": alerts})
+    return _conditional_json(user_id, ("alerts",), lambda: {"alerts": get_alerts_log(user_id)})
 
 
 @app.route("/api/alerts/test", methods=["POST"])
@@ -801,24 +1654,15 @@ def alerts_email_status():
     if not session.get("user"):
         return jsonify({"error": "Not logged in"}), 401
     
-    from email_config import is_email_configured, get_email_config
-    
-    configured = is_email_configured()
-    email = None
-    
-    if configured:
-        config = get_email_config()
-        if config:
-            # Return masked email
-            email = config.get('email', '')
-            if email and '@' in email:
-                parts = email.split('@')
-                email = parts[0][:2] + '***@' + parts[1] if len(parts[0]) > 2 else '***@' + parts[1]
-    
-    return jsonify({
-        "configured": configured,
-        "email": email
-    })
+    return jsonify(_email_status())
+
+
+@app.route("/api/alerts/settings-cache")
+def alerts_settings_cache_status():
+    """Hit / miss counters of the alert settings cache."""
+    if not _ingest_authorized():
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(_settings_cache.stats())
 
 
 @app.route("/api/alerts/email-config", methods=["POST"])
@@ -842,14 +1686,14 @@ def alerts_email_config():
     import os
     os.environ['GMAIL_EMAIL'] = gmail_email
     os.environ['GMAIL_APP_PASSWORD'] = gmail_app_password
+    _settings_cache.invalidate_email_config()
     
     # Test the connection
     try:
-        from email_config import get_email_config, is_email_configured
+        config = _settings_cache.email_config()
         
-        if is_email_configured():
+        if config is not None:
             # Try to send a test email to verify
-            config = get_email_config()
             test_msg = MIMEMultipart()
             test_msg["From"] = config['email']
             test_msg["To"] = config['email']
@@ -873,15 +1717,11 @@ def alerts_test_email_connection():
     if not session.get("user"):
         return jsonify({"error": "Not logged in"}), 401
     
-    from email_config import is_email_configured
-    
-    if not is_email_configured():
+    config = _settings_cache.email_config()
+    if config is None:
         return jsonify({"ok": False, "error": "Email not configured"}), 400
     
     try:
-        from email_config import get_email_config
-        config = get_email_config()
-        
         # Send test email to self
         test_msg = MIMEMultipart()
         test_msg["From"] = config['email']
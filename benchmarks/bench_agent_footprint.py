@@ -0,0 +1,82 @@
+"""
+Benchmark: headless agent vs. full app footprint
+================================================
+
+Starts the full web app (app.py served by Flask's development server) and
+the headless agent (agent.py --db) against the same fresh database, lets
+each idle, then samples resident memory and CPU time from /proc while they
+sit in their detection loops. Also counts the modules each one imports.
+
+Linux only (reads /proc). Run:
+   python benchmarks/bench_agent_footprint.py [idle_seconds]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APP_CMD = "import app; app.app.run(port=5099, use_reloader=False)"
+AGENT_CMD = "import agent; agent.main(['--user-id', '1', '--db', 'users.db'])"
+COUNT_MODULES = "import sys, {module}; print(len(sys.modules))"
+
+
+def _rss_kb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def _cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # utime and stime are fields 14 and 15 of the full line
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _measure(code, workdir, env, warmup, idle_seconds):
+    proc = subprocess.Popen(
+        [sys.executable, "-c", code], cwd=workdir, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        time.sleep(warmup)
+        cpu_start = _cpu_seconds(proc.pid)
+        time.sleep(idle_seconds)
+        cpu_used = _cpu_seconds(proc.pid) - cpu_start
+        return _rss_kb(proc.pid) / 1024, cpu_used / idle_seconds * 100
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def run(idle_seconds=30):
+    workdir = tempfile.mkdtemp(prefix="agent_bench_")
+    env = dict(os.environ, PYTHONPATH=ROOT, RETENTION_INTERVAL_HOURS="0")
+    # Create the schema (and a user for the agent) the way the app does
+    subprocess.run(
+        [sys.executable, "-c",
+         "import app, sqlite3; c = sqlite3.connect('users.db'); "
+         "c.execute(\"INSERT INTO users (name, email, password) VALUES ('bench', 'bench@example.com', 'x')\"); "
+         "c.commit(); import os; os._exit(0)"],
+        cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL,
+    )
+
+    print(f"idle window {idle_seconds}s after warm-up")
+    print(f"{'process':<8} {'modules':>8} {'RSS MB':>8} {'idle CPU %':>11}")
+    for name, module, code in (("app", "app", APP_CMD), ("agent", "agent", AGENT_CMD)):
+        modules = subprocess.run(
+            [sys.executable, "-c", COUNT_MODULES.format(module=module) + "; import os; os._exit(0)"],
+            cwd=workdir, env=env, capture_output=True, text=True, check=True,
+        ).stdout.split()[-1]
+        rss_mb, cpu_pct = _measure(code, workdir, env, warmup=5, idle_seconds=idle_seconds)
+        print(f"{name:<8} {modules:>8} {rss_mb:>8.1f} {cpu_pct:>11.2f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 30)
@@ -0,0 +1,113 @@
+"""
+Benchmark: detection -> alert path with and without the settings cache
+======================================================================
+
+Creates USERS users with SMS alerts on (so nothing is sent over SMTP) and
+triggers "game detected" alerts for random users, the way the monitor does
+on each new detection:
+
+   - uncached: SettingsCache(max_users=0), settings read from SQLite each time
+   - cached: the app's cache, warmed by the first alert of each user
+
+Reported: alerts per second, p50 / p99 latency and SQLite connections
+opened per alert. The sender config lookup done before each email is timed
+separately (email_config.get_email_config() vs. the cache).
+
+Run (uses a throw-away database in a temp directory):
+   python benchmarks/bench_alert_path.py [users] [alerts]
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="alert_path_bench_"))
+os.environ.setdefault("RISK_SNAPSHOTS", "0")
+os.environ.setdefault("RETENTION_INTERVAL_HOURS", "0")
+os.environ.setdefault("ANALYTICS_CONSUME_SECONDS", "0")
+
+import app as flask_backend  # noqa: E402  (DB_NAME is relative to the temp dir)
+import shards  # noqa: E402
+from email_config import get_email_config  # noqa: E402
+from settings_cache import SettingsCache  # noqa: E402
+
+
+def _run_alerts(users, alerts):
+    rng = random.Random(49)
+    opened = [0]
+    connect = shards.connect
+
+    def counting_connect(*args, **kwargs):
+        opened[0] += 1
+        return connect(*args, **kwargs)
+
+    shards.connect = counting_connect
+    latencies = []
+    started = time.perf_counter()
+    try:
+        for _ in range(alerts):
+            user_id = rng.randint(1, users)
+            begun = time.perf_counter()
+            flask_backend._trigger_game_alert(user_id, "Minecraft")
+            latencies.append((time.perf_counter() - begun) * 1000)
+    finally:
+        shards.connect = connect
+    elapsed = time.perf_counter() - started
+    latencies = np.array(latencies)
+    return alerts / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 99), opened[0] / alerts
+
+
+def run(users=1000, alerts=5000):
+    conn = sqlite3.connect(flask_backend.DB_NAME)
+    conn.executemany(
+        "INSERT INTO users (id, name, email, password) VALUES (?, ?, ?, 'x')",
+        [(user_id, f"user{user_id}", f"user{user_id}@example.com") for user_id in range(1, users + 1)],
+    )
+    conn.commit()
+    conn.close()
+    for user_id in range(1, users + 1):
+        flask_backend.save_user_alert_settings(
+            user_id, {"email_alerts_enabled": False, "sms_alerts_enabled": True, "phone_number": "+10000000000"}
+        )
+
+    print(f"{users} users, {alerts} alerts per configuration")
+    print(f"\n{'settings':<10} {'alerts/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'connections/alert':>18}")
+    cached = flask_backend._settings_cache
+    stdout = sys.stdout
+    for name, cache in (("uncached", SettingsCache(flask_backend.DB_NAME, max_users=0)), ("cached", cached)):
+        flask_backend._settings_cache = cache
+        sys.stdout = open(os.devnull, "w")  # silence the [ALERT] lines
+        try:
+            rate, p50, p99, per_alert = _run_alerts(users, alerts)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        print(f"{name:<10} {rate:>9.0f} {p50:>8.2f} {p99:>8.2f} {per_alert:>18.2f}")
+    print(f"cache: {cached.stats()}")
+
+    import logging
+    logging.disable(logging.INFO)  # get_email_config() logs on every call
+    repeat = 10000
+    started = time.perf_counter()
+    for _ in range(repeat):
+        get_email_config()
+    uncached_us = (time.perf_counter() - started) / repeat * 1e6
+    started = time.perf_counter()
+    for _ in range(repeat):
+        cached.email_config()
+    cached_us = (time.perf_counter() - started) / repeat * 1e6
+    print(f"\nsender config lookup: {uncached_us:.1f} us from email_config.py, {cached_us:.2f} us cached")
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5000,
+    )
@@ -0,0 +1,83 @@
+"""
+Benchmark: threshold alert scheduling
+=====================================
+
+Compares the timer wheel in alert_scheduler.py with the obvious
+alternative, scanning every active session on each tick, for growing
+numbers of concurrent sessions with 15-180 minute thresholds. Also
+reports the cost of a pause/resume reschedule.
+
+Run:
+   python benchmarks/bench_alert_scheduler.py [ticks]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alert_scheduler import ThresholdAlertScheduler
+
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _scan_tick(sessions, now):
+    """Baseline: check every session's deadline."""
+    due = []
+    for user_id, deadline in sessions.items():
+        if deadline is not None and deadline <= now:
+            due.append(user_id)
+            sessions[user_id] = None
+    return due
+
+
+def run(ticks=600):
+    rng = random.Random(9)
+    print(f"{ticks} one-second ticks per run")
+    print(f"{'sessions':>9} {'scan us/tick':>13} {'wheel us/tick':>14} {'reschedule us':>14} {'fired':>7}")
+    for n_sessions in (1000, 10000, 100000):
+        # user ids start at 1, as in the users table
+        user_ids = range(1, n_sessions + 1)
+        thresholds = {user_id: rng.choice((15, 30, 60, 90, 120, 180)) for user_id in user_ids}
+        offsets = {user_id: rng.uniform(0, thresholds[user_id] * 60) for user_id in user_ids}
+
+        clock = SimulatedClock()
+        scan = {user_id: clock.now + (thresholds[user_id] * 60 - offsets[user_id]) for user_id in user_ids}
+        start = time.perf_counter()
+        scan_fired = 0
+        for _ in range(ticks):
+            clock.now += 1
+            scan_fired += len(_scan_tick(scan, clock.now))
+        scan_us = (time.perf_counter() - start) / ticks * 1e6
+
+        clock = SimulatedClock()
+        fired = []
+        scheduler = ThresholdAlertScheduler(on_fire=lambda user_id, minutes: fired.append(user_id), clock=clock)
+        for user_id in user_ids:
+            scheduler.start(user_id, thresholds[user_id], offsets[user_id])
+        start = time.perf_counter()
+        for _ in range(ticks):
+            clock.now += 1
+            scheduler.run_pending()
+        wheel_us = (time.perf_counter() - start) / ticks * 1e6
+
+        start = time.perf_counter()
+        for user_id in user_ids[:10000]:
+            scheduler.pause(user_id, offsets[user_id])
+            scheduler.resume(user_id, thresholds[user_id], offsets[user_id])
+        reschedule_us = (time.perf_counter() - start) / min(n_sessions, 10000) * 1e6
+
+        check = "" if len(fired) == scan_fired else f"  MISMATCH (scan fired {scan_fired})"
+        print(f"{n_sessions:>9} {scan_us:>13.1f} {wheel_us:>14.1f} {reschedule_us:>14.2f} {len(fired):>7}{check}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 600)
@@ -0,0 +1,133 @@
+"""
+Benchmark: analytics store vs. analytics on the live tables
+===========================================================
+
+Fills a database with synthetic users (5000 by default, 90 days), exports
+it to the columnar store, then measures:
+
+   - write isolation: p50 / p99 latency of session writes while another
+     process runs "time per game for everyone" in a loop, once against
+     game_history (SQLite) and once against the store
+   - read latency: per-user and all-user per-game totals, SQLite vs. store
+   - write cost of the change log row, and consumer throughput
+
+Run (uses a throw-away database in a temp directory):
+   python benchmarks/bench_analytics.py [users] [seconds]
+"""
+
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="analytics_bench_"))
+os.environ.setdefault("RISK_SNAPSHOTS", "0")
+os.environ.setdefault("RETENTION_INTERVAL_HOURS", "0")
+os.environ.setdefault("ANALYTICS_CONSUME_SECONDS", "0")
+
+import app as flask_backend  # noqa: E402  (DB_NAME is relative to the temp dir)
+import analytics  # noqa: E402
+from monitor_core import record_session  # noqa: E402
+from synthetic import generate_database  # noqa: E402
+
+ALL_GAMES_SQL = """SELECT game_id, SUM(play_seconds), COUNT(*), MAX(played_at)
+                   FROM game_history GROUP BY game_id ORDER BY 2 DESC"""
+USER_GAMES_SQL = """SELECT game_id, SUM(total_seconds), SUM(session_count), MAX(last_played)
+                    FROM game_aggregates WHERE user_id = ? GROUP BY game_id ORDER BY 2 DESC"""
+
+
+def _timed(fn, repeat=5):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def _analytics_reader(source, stop):
+    store = analytics.AnalyticsStore(flask_backend._analytics_store.store_dir)
+    conn = sqlite3.connect(flask_backend.DB_NAME, timeout=30)
+    while not stop.is_set():
+        if source == "sqlite":
+            conn.execute(ALL_GAMES_SQL).fetchall()
+        else:
+            store.game_totals()
+    conn.close()
+
+
+def _write_latencies(users, game_ids, seconds, log_changes=True):
+    rng = random.Random(48)
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        user_id = rng.randint(1, users)
+        game_id = rng.choice(game_ids)
+        ended_at = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+        started = time.perf_counter()
+        conn = sqlite3.connect(flask_backend.DB_NAME, timeout=30)
+        record_session(conn, user_id, 600, game_id, ended_at)
+        if log_changes:
+            analytics.log_sessions(conn, [(user_id, game_id, 600, ended_at)])
+        conn.commit()
+        conn.close()
+        latencies.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.005)
+    return np.array(latencies)
+
+
+def run(users=5000, seconds=5.0):
+    started = time.perf_counter()
+    report = generate_database(flask_backend.DB_NAME, users, days=90, seed=48, catalog=flask_backend._game_catalog)
+    print(f"{users} users, {report['sessions']} sessions, {report['alerts']} alerts "
+          f"(generated in {time.perf_counter() - started:.0f}s)")
+    consumer = flask_backend._analytics_consumer
+    store = flask_backend._analytics_store
+    exported = consumer.consume()
+    print(f"backfill: {exported['backfilled']} rows in {exported['duration_seconds']:.1f}s "
+          f"({exported['backfilled'] / exported['duration_seconds']:.0f} rows/s)")
+    conn = sqlite3.connect(flask_backend.DB_NAME)
+    game_ids = [row[0] for row in conn.execute("SELECT id FROM games")]
+
+    print(f"\n{'session writes while analytics run on':<40} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for source in ("nothing", "sqlite", "store"):
+        stop = multiprocessing.Event()
+        reader = None
+        if source != "nothing":
+            reader = multiprocessing.Process(target=_analytics_reader, args=(source, stop))
+            reader.start()
+            time.sleep(0.5)
+        latencies = _write_latencies(users, game_ids, seconds)
+        stop.set()
+        if reader:
+            reader.join()
+        print(f"{source:<40} {np.percentile(latencies, 50):>8.1f} {np.percentile(latencies, 99):>8.1f} {latencies.max():>8.1f}")
+
+    consumed = consumer.consume()
+    user_id = random.Random(1).randint(1, users)
+    store.game_totals()  # warm the partition cache once, as the app's reader would be
+    print(f"\n{'query':<40} {'SQLite ms':>10} {'store ms':>10}")
+    print(f"{'per-game totals, one user':<40} "
+          f"{_timed(lambda: conn.execute(USER_GAMES_SQL, (user_id,)).fetchall()):>10.2f} "
+          f"{_timed(lambda: store.game_totals(user_id)):>10.2f}")
+    print(f"{'per-game totals, everyone':<40} "
+          f"{_timed(lambda: conn.execute(ALL_GAMES_SQL).fetchall()):>10.1f} "
+          f"{_timed(lambda: store.game_totals()):>10.1f}")
+    conn.close()
+
+    without_log = np.median(_write_latencies(users, game_ids, seconds / 2, log_changes=False))
+    with_log = np.median(_write_latencies(users, game_ids, seconds / 2))
+    print(f"\nsession write p50: {without_log:.2f} ms without change log row, {with_log:.2f} ms with")
+    print(f"consumer: {consumed['rows']} changes in {consumed['duration_seconds'] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 5.0,
+    )
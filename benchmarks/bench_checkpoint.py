@@ -0,0 +1,87 @@
+"""
+Benchmark: session journal checkpoints
+======================================
+
+Simulates a long monitoring session ticking at different rates against a
+real journal database (with a simulated clock), "crashes" at random points
+and reads back what recovery would finalize. Reports the rows written per
+tick (write amplification) and the worst seconds of play lost, which must
+stay within the checkpoint interval plus one tick.
+
+Run:
+   python benchmarks/bench_checkpoint.py [session_hours] [interval_seconds]
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_journal import SessionJournal, ensure_schema
+
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _new_journal(workdir, name, interval, clock):
+    db_name = os.path.join(workdir, f"{name}.db")
+    conn = sqlite3.connect(db_name)
+    ensure_schema(conn)
+    conn.close()
+    return SessionJournal(db_name, min_interval=interval, clock=clock)
+
+
+def _run_until_crash(journal, clock, tick, crash_after):
+    """Tick a session for `crash_after` seconds, then return the seconds recovery would lose."""
+    started = clock.now
+    while clock.now - started < crash_after:
+        clock.now += tick
+        journal.checkpoint(1, clock.now - started, "valorant.exe")
+    orphans = journal.orphans()
+    recovered = orphans[0][1] if orphans else 0.0
+    journal.clear(1)
+    return (clock.now - started) - recovered
+
+
+def run(session_hours=2.0, interval=30.0, crashes=25):
+    rng = random.Random(3)
+    workdir = tempfile.mkdtemp(prefix="checkpoint_bench_")
+    session_seconds = session_hours * 3600
+
+    print(f"session {session_hours:g}h, checkpoint interval {interval:g}s, {crashes} simulated crashes per tick rate")
+    print(f"{'tick s':>7} {'ticks':>9} {'writes':>7} {'writes/tick':>12} {'max loss s':>11} {'bound s':>8}")
+    for tick in (0.1, 1.0, 3.0, 10.0):
+        clock = SimulatedClock()
+        journal = _new_journal(workdir, f"tick_{tick}", interval, clock)
+        # Full session with no crash: how many rows hit the disk.
+        _run_until_crash(journal, clock, tick, session_seconds)
+        stats = journal.stats()
+
+        worst = 0.0
+        for _ in range(crashes):
+            crash_journal = _new_journal(workdir, f"crash_{tick}", interval, clock)
+            worst = max(worst, _run_until_crash(crash_journal, clock, tick, rng.uniform(60, session_seconds)))
+
+        bound = interval + tick
+        print(
+            f"{tick:>7g} {stats['ticks']:>9} {stats['writes']:>7} {stats['write_ratio']:>12.4f} "
+            f"{worst:>11.1f} {bound:>8g}{'' if worst <= bound else '  EXCEEDED'}"
+        )
+
+    print("\nWithout the journal a crash loses the whole session (up to "
+          f"{session_seconds:.0f}s here).")
+
+
+if __name__ == "__main__":
+    run(
+        float(sys.argv[1]) if len(sys.argv) > 1 else 2.0,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 30.0,
+    )
@@ -0,0 +1,85 @@
+"""
+Benchmark: learned classifier vs rule-based analyzer
+====================================================
+
+Generates synthetic user-day feature rows, labels them with the rule-based
+GameAddictionAnalyzer, trains RiskClassifier on 80% and reports:
+   - agreement with the rules on the held-out 20%
+   - per-row latency of the rule path vs batched model inference
+   - time to load (memory-map) the saved model file
+
+Run:
+   python benchmarks/bench_classifier.py [rows]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classifier import CLASSES, RiskClassifier
+from model import GameAddictionAnalyzer
+
+
+def synthetic_rows(n_rows, seed=7):
+    rng = np.random.default_rng(seed)
+    hours = rng.gamma(shape=2.0, scale=1.4, size=n_rows)
+    sessions = rng.poisson(lam=np.clip(hours, 0.5, None)) + 1
+    night = rng.binomial(sessions, 0.25)
+    avg_session = hours / sessions
+    return np.column_stack([hours, sessions, night, avg_session]).astype(np.float32)
+
+
+def rule_labels(analyzer, X):
+    return np.array(
+        [
+            CLASSES.index(analyzer.analyze_behavior(h, s, 'yes' if n else 'no')['classification'])
+            for h, s, n, _ in X
+        ]
+    )
+
+
+def run(n_rows=200000):
+    analyzer = GameAddictionAnalyzer()
+    X = synthetic_rows(n_rows)
+
+    start = time.perf_counter()
+    y = rule_labels(analyzer, X)
+    rule_us = (time.perf_counter() - start) / n_rows * 1e6
+
+    split = int(n_rows * 0.8)
+    start = time.perf_counter()
+    model = RiskClassifier.train(X[:split], y[:split])
+    train_s = time.perf_counter() - start
+
+    path = os.path.join(tempfile.mkdtemp(prefix="classifier_bench_"), "risk_model.bin")
+    model.save(path)
+    start = time.perf_counter()
+    loaded = RiskClassifier.load(path)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    X_test, y_test = X[split:], y[split:]
+    start = time.perf_counter()
+    predicted = loaded.predict_batch(X_test)
+    model_us = (time.perf_counter() - start) / len(X_test) * 1e6
+
+    start = time.perf_counter()
+    for row in X_test[:2000]:
+        loaded.classify(*row)
+    single_us = (time.perf_counter() - start) / 2000 * 1e6
+
+    print(f"rows: {n_rows} (train {split}, test {n_rows - split}), model file: {os.path.getsize(path)} bytes")
+    print(f"training time:           {train_s:8.2f} s")
+    print(f"model load (mmap):       {load_ms:8.3f} ms")
+    print(f"rule-based, per row:     {rule_us:8.3f} us")
+    print(f"model batched, per row:  {model_us:8.3f} us")
+    print(f"model single-row call:   {single_us:8.3f} us")
+    print(f"agreement with rules:    {(predicted == y_test).mean():8.1%}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
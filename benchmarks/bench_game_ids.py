@@ -0,0 +1,116 @@
+"""
+Benchmark: game_name text vs interned game_id
+=============================================
+
+Builds a game_history / alerts_log pair in the old layout (raw process name
+on every row), measures file size and a per-game GROUP BY, runs the
+games.py migration and measures again.
+
+Run:
+   python benchmarks/bench_game_ids.py [rows]
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from games import GameCatalog, ensure_schema, migrate_game_names
+
+
+PROCESS_NAMES = [
+    "steam.exe",
+    "steamwebhelper.exe",
+    "valorant-win64-shipping.exe",
+    "riotclientservices.exe",
+    "leagueclient.exe",
+    "dota2.exe",
+    "cs2.exe",
+    "fortniteclient-win64-shipping.exe",
+    "minecraftlauncher.exe",
+    "robloxplayerbeta.exe",
+    "gta5.exe",
+    "efootball.exe",
+    "tslgame.exe (pubg)",
+]
+
+GROUP_QUERY = {
+    "text": "SELECT game_name, SUM(play_seconds), COUNT(*) FROM game_history WHERE user_id = ? GROUP BY game_name",
+    "id": "SELECT game_id, SUM(play_seconds), COUNT(*) FROM game_history WHERE user_id = ? GROUP BY game_id",
+}
+
+
+def _db_size(conn):
+    return conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+
+
+def _group_ms(conn, layout, users=50, repeat=5):
+    """Best of `repeat` runs: 50 per-user GROUP BYs plus one whole-table GROUP BY."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for user_id in range(1, users + 1):
+            conn.execute(GROUP_QUERY[layout], (user_id,)).fetchall()
+        conn.execute(GROUP_QUERY[layout].replace("WHERE user_id = ?", ""), ()).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def run(n_rows=500000):
+    rng = random.Random(5)
+    db_name = os.path.join(tempfile.mkdtemp(prefix="game_ids_bench_"), "users.db")
+    conn = sqlite3.connect(db_name)
+    conn.execute(
+        """CREATE TABLE game_history (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+           game_name TEXT NOT NULL, play_seconds INTEGER NOT NULL, played_at TEXT DEFAULT CURRENT_TIMESTAMP)"""
+    )
+    conn.execute(
+        """CREATE TABLE alerts_log (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+           alert_type TEXT NOT NULL, message TEXT NOT NULL, game_name TEXT, sent_via TEXT,
+           sent_at TEXT DEFAULT CURRENT_TIMESTAMP)"""
+    )
+    conn.execute(
+        """CREATE TABLE game_aggregates (user_id INTEGER NOT NULL, game_name TEXT NOT NULL, day TEXT NOT NULL,
+           total_seconds INTEGER NOT NULL DEFAULT 0, session_count INTEGER NOT NULL DEFAULT 0, last_played TEXT,
+           PRIMARY KEY (user_id, game_name, day))"""
+    )
+    conn.executemany(
+        "INSERT INTO game_history (user_id, game_name, play_seconds) VALUES (?, ?, ?)",
+        ((rng.randint(1, 2000), rng.choice(PROCESS_NAMES), rng.randint(60, 7200)) for _ in range(n_rows)),
+    )
+    conn.executemany(
+        "INSERT INTO alerts_log (user_id, alert_type, message, game_name, sent_via) VALUES (?, ?, ?, ?, ?)",
+        ((rng.randint(1, 2000), "game_detected", "Game detected", rng.choice(PROCESS_NAMES), "email")
+         for _ in range(n_rows // 2)),
+    )
+    conn.execute("CREATE INDEX idx_game_history_user ON game_history(user_id, played_at)")
+    conn.commit()
+    conn.execute("VACUUM")
+
+    before_size = _db_size(conn)
+    before_ms = _group_ms(conn, "text")
+
+    start = time.perf_counter()
+    ensure_schema(conn)
+    migrate_game_names(conn, GameCatalog(db_name))
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_game_history_user ON game_history(user_id, played_at)")
+    conn.commit()
+    migrate_s = time.perf_counter() - start
+    conn.execute("VACUUM")
+
+    after_size = _db_size(conn)
+    after_ms = _group_ms(conn, "id")
+    conn.close()
+
+    print(f"rows: {n_rows} history + {n_rows // 2} alerts, migration took {migrate_s:.2f}s")
+    print(f"{'layout':<10} {'db size MB':>12} {'group-by ms':>12}")
+    print(f"{'game_name':<10} {before_size / 1e6:>12.2f} {before_ms:>12.1f}")
+    print(f"{'game_id':<10} {after_size / 1e6:>12.2f} {after_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
@@ -0,0 +1,101 @@
+"""
+Benchmark: agent event ingestion throughput
+===========================================
+
+Posts gzip-compressed batches of session and detection events from many
+simulated agents to /api/ingest/events (through Flask's test client, so
+the numbers are one process on one core, without network time) and
+reports events per wall-clock second and per CPU second for several batch
+sizes. Batch size 1 is what per-event forwarding costs. Each configuration
+then re-sends its first batch to check that retries are deduplicated.
+
+Run (uses a throw-away database in a temp directory):
+   python benchmarks/bench_ingest.py [events_per_config] [agents]
+"""
+
+import gzip
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="ingest_bench_"))
+os.environ["INGEST_TOKEN"] = "bench-token"
+
+import app as flask_backend  # noqa: E402  (DB_NAME is relative to the temp dir)
+
+GAMES = ["steam.exe", "valorant.exe", "dota2.exe", "cs2.exe", "minecraft.exe", "roblox.exe", "fortnite.exe"]
+HEADERS = {"Authorization": "Bearer bench-token", "Content-Encoding": "gzip", "Content-Type": "application/json"}
+
+
+def _create_users(count):
+    conn = sqlite3.connect(flask_backend.DB_NAME)
+    conn.executemany(
+        "INSERT INTO users (name, email, password) VALUES (?, ?, 'x')",
+        [(f"agent{index}", f"agent{index}@example.com") for index in range(count)],
+    )
+    conn.commit()
+    user_ids = [row[0] for row in conn.execute("SELECT id FROM users")]
+    conn.close()
+    return user_ids
+
+
+def _events(rng, user_ids, count):
+    # Timestamps an hour or more in the past: stored, but too old to send game alerts
+    now = time.time() - 3600
+    events = []
+    for _ in range(count):
+        event = {
+            "event_id": os.urandom(16).hex(),
+            "user_id": rng.choice(user_ids),
+            "game_name": rng.choice(GAMES),
+        }
+        if rng.random() < 0.8:
+            event.update(type="session", play_seconds=rng.randint(60, 7200), ended_at=now - rng.uniform(0, 86400))
+        else:
+            event.update(type="detection", detected=True, at=now - rng.uniform(0, 86400))
+        events.append(event)
+    return events
+
+
+def _post(client, events):
+    body = gzip.compress(json.dumps({"events": events}).encode("utf-8"))
+    response = client.post("/api/ingest/events", data=body, headers=HEADERS)
+    return response.get_json()
+
+
+def _measure(client, rng, user_ids, total_events, batch_size):
+    batches = [_events(rng, user_ids, batch_size) for _ in range(max(1, total_events // batch_size))]
+    accepted = 0
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    for batch in batches:
+        accepted += _post(client, batch)["accepted"]
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    retry = _post(client, batches[0])
+    return accepted, wall, cpu, retry["accepted"] == 0 and retry["duplicates"] == len(batches[0])
+
+
+def run(total_events=20000, agents=500):
+    rng = random.Random(39)
+    user_ids = _create_users(agents)
+    client = flask_backend.app.test_client()
+
+    print(f"{agents} agents, {total_events} events per configuration (80% sessions, 20% detections)")
+    print(f"{'batch':>6} {'events':>8} {'wall s':>8} {'events/s':>10} {'events/cpu-s':>13} {'retry dedup':>12}")
+    for batch_size in (1, 50, 500, 2000):
+        count = min(total_events, 2000) if batch_size == 1 else total_events
+        accepted, wall, cpu, deduped = _measure(client, rng, user_ids, count, batch_size)
+        print(f"{batch_size:>6} {accepted:>8} {wall:>8.2f} {accepted / wall:>10.0f} "
+              f"{accepted / cpu:>13.0f} {'ok' if deduped else 'FAILED':>12}")
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 500,
+    )
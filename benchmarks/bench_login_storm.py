@@ -0,0 +1,88 @@
+"""
+Benchmark: status latency during a login storm
+==============================================
+
+Polls /api/monitor/status from one thread while several threads hammer
+/login, and compares the status latency against an idle baseline. With the
+bounded hashing pool the status percentiles should stay roughly flat.
+
+Run (uses a throw-away database in a temp directory):
+   python benchmarks/bench_login_storm.py [storm_threads] [seconds]
+
+Set PASSWORD_HASH_WORKERS / PASSWORD_HASH_METHOD to compare configurations.
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="login_storm_bench_"))
+
+import app as flask_backend  # noqa: E402  (DB_NAME is relative to the temp dir)
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return 0.0, 0.0, 0.0
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]  # noqa: E731
+    return statistics.median(samples), pick(0.95), pick(0.99)
+
+
+def _poll_status(stop_event, samples):
+    client = flask_backend.app.test_client()
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        client.get("/api/monitor/status")
+        samples.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.01)
+
+
+def _login_loop(stop_event, email, counter):
+    client = flask_backend.app.test_client()
+    while not stop_event.is_set():
+        client.post("/login", data={"email": email, "password": "secret"})
+        counter.append(1)
+
+
+def _measure(seconds, storm_threads):
+    stop_event = threading.Event()
+    samples, logins = [], []
+    threads = [threading.Thread(target=_poll_status, args=(stop_event, samples))]
+    for index in range(storm_threads):
+        threads.append(threading.Thread(target=_login_loop, args=(stop_event, f"user{index}@example.com", logins)))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop_event.set()
+    for thread in threads:
+        thread.join()
+    return _percentiles(samples), len(logins) / seconds
+
+
+def run(storm_threads=16, seconds=5.0):
+    client = flask_backend.app.test_client()
+    for index in range(storm_threads):
+        client.post(
+            "/register",
+            data={"name": f"user{index}", "email": f"user{index}@example.com", "password": "secret"},
+        )
+
+    hasher = flask_backend._password_hasher
+    print(f"hash method: {hasher.method_prefix}, workers: {hasher._executor._max_workers}, cores: {os.cpu_count()}")
+    print(f"{'phase':<14} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'logins/s':>10}")
+    for label, threads in (("idle", 0), (f"storm x{storm_threads}", storm_threads)):
+        (p50, p95, p99), rate = _measure(seconds, threads)
+        print(f"{label:<14} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f} {rate:>10.1f}")
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 16,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 5.0,
+    )
@@ -0,0 +1,70 @@
+"""
+Benchmark: monitor state backends
+=================================
+
+Measures load() (what every /api/monitor/status poll does) and update()
+(start/pause/stop/detection changes) for each backend, and checks that a
+write made in another process is visible to the reader.
+
+Run:
+   python benchmarks/bench_monitor_state.py [iterations]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitor_state import create_monitor_state
+
+
+def _time_per_call(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def _writer_process(backend, db_name, mmap_path):
+    state = create_monitor_state(backend, db_name, mmap_path)
+    state.update(lambda s: s.update(running=True, user_id=42, game_title="valorant.exe", game_detected=True))
+
+
+def run(iterations=20000):
+    workdir = tempfile.mkdtemp(prefix="monitor_state_bench_")
+    print(f"{'backend':<8} {'load us/op':>12} {'update us/op':>14} {'cross-process':>14}")
+    for backend in ("memory", "mmap", "sqlite"):
+        db_name = os.path.join(workdir, f"{backend}.db")
+        mmap_path = os.path.join(workdir, f"{backend}.monitor")
+        state = create_monitor_state(backend, db_name, mmap_path)
+
+        counter = {"n": 0}
+
+        def bump(s):
+            counter["n"] += 1
+            s["elapsed_seconds"] = float(counter["n"])
+
+        load_us = _time_per_call(state.load, iterations)
+        update_iterations = iterations if backend != "sqlite" else max(1, iterations // 10)
+        update_us = _time_per_call(lambda: state.update(bump), update_iterations)
+
+        if backend == "memory":
+            shared = "n/a"
+        else:
+            proc = multiprocessing.Process(target=_writer_process, args=(backend, db_name, mmap_path))
+            proc.start()
+            proc.join()
+            snapshot = state.load()
+            shared = "yes" if snapshot["user_id"] == 42 and snapshot["game_detected"] else "NO"
+
+        print(f"{backend:<8} {load_us:>12.2f} {update_us:>14.2f} {shared:>14}")
+
+    # Status polling budget: 1 poll per second per open dashboard.
+    print("\nAll backends must stay far below 1000 us/op for 1 Hz dashboard polling.")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
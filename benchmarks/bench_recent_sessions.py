@@ -0,0 +1,110 @@
+"""
+Benchmark: memory of per-user recent-session buffers
+====================================================
+
+Holds the last `capacity` sessions of 100k users three ways and measures
+the memory with tracemalloc:
+
+   - rings      : recent_sessions.RecentSessions (one array('I') of
+                  interleaved ended_at / game_id / seconds per user)
+   - dict deque : {user_id: deque(maxlen=capacity)} of plain dicts, the
+                  obvious cache of get_game_history-style rows
+   - tuple deque: the same with (ended_at, game_id, seconds) tuples
+
+and times record() / recent() on the rings.
+
+Run (tracemalloc makes the fill slow; allow a few minutes for 100k users):
+   python benchmarks/bench_recent_sessions.py [users] [capacity]
+"""
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from recent_sessions import RecentSessions, _Ring  # noqa: E402
+
+
+def _sessions(users, capacity):
+    rng = random.Random(42)
+    now = int(time.time())
+    for user_id in range(1, users + 1):
+        for index in range(capacity):
+            yield user_id, now - (capacity - index) * 3600, rng.randint(1, 40), rng.randint(60, 7200)
+
+
+def _measure(build):
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    holder = build()
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return holder, used
+
+
+def _build_rings(users, capacity):
+    store = RecentSessions(":memory:", capacity=capacity, max_users=users)
+    # Install empty rings directly instead of warming each user from a database
+    for user_id in range(1, users + 1):
+        store._rings[user_id] = _Ring(capacity)
+    for user_id, ended_at, game_id, seconds in _sessions(users, capacity):
+        store.record(user_id, ended_at, game_id, seconds)
+    return store
+
+
+def _build_dicts(users, capacity):
+    cache = {}
+    for user_id, ended_at, game_id, seconds in _sessions(users, capacity):
+        rows = cache.get(user_id)
+        if rows is None:
+            rows = cache[user_id] = deque(maxlen=capacity)
+        rows.append({"ended_at": float(ended_at), "game_id": game_id, "play_seconds": seconds})
+    return cache
+
+
+def _build_tuples(users, capacity):
+    cache = {}
+    for user_id, ended_at, game_id, seconds in _sessions(users, capacity):
+        rows = cache.get(user_id)
+        if rows is None:
+            rows = cache[user_id] = deque(maxlen=capacity)
+        rows.append((ended_at, game_id, seconds))
+    return cache
+
+
+def run(users=100000, capacity=32):
+    print(f"{users} users x {capacity} sessions")
+    print(f"{'layout':<12} {'total MB':>9} {'bytes/user':>11}")
+    results = {}
+    for name, build in (("rings", _build_rings), ("dict deque", _build_dicts), ("tuple deque", _build_tuples)):
+        holder, used = _measure(lambda: build(users, capacity))
+        results[name] = holder
+        print(f"{name:<12} {used / 2 ** 20:>9.1f} {used / users:>11.0f}")
+
+    store = results["rings"]
+    print(f"\nRecentSessions.bytes_per_user(): {store.bytes_per_user()} (ring record + array)")
+
+    rng = random.Random(7)
+    now = int(time.time())
+    count = 200000
+    start = time.perf_counter()
+    for _ in range(count):
+        store.record(rng.randint(1, users), now, 3, 900)
+    record_us = (time.perf_counter() - start) / count * 1e6
+    start = time.perf_counter()
+    for _ in range(count):
+        store.recent(rng.randint(1, users), 10)
+    recent_us = (time.perf_counter() - start) / count * 1e6
+    print(f"record(): {record_us:.2f} us   recent(limit=10): {recent_us:.2f} us")
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 32,
+    )
@@ -0,0 +1,76 @@
+"""
+Benchmark: weekly report generation
+===================================
+
+Creates N users with a week of sessions (synthetic.generate_database) and
+builds their weekly reports with reports.WeeklyReportJob:
+
+   - once per worker count (1, 2, 4 processes) into a fresh directory,
+     printing users/s
+   - once interrupted after the first chunks and then re-run, to show the
+     second run resuming from the checkpoint instead of starting over
+
+Worker counts above the number of CPUs only add process overhead.
+
+Run (uses a throw-away database in a temp directory):
+   python benchmarks/bench_reports.py [users]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="reports_bench_"))
+
+import app as flask_backend  # noqa: E402  (DB_NAME is relative to the temp dir)
+from reports import WeeklyReportJob, week_bounds  # noqa: E402
+from synthetic import generate_database  # noqa: E402
+
+WEEK_ENDING = "2026-10-19"
+
+
+def _fill(users):
+    since = week_bounds(WEEK_ENDING)[0]
+    report = generate_database(flask_backend.DB_NAME, users, days=7, seed=43, start=since, catalog=flask_backend._game_catalog)
+    return report["sessions"]
+
+
+class _StopAfter:
+    """deliver() that raises KeyboardInterrupt after `limit` reports, like Ctrl+C mid-run."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.seen = 0
+
+    def __call__(self, summary):
+        self.seen += 1
+        if self.seen >= self.limit:
+            raise KeyboardInterrupt
+
+
+def run(users=5000):
+    sessions = _fill(users)
+    print(f"{users} users, {sessions} sessions in week {week_bounds(WEEK_ENDING)[2]} ({os.cpu_count()} CPUs)")
+    print(f"{'workers':>8} {'chunk':>6} {'seconds':>8} {'users/s':>8}")
+    for workers in (1, 2, 4):
+        shutil.rmtree("reports", ignore_errors=True)
+        report = WeeklyReportJob(flask_backend.DB_NAME, "reports", WEEK_ENDING, workers, chunk_size=250).run()
+        print(f"{workers:>8} {250:>6} {report['duration_seconds']:>8.2f} {report['users_per_sec']:>8}")
+
+    shutil.rmtree("reports", ignore_errors=True)
+    print("\ninterrupt after ~40% of the users, then run again:")
+    try:
+        WeeklyReportJob(flask_backend.DB_NAME, "reports", WEEK_ENDING, 2, 250, deliver=_StopAfter(users * 2 // 5)).run()
+    except KeyboardInterrupt:
+        pass
+    report = WeeklyReportJob(flask_backend.DB_NAME, "reports", WEEK_ENDING, 2, 250).run()
+    files = len([name for name in os.listdir(os.path.join("reports", report["week"])) if name.endswith(".html")])
+    print(f"resumed after user {report['resumed_from']}, built {report['built']} more; "
+          f"{report['reports']} reports in the checkpoint, {files} files on disk")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
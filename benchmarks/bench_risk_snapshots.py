@@ -0,0 +1,137 @@
+"""
+Benchmark: nightly risk snapshots for a large population
+========================================================
+
+Fills a database with N users (1M by default) and a week of sessions,
+then times:
+
+   - per-user  : the straightforward job, one game_history query and one
+                 analyze_behavior() call per user (timed on a sample and
+                 extrapolated to all users)
+   - vectorized: risk_snapshots.RiskSnapshotJob (batched reads into NumPy,
+                 score_batch(), one bulk insert), split into phases
+
+and the "users by class on a day" / "moved to Addicted" queries on the
+result.
+
+Run (uses a throw-away database in a temp directory; filling 1M users
+takes a few minutes):
+   python benchmarks/bench_risk_snapshots.py [users]
+"""
+
+import calendar
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="risk_snapshots_bench_"))
+os.environ.setdefault("RISK_SNAPSHOTS", "0")
+os.environ.setdefault("RETENTION_INTERVAL_HOURS", "0")
+
+import app as flask_backend  # noqa: E402  (DB_NAME is relative to the temp dir)
+from model import GameAddictionAnalyzer, RollingRiskScorer  # noqa: E402
+from risk_snapshots import RiskSnapshotJob, moved_to, users_by_class  # noqa: E402
+
+DAY = "2026-10-18"
+BATCH_USERS = 50000
+
+
+def _fill(users):
+    """Users plus 8 days of sessions, inserted in time order as a live server would."""
+    rng = np.random.default_rng(44)
+    game_ids = np.array([flask_backend._game_catalog.resolve(title) for title in ("Minecraft", "Fortnite", "Valorant", "Roblox")])
+    conn = sqlite3.connect(flask_backend.DB_NAME)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executemany(
+        "INSERT INTO users (id, name, email, password) VALUES (?, ?, ?, 'x')",
+        ((user_id, f"user{user_id}", f"user{user_id}@example.com") for user_id in range(1, users + 1)),
+    )
+    # Most users play a little, one in five plays a lot
+    daily_sessions = np.where(rng.random(users) < 0.2, 2.0, 0.4)
+    first_day = calendar.timegm(time.strptime(DAY, "%Y-%m-%d")) - 7 * 86400
+    sessions = 0
+    for day in range(8):
+        counts = rng.poisson(daily_sessions)
+        user_ids = np.repeat(np.arange(1, users + 1), counts)
+        ended = first_day + day * 86400 + rng.integers(0, 86400, len(user_ids))
+        order = np.argsort(ended, kind="stable")
+        played_at = np.char.replace(np.datetime_as_string(ended[order].astype("datetime64[s]")), "T", " ")
+        conn.executemany(
+            "INSERT INTO game_history (user_id, game_id, play_seconds, played_at) VALUES (?, ?, ?, ?)",
+            zip(user_ids[order].tolist(), rng.choice(game_ids, len(order)).tolist(),
+                rng.integers(300, 10800, len(order)).tolist(), played_at.tolist()),
+        )
+        conn.commit()
+        sessions += len(order)
+    conn.execute(
+        """INSERT INTO game_aggregates (user_id, game_id, day, total_seconds, session_count, last_played)
+           SELECT user_id, game_id, date(played_at), SUM(play_seconds), COUNT(*), MAX(played_at)
+           FROM game_history GROUP BY user_id, game_id, date(played_at) ORDER BY date(played_at)"""
+    )
+    conn.commit()
+    conn.close()
+    return sessions
+
+
+def _per_user(conn, user_ids, analyzer, night_rule):
+    end = calendar.timegm(time.strptime(DAY, "%Y-%m-%d")) + 86400
+    since = time.strftime("%Y-%m-%d", time.gmtime(end - 7 * 86400))
+    until = time.strftime("%Y-%m-%d", time.gmtime(end))
+    for user_id in user_ids:
+        seconds = count = night = 0
+        for play_seconds, played_at in conn.execute(
+            "SELECT play_seconds, played_at FROM game_history WHERE user_id = ? AND played_at >= ? AND played_at < ?",
+            (user_id, since, until),
+        ):
+            ended = calendar.timegm(time.strptime(played_at, "%Y-%m-%d %H:%M:%S"))
+            seconds += play_seconds
+            count += 1
+            night += night_rule.is_night_session(ended - play_seconds, ended)
+        analyzer.analyze_behavior(seconds / 3600 / 7, count / 7, "yes" if night else "no")
+
+
+def run(users=1000000):
+    started = time.perf_counter()
+    sessions = _fill(users)
+    print(f"{users} users, {sessions} sessions (filled in {time.perf_counter() - started:.0f}s)")
+
+    conn = sqlite3.connect(flask_backend.DB_NAME)
+    sample = random.Random(1).sample(range(1, users + 1), min(users, 20000))
+    start = time.perf_counter()
+    _per_user(conn, sample, GameAddictionAnalyzer(), RollingRiskScorer())
+    per_user = (time.perf_counter() - start) / len(sample) * users
+
+    job = RiskSnapshotJob(flask_backend.DB_NAME)
+    job.run("2026-10-17")
+    report = job.run(DAY)
+    print(f"\n{'job':<12} {'seconds':>8} {'users/s':>9}")
+    print(f"{'per-user':<12} {per_user:>8.1f} {users / per_user:>9.0f}   (extrapolated from {len(sample)} users)")
+    print(f"{'vectorized':<12} {report['duration_seconds']:>8.1f} {report['users_per_sec']:>9}   "
+          f"(features {report['features_seconds']}s, score {report['score_seconds']}s, write {report['write_seconds']}s)")
+    print(f"classes on {DAY}: {report['classes']}")
+
+    for label, query in (
+        ("users by class (Addicted)", lambda: users_by_class(conn, DAY, "Addicted")),
+        ("moved to Addicted", lambda: moved_to(conn, DAY, "Addicted")),
+    ):
+        start = time.perf_counter()
+        found = query()
+        print(f"{label}: {len(found)} users in {(time.perf_counter() - start) * 1000:.0f} ms")
+    try:
+        size = conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE '%risk_snapshots%'").fetchone()[0]
+        print(f"risk_snapshots table + index: {size / 2 ** 20:.1f} MB for 2 days ({size / (2 * users):.0f} bytes/row)")
+    except sqlite3.OperationalError:
+        pass  # SQLite built without the dbstat table
+    conn.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
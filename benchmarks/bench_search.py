@@ -0,0 +1,152 @@
+"""
+Benchmark: FTS5 search vs LIKE scans
+====================================
+
+Fills a database with synthetic users (20000 by default, about 3.6M alerts
+and 1.9M game sessions over 90 days) and times the same searches twice:
+
+   - LIKE : message LIKE '%...%' on alerts_log, title LIKE '%...%' joined
+            to game_history
+   - FTS5 : search.search_alerts() / search.search_history()
+
+It also reports the index size and what the sync triggers add to inserts.
+
+Run (uses a throw-away database in a temp directory):
+   python benchmarks/bench_search.py [users]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="search_bench_"))
+os.environ.setdefault("RISK_SNAPSHOTS", "0")
+os.environ.setdefault("RETENTION_INTERVAL_HOURS", "0")
+
+import app as flask_backend  # noqa: E402  (DB_NAME is relative to the temp dir)
+import search  # noqa: E402
+from synthetic import generate_database  # noqa: E402
+
+REPEAT = 5
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        result = fn()
+    return (time.perf_counter() - started) / REPEAT * 1000, result
+
+
+def _like_alerts(conn, word, user_id=None, since=None, until=None):
+    low, high = search._day_bounds(since, until)
+    where, params = "message LIKE ?", [f"%{word}%"]
+    if user_id is not None:
+        where += " AND user_id = ?"
+        params.append(user_id)
+    if low:
+        where += " AND sent_at >= ? AND sent_at < ?"
+        params += [low, high]
+    total = conn.execute(f"SELECT COUNT(*) FROM alerts_log WHERE {where}", params).fetchone()[0]
+    conn.execute(f"SELECT * FROM alerts_log WHERE {where} ORDER BY sent_at DESC LIMIT 20", params).fetchall()
+    return total
+
+
+def _like_history(conn, word, user_id=None):
+    where, params = "g.title LIKE ?", [f"%{word}%"]
+    if user_id is not None:
+        where += " AND h.user_id = ?"
+        params.append(user_id)
+    sql = f"FROM game_history h JOIN games g ON g.id = h.game_id WHERE {where}"
+    total = conn.execute(f"SELECT COUNT(*) {sql}", params).fetchone()[0]
+    conn.execute(f"SELECT h.* {sql} ORDER BY h.played_at DESC LIMIT 20", params).fetchall()
+    return total
+
+
+def _index_mb(conn):
+    try:
+        size = conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE 'alerts_fts%' OR name LIKE 'games_fts%'").fetchone()[0]
+    except sqlite3.OperationalError:
+        return float("nan")
+    return (size or 0) / 2 ** 20
+
+
+def _insert_ms(conn, rows):
+    started = time.perf_counter()
+    conn.executemany(
+        "INSERT INTO alerts_log (user_id, alert_type, message, sent_at) VALUES (1, 'bench', ?, '2030-01-01 00:00:00')",
+        ((f"Play time threshold of 30 minutes reached ({n} this session)",) for n in range(rows)),
+    )
+    conn.commit()
+    elapsed = (time.perf_counter() - started) * 1000
+    conn.execute("DELETE FROM alerts_log WHERE alert_type = 'bench'")
+    conn.commit()
+    return elapsed
+
+
+def run(users=20000):
+    started = time.perf_counter()
+    report = generate_database(flask_backend.DB_NAME, users, days=90, seed=46, catalog=flask_backend._game_catalog)
+    print(f"{users} users, {report['alerts']} alerts, {report['sessions']} sessions "
+          f"(generated and indexed in {time.perf_counter() - started:.0f}s)")
+
+    conn = sqlite3.connect(flask_backend.DB_NAME)
+    user_id = conn.execute(
+        "SELECT user_id FROM alerts_log WHERE game_id = (SELECT id FROM games WHERE title = 'Valorant') LIMIT 1"
+    ).fetchone()[0]
+    last_month = ("2026-03-01", "2026-03-31")
+
+    cases = [
+        ("alerts 'valorant', one user",
+         lambda: _like_alerts(conn, "valorant", user_id),
+         lambda: search.search_alerts(conn, "valorant", user_id)["total"]),
+        ("alerts 'valorant', one user, March",
+         lambda: _like_alerts(conn, "valorant", user_id, *last_month),
+         lambda: search.search_alerts(conn, "valorant", user_id, *last_month)["total"]),
+        ("alerts 'valorant', everyone, March",
+         lambda: _like_alerts(conn, "valorant", None, *last_month),
+         lambda: search.search_alerts(conn, "valorant", None, *last_month)["total"]),
+        ("alerts 'valo*' (prefix), one user",
+         lambda: _like_alerts(conn, "valo", user_id),
+         lambda: search.search_alerts(conn, "valo*", user_id)["total"]),
+        ("alerts 'threshold', one user",
+         lambda: _like_alerts(conn, "threshold", user_id),
+         lambda: search.search_alerts(conn, "threshold", user_id)["total"]),
+        ("history 'valorant', one user",
+         lambda: _like_history(conn, "valorant", user_id),
+         lambda: search.search_history(conn, "valorant", user_id)["total"]),
+        ("history 'league', everyone",
+         lambda: _like_history(conn, "league"),
+         lambda: search.search_history(conn, "league")["total"]),
+    ]
+
+    print(f"\n{'search':<36} {'LIKE ms':>9} {'FTS5 ms':>9} {'speed-up':>9} {'rows':>8}")
+    for name, like, fts in cases:
+        like_ms, like_rows = _timed(like)
+        fts_ms, fts_rows = _timed(fts)
+        check = "" if like_rows == fts_rows else f"  (LIKE found {like_rows})"
+        print(f"{name:<36} {like_ms:>9.1f} {fts_ms:>9.1f} {like_ms / fts_ms:>8.0f}x {fts_rows:>8}{check}")
+
+    with_triggers = _insert_ms(conn, 10000)
+    triggers = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'alerts_log'").fetchall()
+    conn.execute("DROP TRIGGER alerts_fts_insert")
+    conn.execute("DROP TRIGGER alerts_fts_delete")
+    conn.execute("DROP TRIGGER alerts_fts_update")
+    without_triggers = _insert_ms(conn, 10000)
+    for (sql,) in triggers:
+        conn.execute(sql)
+    conn.commit()
+
+    started = time.perf_counter()
+    search.rebuild(conn)
+    conn.commit()
+    print(f"\nindex size: {_index_mb(conn):.1f} MB, full rebuild: {time.perf_counter() - started:.1f}s")
+    print(f"10000 alert inserts: {with_triggers:.0f} ms with sync triggers, {without_triggers:.0f} ms without")
+    conn.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
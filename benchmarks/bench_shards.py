@@ -0,0 +1,107 @@
+"""
+Benchmark: session write throughput vs. shard count
+===================================================
+
+Generates one synthetic database (2000 users, 30 days by default), copies it
+once per configuration and splits the copy with shards.split(). Then
+WRITERS processes record finished sessions for random users for DURATION
+seconds each, the way the app does: route to the user's shard, clear the
+journal row and update stats / history / aggregates in one transaction.
+
+   - shards 0: the unsharded users.db (every writer waits for one lock)
+   - shards N: users spread over N files by user_id % N
+
+Reported per configuration: sessions committed per second and commit
+latency (p50 / p99) as seen by the writers, including lock waits.
+
+Run (uses throw-away databases in a temp directory):
+   python benchmarks/bench_shards.py [users] [writers] [seconds]
+"""
+
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="shards_bench_"))
+os.environ.setdefault("RISK_SNAPSHOTS", "0")
+os.environ.setdefault("RETENTION_INTERVAL_HOURS", "0")
+
+import app as flask_backend  # noqa: E402  (DB_NAME is relative to the temp dir)
+import shards  # noqa: E402
+from monitor_core import record_session  # noqa: E402
+from synthetic import generate_database  # noqa: E402
+
+SHARD_COUNTS = (0, 1, 2, 4, 8)
+
+
+def _writer(db_name, users, game_ids, seconds, seed, results):
+    rng = random.Random(seed)
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        user_id = rng.randint(1, users)
+        started = time.perf_counter()
+        conn = shards.connect(db_name, user_id, timeout=30)
+        conn.execute("DELETE FROM monitor_journal WHERE user_id = ?", (user_id,))
+        record_session(conn, user_id, rng.randint(60, 7200), rng.choice(game_ids),
+                       time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()))
+        conn.commit()
+        conn.close()
+        latencies.append(time.perf_counter() - started)
+    results.put(latencies)
+
+
+def _measure(db_name, users, game_ids, writers, seconds):
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=_writer, args=(db_name, users, game_ids, seconds, seed, results))
+        for seed in range(writers)
+    ]
+    for proc in procs:
+        proc.start()
+    latencies = np.concatenate([results.get() for _ in procs]) * 1000
+    for proc in procs:
+        proc.join()
+    return len(latencies) / seconds, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def run(users=2000, writers=8, seconds=5.0):
+    started = time.perf_counter()
+    report = generate_database(flask_backend.DB_NAME, users, days=30, seed=47, catalog=flask_backend._game_catalog)
+    print(f"{users} users, {report['sessions']} sessions, {report['alerts']} alerts "
+          f"(generated in {time.perf_counter() - started:.0f}s); "
+          f"{writers} writer processes, {seconds:.0f}s per configuration, {os.cpu_count()} CPUs")
+    conn = sqlite3.connect(flask_backend.DB_NAME)
+    game_ids = [row[0] for row in conn.execute("SELECT id FROM games")]
+    conn.close()
+
+    print(f"\n{'shards':>6} {'split s':>8} {'sessions/s':>11} {'p50 ms':>8} {'p99 ms':>8} {'vs 0':>7}")
+    baseline = None
+    for count in SHARD_COUNTS:
+        folder = os.path.abspath(f"shards{count}")
+        os.makedirs(folder)
+        db_name = os.path.join(folder, "users.db")
+        shutil.copy(flask_backend.DB_NAME, db_name)
+        split_seconds = shards.split(db_name, count)["duration_seconds"] if count else 0.0
+
+        rate, p50, p99 = _measure(db_name, users, game_ids, writers, seconds)
+        baseline = baseline or rate
+        print(f"{count:>6} {split_seconds:>8.2f} {rate:>11.0f} {p50:>8.1f} {p99:>8.1f} {rate / baseline:>6.2f}x")
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 8,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 5.0,
+    )
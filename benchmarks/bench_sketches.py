@@ -0,0 +1,54 @@
+"""
+Benchmark: KLL quantile sketch
+==============================
+
+Streams synthetic session lengths into a KLLSketch and reports update and
+query cost plus the worst rank error against the exact answer.
+
+Run:
+   python benchmarks/bench_sketches.py [values]
+"""
+
+import os
+import random
+import sys
+import time
+from bisect import bisect_right
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sketches import KLLSketch
+
+
+def run(n_values=1000000):
+    rng = random.Random(11)
+    values = [int(rng.lognormvariate(7.5, 0.9)) for _ in range(n_values)]
+
+    sketch = KLLSketch(seed=3)
+    start = time.perf_counter()
+    for value in values:
+        sketch.update(value)
+    update_us = (time.perf_counter() - start) / n_values * 1e6
+
+    exact = sorted(values)
+    probes = [exact[int(q * (n_values - 1))] for q in [i / 100 for i in range(1, 100)]]
+
+    sketch.rank(probes[0])  # build the query cache once
+    start = time.perf_counter()
+    for _ in range(100):
+        for probe in probes:
+            sketch.rank(probe)
+    rank_us = (time.perf_counter() - start) / (100 * len(probes)) * 1e6
+
+    worst = max(abs(sketch.rank(probe) - bisect_right(exact, probe) / n_values) for probe in probes)
+    stored = sum(len(items) for items in sketch.compactors)
+
+    print(f"values streamed:   {n_values}")
+    print(f"items retained:    {stored} ({len(sketch.compactors)} levels)")
+    print(f"update:            {update_us:8.3f} us/value")
+    print(f"rank query:        {rank_us:8.3f} us")
+    print(f"worst rank error:  {worst * 100:8.3f} %")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,180 @@
+"""
+Benchmark: offline event spool under sink outages
+=================================================
+
+Exercises spool.EventSpool the way the agent and app use it:
+
+   1. append rate, with and without an fsync per event
+   2. outage: a producer keeps emitting session events while the sink is
+      down for part of the run; reports the peak backlog, replay rate once
+      the sink is back, and checks nothing was lost or delivered twice
+      (the sink dedupes by event_id, as /api/ingest/events does)
+   3. database outage: agent.SqliteSink against a real app database whose
+      file becomes unreachable, then reachable again; checks the stored
+      totals
+   4. crash: a child process appending in a tight loop is killed with
+      SIGKILL; the reopened spool must hold an unbroken prefix of events
+
+Run (uses throw-away files in a temp directory):
+   python benchmarks/bench_spool.py [events]
+"""
+
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+WORKDIR = tempfile.mkdtemp(prefix="spool_bench_")
+os.chdir(WORKDIR)
+
+from monitor_core import new_session_event  # noqa: E402
+from spool import EventSpool  # noqa: E402
+
+CRASH_WRITER = """
+import sys
+sys.path.insert(0, {root!r})
+from spool import EventSpool
+spool = EventSpool({path!r}, capacity_bytes=64 * 1024 * 1024)
+print("ready", flush=True)
+index = 0
+while True:
+    spool.append({{"event_id": "crash%08d" % index, "seq": index}})
+    index += 1
+"""
+
+
+def _append_rate(events, fsync):
+    spool = EventSpool(os.path.join(WORKDIR, f"rate_{fsync}.bin"), capacity_bytes=64 * 1024 * 1024, fsync=fsync)
+    now = time.time()
+    start = time.perf_counter()
+    for index in range(events):
+        spool.append(new_session_event(1, "steam.exe", 60 + index % 3600, now))
+    seconds = time.perf_counter() - start
+    spool.close()
+    return events / seconds
+
+
+class FlakySink:
+    """Sink that raises while `down` is set and dedupes deliveries by event_id."""
+
+    def __init__(self):
+        self.down = False
+        self.seen = set()
+        self.duplicates = 0
+
+    def __call__(self, events):
+        if self.down:
+            raise ConnectionError("sink unreachable")
+        for event in events:
+            if event["event_id"] in self.seen:
+                self.duplicates += 1
+            self.seen.add(event["event_id"])
+
+
+def _outage(events):
+    spool = EventSpool(os.path.join(WORKDIR, "outage.bin"), capacity_bytes=16 * 1024 * 1024)
+    sink = FlakySink()
+    produced, peak_backlog, recovery = [], 0, None
+    now = time.time()
+    for index in range(events):
+        # Sink down for the middle 60% of the run
+        sink.down = events * 0.2 <= index < events * 0.8
+        event = new_session_event(1 + index % 50, "valorant.exe", 60, now)
+        produced.append(event["event_id"])
+        spool.append(event)
+        if index % 10 == 0:
+            report = spool.replay(sink)  # an agent flushes every tick
+            if recovery is None and report["events"] > 1000:
+                recovery = report
+        peak_backlog = max(peak_backlog, len(spool))
+    spool.replay(sink)
+    stats = spool.stats()
+    spool.close()
+    lost = len(set(produced) - sink.seen)
+    return peak_backlog, recovery, stats, lost, sink.duplicates
+
+
+def _database_outage(sessions):
+    """agent.SqliteSink with the database file going away mid-run (like an unplugged share)."""
+    env = dict(os.environ, RETENTION_INTERVAL_HOURS="0")
+    subprocess.run(
+        [sys.executable, "-c",
+         f"import sys; sys.path.insert(0, {ROOT!r}); import app, sqlite3; c = sqlite3.connect('users.db'); "
+         "c.execute(\"INSERT INTO users (name, email, password) VALUES ('bench', 'bench@example.com', 'x')\"); "
+         "c.commit(); import os; os._exit(0)"],
+        cwd=WORKDIR, env=env, check=True, stdout=subprocess.DEVNULL,
+    )
+    import agent
+
+    sink = agent.SqliteSink("users.db", EventSpool("db_outage.bin"))
+    sink.retry_seconds = 0
+    now = time.time()
+    peak_spooled = 0
+    for index in range(sessions):
+        outage = sessions // 4 <= index < sessions * 3 // 4
+        # An unreachable directory stands in for the lost share
+        sink.db_name = sink.journal.db_name = "offline/users.db" if outage else "users.db"
+        sink.record(new_session_event(1, "dota2.exe", 100, now - sessions + index))
+        if not outage:
+            sink.flush()
+        peak_spooled = max(peak_spooled, len(sink.spool))
+    sink.flush()
+    conn = sqlite3.connect("users.db")
+    total_seconds, total_sessions = conn.execute(
+        "SELECT total_play_seconds, total_sessions FROM user_monitor_stats WHERE user_id = 1"
+    ).fetchone()
+    conn.close()
+    return peak_spooled, total_sessions, total_seconds, len(sink.spool)
+
+
+def _crash():
+    path = os.path.join(WORKDIR, "crash.bin")
+    child = subprocess.Popen(
+        [sys.executable, "-c", CRASH_WRITER.format(root=ROOT, path=path)], stdout=subprocess.PIPE, text=True
+    )
+    child.stdout.readline()
+    time.sleep(0.5)
+    child.send_signal(signal.SIGKILL)
+    child.wait()
+
+    spool = EventSpool(path)
+    events, _ = spool.peek(max_events=10 ** 9)
+    spool.close()
+    intact = [event["seq"] for event in events] == list(range(len(events)))
+    return len(events), intact
+
+
+def run(events=100000):
+    print(f"{'append mode':<16} {'events/s':>10}")
+    for fsync in (False, True):
+        count = events if not fsync else min(events, 2000)
+        print(f"{'fsync per event' if fsync else 'page cache':<16} {_append_rate(count, fsync):>10.0f}")
+
+    peak, report, stats, lost, duplicates = _outage(events)
+    print()
+    print(f"outage: {events} events, sink down for 60% of the run")
+    print(f"   peak backlog        {peak} events")
+    print(f"   replay on recovery  {report['events']} events in {report['batches']} batches, "
+          f"{report['events_per_sec']} events/s")
+    print(f"   backlog after       {stats['backlog_events']} events, {stats['dropped_events']} dropped")
+    print(f"   lost / duplicates   {lost} / {duplicates}")
+
+    spooled, total_sessions, total_seconds, left = _database_outage(200)
+    print()
+    print("database outage: 200 sessions of 100s, database unreachable for the middle half")
+    print(f"   spooled during outage  {spooled}")
+    print(f"   stored after replay    {total_sessions} sessions, {total_seconds}s (expected 200, 20000s)")
+    print(f"   still spooled          {left}")
+
+    recovered, intact = _crash()
+    print()
+    print(f"crash: writer killed with SIGKILL, {recovered} events recovered, prefix intact: {intact}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
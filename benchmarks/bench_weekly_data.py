@@ -0,0 +1,107 @@
+"""
+Benchmark: /weekly-data for users with many sessions
+====================================================
+
+Fills game_history with one heavy user (100k+ sessions over the last 90
+days by default) and times the activity buckets for every range and
+granularity three ways:
+
+   - loop      : read the range and bucket each row in a Python loop
+                 (attributing each session to the bucket it ended in)
+   - vectorized: activity.compute_activity (one range query, pandas edges,
+                 NumPy searchsorted / cumsum; sessions split across buckets)
+   - cached    : ActivityCache.get after the first call
+
+Run (uses a throw-away database in a temp directory):
+   python benchmarks/bench_weekly_data.py [sessions]
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="weekly_data_bench_"))
+
+import app as flask_backend  # noqa: E402  (DB_NAME is relative to the temp dir)
+from activity import GRANULARITIES, RANGE_DAYS, ActivityCache, bucket_edges, compute_activity  # noqa: E402
+
+
+def _fill(sessions, now):
+    rng = random.Random(41)
+    game_id = flask_backend._game_catalog.resolve("steam.exe")
+    conn = sqlite3.connect(flask_backend.DB_NAME)
+    conn.executemany(
+        "INSERT INTO users (name, email, password) VALUES (?, ?, 'x')",
+        [("heavy", "heavy@example.com"), ("other", "other@example.com")],
+    )
+    rows = []
+    for user_id, count in ((1, sessions), (2, sessions // 4)):
+        for _ in range(count):
+            ended = now - rng.uniform(0, 90 * 86400)
+            rows.append((user_id, game_id, rng.randint(30, 5400),
+                         time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(ended))))
+    conn.executemany("INSERT INTO game_history (user_id, game_id, play_seconds, played_at) VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+    return conn
+
+
+def _loop(conn, user_id, days, granularity, now):
+    edges = bucket_edges(days, granularity, now)
+    starts = [edge.to_pydatetime() for edge in edges]
+    totals = [0] * (len(starts) - 1)
+    first = starts[0].strftime("%Y-%m-%d %H:%M:%S")
+    for played_at, play_seconds in conn.execute(
+        "SELECT played_at, play_seconds FROM game_history WHERE user_id = ? AND played_at >= ?", (user_id, first)
+    ):
+        ended = datetime.strptime(played_at, "%Y-%m-%d %H:%M:%S")
+        for index in range(len(totals)):
+            if starts[index] <= ended < starts[index + 1]:
+                totals[index] += play_seconds
+                break
+    return totals
+
+
+def _timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run(sessions=100000):
+    now = time.time()
+    conn = _fill(sessions, now)
+    cache = ActivityCache(flask_backend.DB_NAME)
+    in_range = conn.execute("SELECT COUNT(*) FROM game_history WHERE user_id = 1").fetchone()[0]
+    print(f"user with {in_range} sessions in the last 90 days (+{sessions // 4} for another user)")
+    print(f"{'range':>6} {'granularity':>12} {'buckets':>8} {'loop ms':>9} {'vector ms':>10} {'cached ms':>10} {'speed-up':>9}")
+    for days in RANGE_DAYS:
+        for granularity in GRANULARITIES:
+            buckets = len(bucket_edges(days, granularity, now)) - 1
+            loop_ms = _timed(lambda: _loop(conn, 1, days, granularity, now), repeat=1)
+            vector_ms = _timed(lambda: compute_activity(conn, 1, days, granularity, 0, now))
+            cache.get(1, days, granularity, 0, now)
+            cached_ms = _timed(lambda: cache.get(1, days, granularity, 0, now), repeat=100)
+            print(f"{days:>6} {granularity:>12} {buckets:>8} {loop_ms:>9.1f} {vector_ms:>10.1f} "
+                  f"{cached_ms:>10.3f} {loop_ms / vector_ms:>8.1f}x")
+
+    # Hours agree with the loop where sessions fit in one bucket (weeks), up to the split at the edges
+    vector = compute_activity(conn, 1, 90, "week", 0, now)
+    loop = _loop(conn, 1, 90, "week", now)
+    drift = abs(vector["total_hours"] - sum(loop) / 3600)
+    print(f"\n90-day weekly total: vectorized {vector['total_hours']} h, loop {sum(loop) / 3600:.2f} h "
+          f"(difference {drift:.2f} h from sessions crossing the range start)")
+    print(f"cache: {cache.stats()}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
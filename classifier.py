@@ -0,0 +1,186 @@
+"""
+Learned Risk Classifier
+=======================
+
+Optional learned companion to the rule-based GameAddictionAnalyzer: a small
+multinomial logistic regression written with NumPy.
+
+   - Features are the 7-day window averages analyze_recent() scores at
+     inference (GameAddictionAnalyzer.window_features), taken after each
+     user's last session of every day played (see FEATURES).
+   - user_monitor_stats is not a feature source: it holds one row of
+     lifetime totals per user as of now, so a training row for an earlier
+     day would see sessions played after it, and analyze_recent() has no
+     such totals to score. Its per-user averages are already in the 7-day
+     window rebuilt from game_history.
+   - Labels come from the existing rule-based classification of the same
+     window, so the model learns the rules from real data and produces
+     calibrated probabilities.
+   - Weights are saved in a compact little-endian float32 file that is
+     memory-mapped on load (no parsing, near-instant start-up).
+   - predict_batch() scores many rows with one matrix multiply.
+
+Usage:
+   python classifier.py train users.db risk_model.bin
+   python classifier.py info risk_model.bin
+"""
+
+import calendar
+import struct
+import sys
+import time
+
+import numpy as np
+
+import shards
+from model import GameAddictionAnalyzer, RollingRiskScorer
+
+
+CLASSES = ("Normal", "At Risk", "Addicted")
+FEATURES = ("hours_per_day", "sessions_per_day", "night_sessions_per_day", "avg_session_hours")
+
+# magic, format version, number of features, number of classes
+_HEADER = struct.Struct("<4sHHH")
+_MAGIC = b"GAMC"
+_VERSION = 2  # 1: per-day features, no longer what analyze_recent() scores
+# Pad the header so the float32 payload starts 4-byte aligned.
+_HEADER_SIZE = 12
+
+
+def load_training_data(db_name, analyzer=None):
+    """
+    Build (X, y) from the database: one row per user per day played.
+
+    Each user's sessions are replayed through a RollingRiskScorer and a row
+    is taken after their last session of the day, so X holds exactly what
+    analyze_recent() would have scored then. y holds indices into CLASSES,
+    taken from the rule-based analyzer on the same window.
+    """
+    analyzer = analyzer or GameAddictionAnalyzer()
+    conn = shards.connect(db_name)
+    c = conn.cursor()
+    c.execute("SELECT user_id, play_seconds, played_at FROM game_history ORDER BY user_id, played_at")
+
+    rows, labels = [], []
+
+    def snapshot(scorer, user_id, ended_at):
+        week = scorer.get_windows(user_id, ended_at)["7d"]
+        rows.append(analyzer.window_features(week))
+        result = analyzer.analyze_behavior(
+            week["play_seconds"] / 3600 / 7, week["session_count"] / 7, 'yes' if week["night_sessions"] else 'no'
+        )
+        labels.append(CLASSES.index(result['classification']))
+
+    scorer, last = None, None  # last: (user_id, local day, ended_at) of the previous session
+    for user_id, seconds, played_at in c:
+        ended_at = calendar.timegm(time.strptime(played_at, "%Y-%m-%d %H:%M:%S"))
+        day = time.strftime("%Y-%m-%d", time.localtime(ended_at))
+        if last is not None and (user_id, day) != last[:2]:
+            snapshot(scorer, last[0], last[2])
+        if last is None or user_id != last[0]:
+            scorer = RollingRiskScorer()
+        scorer.record_session(user_id, seconds, ended_at)
+        last = (user_id, day, ended_at)
+    if last is not None:
+        snapshot(scorer, last[0], last[2])
+    conn.close()
+
+    X = np.array(rows, dtype=np.float32).reshape(len(rows), len(FEATURES))
+    y = np.array(labels, dtype=np.int64)
+    return X, y
+
+
+class RiskClassifier:
+    """Multinomial logistic regression over FEATURES."""
+
+    def __init__(self, mean, std, weights, bias):
+        self.mean = mean
+        self.std = std
+        self.weights = weights
+        self.bias = bias
+
+    @classmethod
+    def train(cls, X, y, epochs=500, learning_rate=0.5, l2=1e-4):
+        """Full-batch gradient descent on the softmax cross-entropy."""
+        X = np.asarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        mean = X.mean(axis=0)
+        std = X.std(axis=0)
+        std[std == 0] = 1.0
+        Z = (X - mean) / std
+
+        targets = np.zeros((n_rows, len(CLASSES)), dtype=np.float32)
+        targets[np.arange(n_rows), y] = 1.0
+        weights = np.zeros((n_features, len(CLASSES)), dtype=np.float32)
+        bias = np.zeros(len(CLASSES), dtype=np.float32)
+
+        for _ in range(epochs):
+            probs = _softmax(Z @ weights + bias)
+            error = (probs - targets) / n_rows
+            weights -= learning_rate * (Z.T @ error + l2 * weights)
+            bias -= learning_rate * error.sum(axis=0)
+
+        return cls(mean.astype(np.float32), std.astype(np.float32), weights, bias)
+
+    def predict_proba(self, X):
+        Z = (np.asarray(X, dtype=np.float32) - self.mean) / self.std
+        return _softmax(Z @ self.weights + self.bias)
+
+    def predict_batch(self, X):
+        """Class index (into CLASSES) for every row of X."""
+        return np.argmax(self.predict_proba(X), axis=1)
+
+    def classify(self, hours_per_day, sessions_per_day, night_sessions_per_day, avg_session_hours):
+        """Single-row convenience wrapper returning (classification, confidence)."""
+        probs = self.predict_proba([[hours_per_day, sessions_per_day, night_sessions_per_day, avg_session_hours]])[0]
+        index = int(np.argmax(probs))
+        return CLASSES[index], float(probs[index])
+
+    def save(self, path):
+        n_features, n_classes = self.weights.shape
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, n_features, n_classes).ljust(_HEADER_SIZE, b"\0"))
+            for array in (self.mean, self.std, self.weights, self.bias):
+                f.write(np.ascontiguousarray(array, dtype="<f4").tobytes())
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map a saved model; the arrays are read-only views of the file."""
+        with open(path, "rb") as f:
+            magic, version, n_features, n_classes = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a risk model file")
+        if version != _VERSION:
+            raise ValueError(f"{path} was trained with older features; retrain with `python classifier.py train`")
+
+        data = np.memmap(path, dtype="<f4", mode="r", offset=_HEADER_SIZE)
+        sizes = (n_features, n_features, n_features * n_classes, n_classes)
+        offsets = np.cumsum((0,) + sizes)
+        mean, std, weights, bias = (data[offsets[i]:offsets[i + 1]] for i in range(4))
+        return cls(mean, std, weights.reshape(n_features, n_classes), bias)
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "train":
+        X, y = load_training_data(sys.argv[2])
+        if not len(X):
+            sys.exit("No game_history rows to train on.")
+        start = time.perf_counter()
+        model = RiskClassifier.train(X, y)
+        accuracy = float((model.predict_batch(X) == y).mean())
+        model.save(sys.argv[3])
+        print(f"Trained on {len(X)} user-days in {time.perf_counter() - start:.2f}s, "
+              f"agreement with rules: {accuracy:.1%}")
+    elif len(sys.argv) == 3 and sys.argv[1] == "info":
+        model = RiskClassifier.load(sys.argv[2])
+        print(f"features: {', '.join(FEATURES)}")
+        print(f"classes: {', '.join(CLASSES)}")
+        print(f"weights:\n{np.asarray(model.weights)}")
+    else:
+        print("Usage: python classifier.py train <db> <model.bin> | info <model.bin>")
@@ -0,0 +1,276 @@
+"""
+Game Catalog
+============
+
+Dimension table of games so history rows store a small integer id instead
+of the raw process name on every row.
+
+Tables:
+   - games         (id, title)          one row per normalized title
+   - game_aliases  (alias -> game_id)   executable / process names seen for it
+
+GameCatalog keeps both mappings in memory. Detection and recording resolve
+names through the cache; the database is only touched the first time a new
+process name is seen.
+"""
+
+import sqlite3
+import threading
+import time
+
+
+# Process keyword -> display title (see the Supported Games table in README.md)
+KNOWN_TITLES = {
+    "steam": "Steam",
+    "epicgameslauncher": "Epic Games Launcher",
+    "riotclientservices": "Riot Client Services",
+    "valorant": "Valorant",
+    "leagueclient": "League of Legends",
+    "dota2": "Dota 2",
+    "cs2": "Counter-Strike 2",
+    "csgo": "CS:GO",
+    "fortnite": "Fortnite",
+    "minecraft": "Minecraft",
+    "roblox": "Roblox",
+    "gta": "GTA V",
+    "fifa": "FIFA",
+    "efootball": "eFootball",
+    "pubg": "PUBG",
+}
+
+# How long title() trusts that a game id has no row before looking again
+MISSING_TITLE_TTL_SECONDS = 60
+
+
+def normalize_title(process_name):
+    """Map a process name such as 'valorant-win64-shipping.exe' to 'Valorant'."""
+    name = process_name.strip().lower()
+    for keyword, title in KNOWN_TITLES.items():
+        if keyword in name:
+            return title
+    if name.endswith(".exe"):
+        name = name[:-4]
+    return name or "Unknown"
+
+
+def ensure_schema(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS games (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT UNIQUE NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS game_aliases (
+            alias TEXT PRIMARY KEY,
+            game_id INTEGER NOT NULL,
+            FOREIGN KEY(game_id) REFERENCES games(id)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+class GameCatalog:
+    """In-memory cache of the games / game_aliases tables."""
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self._lock = threading.Lock()
+        self._ids_by_alias = {}
+        self._ids_by_title = {}
+        self._titles = {}
+        self._missing = {}  # game id without a games row -> when that was last checked
+
+    def load(self, conn=None):
+        own_conn = conn is None
+        conn = conn or sqlite3.connect(self.db_name)
+        ensure_schema(conn)
+        games = conn.execute("SELECT id, title FROM games").fetchall()
+        aliases = conn.execute("SELECT alias, game_id FROM game_aliases").fetchall()
+        if own_conn:
+            conn.close()
+        with self._lock:
+            self._titles = dict(games)
+            self._ids_by_title = {title: game_id for game_id, title in games}
+            self._ids_by_alias = dict(aliases)
+            self._missing = {}
+
+    def resolve(self, process_name, conn=None):
+        """
+        Game id for a process name, registering the title/alias on first sight.
+
+        Pass `conn` to register inside a transaction that is already open;
+        otherwise a short-lived connection is used and committed.
+        """
+        if not process_name:
+            return None
+        alias = process_name.strip().lower()
+        game_id = self._ids_by_alias.get(alias)
+        if game_id is not None:
+            return game_id
+
+        with self._lock:
+            game_id = self._ids_by_alias.get(alias)
+            if game_id is not None:
+                return game_id
+
+            own_conn = conn is None
+            conn = conn or sqlite3.connect(self.db_name)
+            title = normalize_title(alias)
+            conn.execute("INSERT OR IGNORE INTO games (title) VALUES (?)", (title,))
+            game_id = conn.execute("SELECT id FROM games WHERE title = ?", (title,)).fetchone()[0]
+            conn.execute("INSERT OR IGNORE INTO game_aliases (alias, game_id) VALUES (?, ?)", (alias, game_id))
+            if own_conn:
+                conn.commit()
+                conn.close()
+
+            self._titles[game_id] = title
+            self._ids_by_title[title] = game_id
+            self._ids_by_alias[alias] = game_id
+            self._missing.pop(game_id, None)
+            return game_id
+
+    def title(self, game_id):
+        """
+        Display title for a game id (None for None).
+
+        A game registered by another process (a worker or agent.py) is read
+        from the games table on first sight and cached; ids with no row
+        are "Unknown", and are not looked up again for
+        MISSING_TITLE_TTL_SECONDS.
+        """
+        if game_id is None:
+            return None
+        title = self._titles.get(game_id)
+        if title is not None:
+            return title
+        now = time.monotonic()
+        checked_at = self._missing.get(game_id)
+        if checked_at is not None and now - checked_at < MISSING_TITLE_TTL_SECONDS:
+            return "Unknown"
+
+        conn = sqlite3.connect(self.db_name)
+        row = conn.execute("SELECT title FROM games WHERE id = ?", (game_id,)).fetchone()
+        conn.close()
+        if row is None:
+            with self._lock:
+                self._missing[game_id] = now
+            return "Unknown"
+        with self._lock:
+            self._missing.pop(game_id, None)
+            self._titles[game_id] = row[0]
+            self._ids_by_title.setdefault(row[0], game_id)
+        return row[0]
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def migrate_game_names(conn, catalog):
+    """
+    Convert tables that still store game_name text to game_id integers.
+
+    Safe to call on every start-up: tables already migrated are skipped.
+    Runs inside the caller's transaction.
+
+    Every stored name is normalized in Python by resolve() and the copies
+    join on the exact stored text, so names that SQL lower()/trim() would
+    fold differently (non-ASCII letters, tabs) keep their rows. Blank names
+    get the "Unknown" game.
+    """
+    migrated = []
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS migrated_game_names (game_name TEXT PRIMARY KEY, game_id INTEGER NOT NULL)")
+    for table in ("game_history", "alerts_log", "game_aggregates"):
+        if "game_name" not in _columns(conn, table):
+            continue
+        for (name,) in conn.execute(f"SELECT DISTINCT game_name FROM {table} WHERE game_name IS NOT NULL").fetchall():
+            conn.execute(
+                "INSERT OR IGNORE INTO migrated_game_names (game_name, game_id) VALUES (?, ?)",
+                (name, catalog.resolve(name or " ", conn)),
+            )
+        migrated.append(table)
+
+    if "game_history" in migrated:
+        conn.execute("ALTER TABLE game_history RENAME TO game_history_old")
+        conn.execute(
+            """
+            CREATE TABLE game_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                game_id INTEGER NOT NULL,
+                play_seconds INTEGER NOT NULL,
+                played_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(user_id) REFERENCES users(id),
+                FOREIGN KEY(game_id) REFERENCES games(id)
+            )
+            """
+        )
+        conn.execute(
+            """
+            INSERT INTO game_history (id, user_id, game_id, play_seconds, played_at)
+            SELECT h.id, h.user_id, a.game_id, h.play_seconds, h.played_at
+            FROM game_history_old h JOIN migrated_game_names a ON a.game_name = h.game_name
+            """
+        )
+        conn.execute("DROP TABLE game_history_old")
+
+    if "alerts_log" in migrated:
+        conn.execute("ALTER TABLE alerts_log RENAME TO alerts_log_old")
+        conn.execute(
+            """
+            CREATE TABLE alerts_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                alert_type TEXT NOT NULL,
+                message TEXT NOT NULL,
+                game_id INTEGER,
+                sent_via TEXT,
+                sent_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(user_id) REFERENCES users(id),
+                FOREIGN KEY(game_id) REFERENCES games(id)
+            )
+            """
+        )
+        conn.execute(
+            """
+            INSERT INTO alerts_log (id, user_id, alert_type, message, game_id, sent_via, sent_at)
+            SELECT l.id, l.user_id, l.alert_type, l.message, a.game_id, l.sent_via, l.sent_at
+            FROM alerts_log_old l LEFT JOIN migrated_game_names a ON a.game_name = l.game_name
+            """
+        )
+        conn.execute("DROP TABLE alerts_log_old")
+
+    if "game_aggregates" in migrated:
+        # Several aliases can collapse into one title, so re-aggregate.
+        conn.execute("ALTER TABLE game_aggregates RENAME TO game_aggregates_old")
+        conn.execute(
+            """
+            CREATE TABLE game_aggregates (
+                user_id INTEGER NOT NULL,
+                game_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                total_seconds INTEGER NOT NULL DEFAULT 0,
+                session_count INTEGER NOT NULL DEFAULT 0,
+                last_played TEXT,
+                PRIMARY KEY (user_id, game_id, day),
+                FOREIGN KEY(user_id) REFERENCES users(id),
+                FOREIGN KEY(game_id) REFERENCES games(id)
+            )
+            """
+        )
+        conn.execute(
+            """
+            INSERT INTO game_aggregates (user_id, game_id, day, total_seconds, session_count, last_played)
+            SELECT g.user_id, a.game_id, g.day, SUM(g.total_seconds), SUM(g.session_count), MAX(g.last_played)
+            FROM game_aggregates_old g JOIN migrated_game_names a ON a.game_name = g.game_name
+            GROUP BY g.user_id, a.game_id, g.day
+            """
+        )
+        conn.execute("DROP TABLE game_aggregates_old")
+
+    conn.execute("DROP TABLE migrated_game_names")
+    return migrated
@@ -0,0 +1,151 @@
+"""
+HTTP Caching
+============
+
+Conditional GET, static asset versioning and response compression.
+
+   - DataVersions: per-user version counters for each kind of data the
+     JSON APIs return ("stats", "history", "alerts", "settings"). Writers
+     bump them; readers turn them into an ETag / Last-Modified pair, so an
+     unchanged poll is answered with 304 before any SQLite query runs.
+     Counters live in process memory, so app.py only enables conditional
+     GET for JSON when a single worker serves the app (memory backend).
+   - StaticAssets: short content hash per file under static/, used as a
+     `?v=` URL parameter so versioned assets can be cached as immutable.
+   - compress_response(): gzip for larger text / JSON / JS / CSS responses
+     when the client accepts it, by the q-values of Accept-Encoding
+     ("gzip;q=0" refuses it). Brotli is not in the standard library.
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+from flask import request
+
+
+COMPRESSIBLE_TYPES = ("application/json", "application/javascript", "text/", "image/svg+xml")
+MIN_COMPRESS_BYTES = 1024
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+class DataVersions:
+    """Per-user, per-scope write counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.time()
+        # Restarts reset the counters, so ETags carry a per-process token
+        self._epoch = uuid.uuid4().hex[:8]
+        self._versions = {}
+
+    def bump(self, user_id, *scopes):
+        """Record a write to `scopes` of one user (user_id None = every user)."""
+        now = time.time()
+        with self._lock:
+            for scope in scopes:
+                counter, _ = self._versions.get((user_id, scope), (0, now))
+                self._versions[(user_id, scope)] = (counter + 1, now)
+
+    def validators(self, user_id, scopes, extra=""):
+        """(etag, last_modified) for the given scopes of one user."""
+        parts = [self._epoch, str(user_id)]
+        last_modified = self._started
+        with self._lock:
+            for scope in scopes:
+                user_counter, user_changed = self._versions.get((user_id, scope), (0, self._started))
+                all_counter, all_changed = self._versions.get((None, scope), (0, self._started))
+                parts.append(f"{scope}.{user_counter}.{all_counter}")
+                last_modified = max(last_modified, user_changed, all_changed)
+        if extra:
+            parts.append(hashlib.md5(extra.encode("utf-8")).hexdigest()[:12])
+        return "-".join(parts), last_modified
+
+
+def not_modified(etag, last_modified=None):
+    """True if the request's validators show the client already has this version."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since:
+        return int(last_modified) <= request.if_modified_since.timestamp()
+    return False
+
+
+class StaticAssets:
+    """Content hashes of files in the static folder, recomputed when a file changes."""
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self._lock = threading.Lock()
+        self._hashes = {}
+
+    def version(self, filename):
+        path = os.path.join(self.static_folder, filename)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        cached = self._hashes.get(filename)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, "rb") as f:
+            digest = hashlib.md5(f.read()).hexdigest()[:12]
+        with self._lock:
+            self._hashes[filename] = (mtime, digest)
+        return digest
+
+
+# Static file -> (version, gzipped bytes): only the latest version of each file is kept
+_compressed_static = {}
+_compressed_static_lock = threading.Lock()
+
+
+def compress_response(response, cache_key=None):
+    """
+    Gzip the body in place if the client accepts it and it is worth it.
+
+    `cache_key` (path, version) of a static file, e.g. its ETag as the
+    version, keeps the compressed bytes so the same asset is not compressed
+    on every request; a new version of the file replaces the old entry.
+    """
+    if (
+        response.status_code != 200
+        or request.accept_encodings.quality("gzip") <= 0
+        or response.headers.get("Content-Encoding")
+        or not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES)
+    ):
+        return response
+    if response.is_streamed and cache_key is None:
+        return response
+
+    response.headers.add("Vary", "Accept-Encoding")
+    response.direct_passthrough = False
+    body = response.response
+    compressed = None
+    if cache_key:
+        cached = _compressed_static.get(cache_key[0])
+        if cached and cached[0] == cache_key[1]:
+            compressed = cached[1]
+    if compressed is None:
+        data = response.get_data()
+        if hasattr(body, "close"):
+            body.close()  # file wrapper of a static file, now read into memory
+        if len(data) < MIN_COMPRESS_BYTES:
+            return response
+        compressed = gzip.compress(data, compresslevel=6)
+        if cache_key:
+            with _compressed_static_lock:
+                _compressed_static[cache_key[0]] = (cache_key[1], compressed)
+    elif hasattr(body, "close"):
+        body.close()
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = "gzip"
+    # A strong ETag must differ per encoding; the weak form still validates
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
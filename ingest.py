@@ -0,0 +1,325 @@
+"""
+Event Ingestion
+===============
+
+Bulk validation and storage of event batches sent by monitoring agents
+(agent.py --server) to /api/ingest/events.
+
+Event types:
+   - session   : {event_id, type, user_id, game_name, play_seconds, ended_at,
+                  optional games: {game_name: seconds}}
+   - detection : {event_id, type, user_id, game_name, detected, at}
+Timestamps are epoch seconds. A session with `games` ran several games: its
+history row goes to the game played longest and game_aggregates / the
+change log get one row per game, as for sessions recorded by the app.
+
+A batch is validated as a whole (one users lookup for every user id in
+it), then written in one transaction with multi-row INSERTs: game_history,
+detection_events, and pre-aggregated upserts into user_monitor_stats and
+game_aggregates, plus the analytics change log. Every accepted event_id is
+stored in ingested_events, so an agent retrying a batch after a timeout
+never double counts.
+
+Sessions from the local offline spool (app.py, agent.py --db) are checked
+with local=True: they were recorded on this machine and would have been
+stored as they are had the database been reachable, so the limits meant
+for remote agents (session length, event age) do not apply to them.
+"""
+
+import re
+import sqlite3
+import time
+import zlib
+
+import analytics
+import shards
+from monitor_core import charge_games
+
+
+MAX_BATCH_EVENTS = 5000
+# Limit on the decompressed body, so a small gzip bomb cannot exhaust memory
+MAX_BATCH_BYTES = 8 * 1024 * 1024
+# Detection events older than this are stored but do not trigger game alerts
+LIVE_DETECTION_SECONDS = 300
+MAX_SESSION_SECONDS = 24 * 3600
+MAX_EVENT_AGE_SECONDS = 90 * 24 * 3600
+MAX_CLOCK_SKEW_SECONDS = 300
+MAX_SESSION_GAMES = 64
+# Rows per multi-row INSERT statement (stays under SQLite's bound-variable limit)
+INSERT_CHUNK_ROWS = 200
+
+EVENT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+class BatchTooLarge(ValueError):
+    pass
+
+
+def read_body(body, content_encoding=None):
+    """Request body, gunzipped if needed, capped at MAX_BATCH_BYTES."""
+    if content_encoding == "gzip":
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        body = decompressor.decompress(body, MAX_BATCH_BYTES + 1)
+        if decompressor.unconsumed_tail:
+            raise BatchTooLarge(f"Batch larger than {MAX_BATCH_BYTES} bytes")
+        if not decompressor.eof:
+            raise ValueError("Truncated gzip body")
+    elif content_encoding not in (None, "", "identity"):
+        raise ValueError(f"Unsupported Content-Encoding {content_encoding}")
+    if len(body) > MAX_BATCH_BYTES:
+        raise BatchTooLarge(f"Batch larger than {MAX_BATCH_BYTES} bytes")
+    return body
+
+
+def ensure_schema(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ingested_events (
+            event_id TEXT PRIMARY KEY,
+            received_at TEXT DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS detection_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            game_id INTEGER,
+            detected INTEGER NOT NULL,
+            detected_at TEXT NOT NULL,
+            FOREIGN KEY(user_id) REFERENCES users(id),
+            FOREIGN KEY(game_id) REFERENCES games(id)
+        )
+        """
+    )
+
+
+def _utc(epoch):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(epoch))
+
+
+def _check_event(event, now, local=False):
+    """Normalized copy of one event, or raise ValueError with the reason."""
+    if not isinstance(event, dict):
+        raise ValueError("event must be an object")
+    event_id = event.get("event_id")
+    if not isinstance(event_id, str) or not EVENT_ID_PATTERN.match(event_id):
+        raise ValueError("invalid event_id")
+    user_id = event.get("user_id")
+    if not isinstance(user_id, int) or isinstance(user_id, bool) or user_id <= 0:
+        raise ValueError("invalid user_id")
+    game_name = event.get("game_name")
+    if game_name is not None and (not isinstance(game_name, str) or not 0 < len(game_name) <= 256):
+        raise ValueError("invalid game_name")
+
+    kind = event.get("type")
+    time_key = "ended_at" if kind == "session" else "at"
+    at = event.get(time_key)
+    if not isinstance(at, (int, float)) or isinstance(at, bool):
+        raise ValueError(f"invalid {time_key}")
+    if not (local or now - MAX_EVENT_AGE_SECONDS <= at) or at > now + MAX_CLOCK_SKEW_SECONDS:
+        raise ValueError(f"{time_key} out of range")
+
+    if kind == "session":
+        seconds = event.get("play_seconds")
+        if not isinstance(seconds, int) or isinstance(seconds, bool) or seconds < 0 \
+                or not local and not 0 < seconds <= MAX_SESSION_SECONDS:
+            raise ValueError("invalid play_seconds")
+        games = event.get("games")
+        if games is not None:
+            if not isinstance(games, dict) or not 0 < len(games) <= MAX_SESSION_GAMES:
+                raise ValueError("invalid games")
+            for name, game_seconds in games.items():
+                if not 0 < len(name) <= 256 or not isinstance(game_seconds, int) or isinstance(game_seconds, bool) \
+                        or not 0 <= game_seconds <= seconds:
+                    raise ValueError("invalid games")
+        return {"event_id": event_id, "type": kind, "user_id": user_id, "game_name": game_name,
+                "play_seconds": seconds, "at": float(at), "games": games}
+    if kind == "detection":
+        detected = event.get("detected")
+        if not isinstance(detected, bool):
+            raise ValueError("invalid detected")
+        if detected and game_name is None:
+            raise ValueError("detection needs game_name")
+        return {"event_id": event_id, "type": kind, "user_id": user_id, "game_name": game_name,
+                "detected": detected, "at": float(at)}
+    raise ValueError("unknown type")
+
+
+def validate_batch(conn, events, now=None, local=False):
+    """
+    Split a batch into (valid events, rejections).
+
+    Rejections are {"index", "event_id", "error"} dicts. Events for unknown
+    users and repeated event_ids within the batch are rejected too.
+    """
+    now = time.time() if now is None else now
+    valid, rejected, seen = [], [], set()
+    for index, event in enumerate(events):
+        try:
+            checked = _check_event(event, now, local)
+            if checked["event_id"] in seen:
+                raise ValueError("duplicate event_id in batch")
+        except ValueError as e:
+            event_id = event.get("event_id") if isinstance(event, dict) else None
+            rejected.append({"index": index, "event_id": event_id, "error": str(e)})
+            continue
+        seen.add(checked["event_id"])
+        checked["index"] = index
+        valid.append(checked)
+
+    user_ids = sorted({event["user_id"] for event in valid})
+    known = set()
+    for start in range(0, len(user_ids), 500):
+        chunk = user_ids[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        known.update(row[0] for row in conn.execute(f"SELECT id FROM users WHERE id IN ({placeholders})", chunk))
+    if len(known) < len(user_ids):
+        for event in valid:
+            if event["user_id"] not in known:
+                rejected.append({"index": event["index"], "event_id": event["event_id"], "error": "unknown user_id"})
+        valid = [event for event in valid if event["user_id"] in known]
+        rejected.sort(key=lambda item: item["index"])
+    return valid, rejected
+
+
+def _insert_many(conn, head, rows, tail=""):
+    """Multi-row INSERT: `head` up to VALUES, one (?, ...) group per row."""
+    if not rows:
+        return
+    group = "(" + ",".join("?" * len(rows[0])) + ")"
+    for start in range(0, len(rows), INSERT_CHUNK_ROWS):
+        chunk = rows[start:start + INSERT_CHUNK_ROWS]
+        params = [value for row in chunk for value in row]
+        conn.execute(f"{head} VALUES {','.join([group] * len(chunk))} {tail}", params)
+
+
+def _already_ingested(conn, event_ids):
+    found = set()
+    for start in range(0, len(event_ids), 500):
+        chunk = event_ids[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        found.update(
+            row[0] for row in conn.execute(f"SELECT event_id FROM ingested_events WHERE event_id IN ({placeholders})", chunk)
+        )
+    return found
+
+
+def write_batch(conn, events, catalog):
+    """
+    Store validated events inside the caller's write transaction.
+
+    Returns {"accepted", "duplicates", "sessions", "detections"} where
+    sessions / detections are the newly stored events (for in-memory views
+    and alerts) with their resolved game_id.
+    """
+    duplicates = _already_ingested(conn, [event["event_id"] for event in events])
+    fresh = [event for event in events if event["event_id"] not in duplicates]
+
+    sessions, detections = [], []
+    history_rows, detection_rows = [], []
+    stats, aggregates = {}, {}
+    change_rows = []
+    for event in fresh:
+        game_id = catalog.resolve(event["game_name"], conn) if event["game_name"] else None
+        event["game_id"] = game_id
+        at = _utc(event["at"])
+        if event["type"] == "detection":
+            detections.append(event)
+            detection_rows.append((event["user_id"], game_id, 1 if event["detected"] else 0, at))
+            continue
+
+        sessions.append(event)
+        seconds = event["play_seconds"]
+        total, count, last = stats.get(event["user_id"], (0, 0, (0.0, 0)))
+        stats[event["user_id"]] = (total + seconds, count + 1, max(last, (event["at"], seconds)))
+        played = [(game_id, seconds)] if game_id else []
+        if event.get("games"):
+            primary, split = charge_games(event["games"], lambda name: catalog.resolve(name, conn))
+            if split:
+                game_id = event["game_id"] = primary
+                played = split
+        if game_id:
+            history_rows.append((event["user_id"], game_id, seconds, at))
+        for played_id, game_seconds in played:
+            key = (event["user_id"], played_id, at[:10])
+            agg_total, agg_count, agg_last = aggregates.get(key, (0, 0, at))
+            aggregates[key] = (agg_total + game_seconds, agg_count + 1, max(agg_last, at))
+            change_rows.append((event["user_id"], played_id, game_seconds, at))
+
+    _insert_many(conn, "INSERT INTO game_history (user_id, game_id, play_seconds, played_at)", history_rows)
+    _insert_many(conn, "INSERT INTO detection_events (user_id, game_id, detected, detected_at)", detection_rows)
+    _insert_many(
+        conn,
+        "INSERT INTO user_monitor_stats (user_id, total_play_seconds, total_sessions, last_session_seconds, updated_at)",
+        [(user_id, total, count, last[1], _utc(time.time())) for user_id, (total, count, last) in stats.items()],
+        """ON CONFLICT(user_id) DO UPDATE SET
+               total_play_seconds = total_play_seconds + excluded.total_play_seconds,
+               total_sessions = total_sessions + excluded.total_sessions,
+               last_session_seconds = excluded.last_session_seconds,
+               updated_at = excluded.updated_at""",
+    )
+    _insert_many(
+        conn,
+        "INSERT INTO game_aggregates (user_id, game_id, day, total_seconds, session_count, last_played)",
+        [(user_id, game_id, day, total, count, last) for (user_id, game_id, day), (total, count, last) in aggregates.items()],
+        """ON CONFLICT(user_id, game_id, day) DO UPDATE SET
+               total_seconds = total_seconds + excluded.total_seconds,
+               session_count = session_count + excluded.session_count,
+               last_played = MAX(last_played, excluded.last_played)""",
+    )
+    _insert_many(conn, "INSERT INTO ingested_events (event_id)", [(event["event_id"],) for event in fresh])
+    analytics.log_sessions(conn, change_rows)
+
+    return {
+        "accepted": len(fresh),
+        "duplicates": len(duplicates),
+        "sessions": sessions,
+        "detections": detections,
+    }
+
+
+def store_events(db_name, events, catalog, journal=None, local=False):
+    """
+    Validate and write one batch, one write transaction per shard it touches.
+
+    With a SessionJournal, journal rows checkpointed before a stored
+    session ended are dropped in the same transaction (spool replay).
+    Returns write_batch()'s summary plus "rejected".
+    """
+    conn = sqlite3.connect(db_name, timeout=30)
+    try:
+        valid, rejected = validate_batch(conn, events, local=local)
+    finally:
+        conn.close()
+    # Register new games up front: the shard transactions below cannot write the core database
+    for event in valid:
+        catalog.resolve(event["game_name"])
+        for name in event.get("games") or ():
+            catalog.resolve(name)
+
+    result = {"accepted": 0, "duplicates": 0, "sessions": [], "detections": []}
+    by_user = {}
+    for event in valid:
+        by_user.setdefault(event["user_id"], []).append(event)
+    for shard, user_ids in sorted(shards.group_by_shard(db_name, list(by_user)).items()):
+        batch = sorted((event for user_id in user_ids for event in by_user[user_id]), key=lambda event: event["index"])
+        conn = shards.connect_shard(db_name, shard, attach_core=False, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                stored = write_batch(conn, batch, catalog)
+                if journal is not None:
+                    for event in stored["sessions"]:
+                        journal.clear_through(event["user_id"], event["at"], conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        for key in result:
+            result[key] += stored[key]
+    result["rejected"] = rejected
+    return result
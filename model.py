@@ -4,19 +4,189 @@ This module analyzes gaming behavior and classifies addiction levels
 using rule-based AI logic suitable for BCA academic projects.
 """
 
+import calendar
+import threading
+import time
+from collections import deque
+
+import shards
+
+
+class RollingRiskScorer:
+    """
+    Keeps per-user rolling windows (last 24h, 7d, 30d) of recorded game sessions.
+
+    Each window holds its sessions in a deque, ordered by end time, together
+    with running totals (play seconds, session count, night sessions).
+    Recording a session appends to each window and drops the sessions that
+    fell out of it, so every update is amortized O(1) and reading the totals
+    never rescans history. Late sessions (replayed spools, agents) are
+    inserted at their place, or ignored if already older than the window.
+    """
+
+    WINDOWS = (
+        ("24h", 24 * 3600),
+        ("7d", 7 * 24 * 3600),
+        ("30d", 30 * 24 * 3600),
+    )
+    NIGHT_START_HOUR = 22          # Sessions touching 22:00-06:00 count as night play
+    NIGHT_END_HOUR = 6
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = {}
+
+    def _new_windows(self):
+        return {
+            name: {
+                "span": span, "cutoff": float("-inf"), "sessions": deque(),
+                "play_seconds": 0, "session_count": 0, "night_sessions": 0,
+            }
+            for name, span in self.WINDOWS
+        }
+
+    def is_night_session(self, started_at, ended_at):
+        """True if the session overlaps the night hours (local time)."""
+        start = time.localtime(started_at)
+        if start.tm_hour >= self.NIGHT_START_HOUR or start.tm_hour < self.NIGHT_END_HOUR:
+            return True
+        night_begins = time.mktime(
+            (start.tm_year, start.tm_mon, start.tm_mday, self.NIGHT_START_HOUR, 0, 0, 0, 0, -1)
+        )
+        return ended_at >= night_begins
+
+    def _expire(self, window, now):
+        cutoff = window["cutoff"] = max(window["cutoff"], now - window["span"])
+        sessions = window["sessions"]
+        while sessions and sessions[0][0] < cutoff:
+            _, seconds, night = sessions.popleft()
+            window["play_seconds"] -= seconds
+            window["session_count"] -= 1
+            window["night_sessions"] -= night
+
+    def record_session(self, user_id, play_seconds, ended_at=None):
+        """Add one finished session to the user's windows."""
+        if not user_id or play_seconds <= 0:
+            return
+        ended_at = time.time() if ended_at is None else ended_at
+        play_seconds = int(play_seconds)
+        night = 1 if self.is_night_session(ended_at - play_seconds, ended_at) else 0
+
+        with self._lock:
+            windows = self._users.get(user_id)
+            if windows is None:
+                windows = self._users[user_id] = self._new_windows()
+            for window in windows.values():
+                if ended_at < window["cutoff"]:
+                    continue  # a late session that already left this window
+                sessions = window["sessions"]
+                index = len(sessions)
+                while index and sessions[index - 1][0] > ended_at:
+                    index -= 1
+                sessions.insert(index, (ended_at, play_seconds, night))
+                window["play_seconds"] += play_seconds
+                window["session_count"] += 1
+                window["night_sessions"] += night
+                self._expire(window, sessions[-1][0])
+
+    def get_windows(self, user_id, now=None):
+        """Current totals per window, e.g. {'7d': {'play_seconds': ..., ...}}."""
+        now = time.time() if now is None else now
+        with self._lock:
+            windows = self._users.get(user_id)
+            if windows is None:
+                windows = self._new_windows()
+            result = {}
+            for name, window in windows.items():
+                self._expire(window, now)
+                result[name] = {
+                    "play_seconds": window["play_seconds"],
+                    "session_count": window["session_count"],
+                    "night_sessions": window["night_sessions"],
+                }
+            return result
+
+    def load_from_db(self, db_name, now=None):
+        """
+        Rebuild all windows from game_history (played_at is the UTC end time
+        of each session). Call once on startup.
+        """
+        now = time.time() if now is None else now
+        longest = max(span for _, span in self.WINDOWS)
+        since = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(now - longest))
+
+        conn = shards.connect(db_name)
+        c = conn.cursor()
+        c.execute(
+            """SELECT user_id, play_seconds, played_at FROM game_history
+               WHERE played_at >= ? ORDER BY played_at""",
+            (since,),
+        )
+        rows = c.fetchall()
+        conn.close()
+
+        with self._lock:
+            self._users = {}
+        for user_id, play_seconds, played_at in rows:
+            ended_at = calendar.timegm(time.strptime(played_at, "%Y-%m-%d %H:%M:%S"))
+            self.record_session(user_id, play_seconds, ended_at)
+        return len(rows)
+
+
+class DatabaseRiskScorer(RollingRiskScorer):
+    """
+    RollingRiskScorer that reads a user's windows from game_history on every
+    get_windows() call. Used with several workers, where an in-process
+    scorer would only see the sessions recorded by its own worker.
+    """
+
+    def __init__(self, db_name):
+        super().__init__()
+        self.db_name = db_name
+
+    def record_session(self, user_id, play_seconds, ended_at=None):
+        """Nothing to do: sessions are read back from game_history."""
+
+    def load_from_db(self, db_name=None, now=None):
+        return 0
+
+    def get_windows(self, user_id, now=None):
+        now = time.time() if now is None else now
+        longest = max(span for _, span in self.WINDOWS)
+        since = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(now - longest))
+        conn = shards.connect(self.db_name, user_id)
+        rows = conn.execute(
+            "SELECT play_seconds, played_at FROM game_history WHERE user_id = ? AND played_at >= ? ORDER BY played_at",
+            (user_id, since),
+        ).fetchall()
+        conn.close()
+
+        scorer = RollingRiskScorer()
+        for play_seconds, played_at in rows:
+            scorer.record_session(user_id, play_seconds, calendar.timegm(time.strptime(played_at, "%Y-%m-%d %H:%M:%S")))
+        return scorer.get_windows(user_id, now)
+
+
 class GameAddictionAnalyzer:
     """
     Analyzes gaming behavior patterns to detect potential addiction.
     Uses threshold-based classification (rule-based AI approach).
     """
+
+    CLASSIFICATIONS = ("Normal", "At Risk", "Addicted")
     
-    def __init__(self):
+    def __init__(self, scorer=None, model=None):
         # Define thresholds for addiction classification
         # These are based on WHO gaming disorder research guidelines
         self.NORMAL_HOURS = 2          # Up to 2 hours/day is normal
         self.RISK_HOURS = 4            # 2-4 hours shows risk
         self.NORMAL_SESSIONS = 2       # Up to 2 sessions/day is normal
         self.RISK_SESSIONS = 3         # 3+ sessions shows concern
+
+        # Optional RollingRiskScorer fed with real sessions
+        self.scorer = scorer
+        # Optional learned RiskClassifier (see classifier.py)
+        self.model = model
     
     def analyze_behavior(self, hours_per_day, sessions_per_day, plays_at_night):
         """
@@ -73,6 +243,63 @@ class GameAddictionAnalyzer:
             'status_color': self._get_status_color(classification)
         }
     
+    def analyze_recent(self, user_id, now=None):
+        """
+        Classifies a user from their recorded sessions instead of manual input.
+
+        Uses the last 7 days as the daily average and flags night gaming if any
+        session in that window touched night hours.
+        """
+        if self.scorer is None:
+            raise ValueError("analyze_recent() needs a RollingRiskScorer")
+
+        windows = self.scorer.get_windows(user_id, now)
+        week = windows["7d"]
+        result = self.analyze_behavior(
+            week["play_seconds"] / 3600 / 7,
+            week["session_count"] / 7,
+            'yes' if week["night_sessions"] else 'no',
+        )
+        result['windows'] = windows
+
+        if self.model is not None:
+            classification, confidence = self.model.classify(*self.window_features(week))
+            result['model_classification'] = classification
+            result['model_confidence'] = round(confidence, 3)
+        return result
+
+    @staticmethod
+    def window_features(week):
+        """
+        Learned-model features of a 7d window (classifier.FEATURES order):
+        hours / day, sessions / day, night sessions / day, hours / session.
+        """
+        sessions = week["session_count"]
+        return (
+            week["play_seconds"] / 3600 / 7,
+            sessions / 7,
+            week["night_sessions"] / 7,
+            week["play_seconds"] / sessions / 3600 if sessions else 0.0,
+        )
+
+    def score_batch(self, hours_per_day, sessions_per_day, night_sessions):
+        """
+        analyze_behavior() for whole arrays of users at once (NumPy).
+
+        Returns (risk_scores, class_indices), where class_indices index
+        CLASSIFICATIONS and night_sessions > 0 counts as playing at night.
+        """
+        import numpy as np  # only needed for batch scoring
+
+        hours = np.asarray(hours_per_day, dtype=np.float64)
+        sessions = np.asarray(sessions_per_day, dtype=np.float64)
+        risk_score = np.select([hours <= self.NORMAL_HOURS, hours <= self.RISK_HOURS], [10, 40], 60)
+        risk_score += np.select([sessions <= self.NORMAL_SESSIONS, sessions <= self.RISK_SESSIONS], [5, 20], 30)
+        risk_score += np.where(np.asarray(night_sessions) > 0, 15, 0)
+        risk_score = np.minimum(risk_score, 100)
+        classes = np.select([risk_score <= 30, risk_score <= 60], [0, 1], 2)
+        return risk_score.astype(np.int16), classes.astype(np.int8)
+
     def _classify_risk(self, risk_score):
         """
         Classifies user into addiction categories based on risk score.
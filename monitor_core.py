@@ -0,0 +1,207 @@
+"""
+Monitor Core
+============
+
+Game detection and session recording shared by the web app (app.py) and
+the headless agent (agent.py). Only the standard library is imported here
+so the agent can run without Flask.
+
+   - GAME_KEYWORDS / detect_games_running(): process-name based detection
+     of every game running, in one pass over the process list
+   - attribute_games() / game_seconds(): per-game play time of a session,
+     interval by interval between detection polls; charge_games() turns it
+     into game ids for record_session()
+   - record_session(): the SQL that stores one finished session
+     (user_monitor_stats, game_history and game_aggregates): one history
+     row per session, one aggregate row per game played
+   - new_session_event() / new_detection_event(): the event dicts agents
+     send to /api/ingest/events and the offline spool (spool.py) keeps
+"""
+
+import csv
+import io
+import os
+import subprocess
+
+
+GAME_KEYWORDS = (
+    "steam",
+    "epicgameslauncher",
+    "riotclientservices",
+    "valorant",
+    "leagueclient",
+    "dota2",
+    "cs2",
+    "csgo",
+    "fortnite",
+    "minecraft",
+    "roblox",
+    "gta",
+    "fifa",
+    "efootball",
+    "pubg",
+)
+
+# Launchers stay open next to the game they started; they only count when no game runs
+LAUNCHER_KEYWORDS = ("steam", "epicgameslauncher", "riotclientservices")
+
+
+def list_processes():
+    """Lower-cased process names from tasklist (Windows)."""
+    output = subprocess.check_output(
+        ["tasklist", "/fo", "csv", "/nh"],
+        text=True,
+        encoding="utf-8",
+        errors="ignore",
+    )
+    return [row[0].strip().lower() for row in csv.reader(io.StringIO(output)) if row]
+
+
+def detect_games_running(process_source=list_processes):
+    """
+    Best-effort game process detection on Windows using tasklist output.
+    Returns the process names of every game running, one per game keyword,
+    in process list order (empty if none or the list cannot be read).
+    """
+    try:
+        matched = {}
+        for process_name in process_source():
+            for keyword in GAME_KEYWORDS:
+                if keyword in process_name:
+                    matched.setdefault(keyword, process_name)
+                    break
+        return list(matched.values())
+    except Exception:
+        return []
+
+
+def _is_launcher(process_name):
+    return any(keyword in process_name for keyword in LAUNCHER_KEYWORDS)
+
+
+def running_games(session_games):
+    """Process names marked running in a session_games dict."""
+    return {name for name, (_, running) in session_games.get("games", {}).items() if running}
+
+
+def attribute_games(session_games, detected, elapsed_seconds):
+    """
+    New session_games after a detection poll at `elapsed_seconds` of session time.
+
+    session_games is {"at": session time of the previous poll, "games":
+    {process name: [seconds, running]}}. The time since the previous poll is
+    split evenly between the games running then, so per-game seconds never
+    add up to more than the session; launchers only get time while no game
+    runs. Paused time is not session time; detected=() stops every game (pause).
+    """
+    games = {name: [seconds, running] for name, (seconds, running) in session_games.get("games", {}).items()}
+    running = [name for name, (_, is_running) in games.items() if is_running]
+    charged = [name for name in running if not _is_launcher(name)] or running
+    if session_games.get("at") is not None and charged:
+        share = max(0.0, elapsed_seconds - session_games["at"]) / len(charged)
+        for name in charged:
+            games[name][0] += share
+    for name, entry in games.items():
+        entry[1] = name in detected
+    for name in detected:
+        games.setdefault(name, [0.0, True])
+    return {"at": elapsed_seconds, "games": games}
+
+
+def game_seconds(session_games, elapsed_seconds):
+    """Process name -> seconds played, charging the last poll interval up to `elapsed_seconds`."""
+    final = attribute_games(session_games, (), elapsed_seconds)
+    return {name: seconds for name, (seconds, _) in final["games"].items()}
+
+
+def charge_games(games, resolve):
+    """
+    (game id played longest, [(game_id, seconds)]) for a process name ->
+    seconds mapping; `resolve` maps a name to its game id (names of one
+    game are summed, games without time dropped).
+    """
+    played = {}
+    for name, seconds in games.items():
+        game_id = resolve(name)
+        played[game_id] = played.get(game_id, 0) + int(seconds)
+    played = [(game_id, seconds) for game_id, seconds in played.items() if game_id and seconds > 0]
+    return (max(played, key=lambda item: item[1])[0] if played else None), played
+
+
+def record_session(conn, user_id, elapsed_seconds, game_id=None, ended_at=None, games=None):
+    """
+    Store one finished session inside the caller's transaction.
+
+    `ended_at` is a UTC 'YYYY-MM-DD HH:MM:SS' string (default: now).
+    game_history gets one row for the session, charged to `game_id`, so
+    sums over it stay session time. `games` lists (game_id, play_seconds)
+    of a session that ran several games; game_aggregates then gets one row
+    per game (one executemany) instead of `elapsed_seconds` for `game_id`.
+    """
+    if games is None:
+        games = [(game_id, elapsed_seconds)] if game_id else []
+    games = [(game_id, int(seconds)) for game_id, seconds in games]
+    c = conn.cursor()
+    c.execute(
+        """
+        INSERT INTO user_monitor_stats (user_id, total_play_seconds, total_sessions, last_session_seconds, updated_at)
+        VALUES (?, ?, 1, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(user_id) DO UPDATE SET
+            total_play_seconds = total_play_seconds + excluded.total_play_seconds,
+            total_sessions = total_sessions + 1,
+            last_session_seconds = excluded.last_session_seconds,
+            updated_at = CURRENT_TIMESTAMP
+        """,
+        (user_id, int(elapsed_seconds), int(elapsed_seconds)),
+    )
+
+    # Record game history if a game was detected
+    if game_id:
+        c.execute(
+            """
+            INSERT INTO game_history (user_id, game_id, play_seconds, played_at)
+            VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+            """,
+            (user_id, game_id, int(elapsed_seconds), ended_at),
+        )
+    if games:
+        c.executemany(
+            """
+            INSERT INTO game_aggregates (user_id, game_id, day, total_seconds, session_count, last_played)
+            VALUES (?, ?, date(COALESCE(?, 'now')), ?, 1, COALESCE(?, CURRENT_TIMESTAMP))
+            ON CONFLICT(user_id, game_id, day) DO UPDATE SET
+                total_seconds = total_seconds + excluded.total_seconds,
+                session_count = session_count + 1,
+                last_played = MAX(last_played, excluded.last_played)
+            """,
+            [(user_id, game_id, ended_at, seconds, ended_at) for game_id, seconds in games],
+        )
+
+
+def new_session_event(user_id, game_name, play_seconds, ended_at, games=None):
+    """
+    Session event; `games` (process name -> seconds, see game_seconds()) keeps
+    the per-game split of a session that ran several games.
+    """
+    event = {
+        "event_id": os.urandom(16).hex(),
+        "type": "session",
+        "user_id": user_id,
+        "game_name": game_name,
+        "play_seconds": int(play_seconds),
+        "ended_at": ended_at,
+    }
+    if games:
+        event["games"] = {name: int(seconds) for name, seconds in games.items()}
+    return event
+
+
+def new_detection_event(user_id, game_name, at):
+    return {
+        "event_id": os.urandom(16).hex(),
+        "type": "detection",
+        "user_id": user_id,
+        "game_name": game_name,
+        "detected": True,
+        "at": at,
+    }
@@ -0,0 +1,299 @@
+"""
+Monitor State Backends
+======================
+
+Holds the live monitoring state (running flag, elapsed time, detected games
+and their per-game intervals) so that every server worker answers
+/api/monitor/status the same way.
+
+Available backends (select with the MONITOR_STATE_BACKEND environment variable):
+   - memory : plain in-process dict (single worker, the default)
+   - mmap   : fixed-size memory-mapped file shared by all workers on one host
+   - sqlite : single-row table inside the app database, survives restarts
+
+Every backend exposes the same two calls:
+   - load()            -> dict snapshot of the state
+   - update(mutator)   -> runs mutator(state) atomically and stores the result
+"""
+
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+NO_GAME_TITLE = "No game detected"
+
+DEFAULT_STATE = {
+    "running": False,
+    "started_at": None,
+    "elapsed_seconds": 0.0,
+    "user_id": None,
+    "game_detected": False,
+    "game_title": NO_GAME_TITLE,
+    "session_game_name": None,
+    # {"at": ..., "games": {process name: [seconds, running]}} (see monitor_core.attribute_games)
+    "session_games": {},
+}
+
+
+def encode_session_games(session_games, limit=None):
+    """Compact JSON for the session_games field, at most `limit` bytes (shortest games dropped)."""
+    # Running games first, then stopped ones longest first, so pop() drops the least time
+    games = sorted(session_games.get("games", {}).items(), key=lambda item: (not item[1][1], -item[1][0]))
+    while True:
+        data = json.dumps(
+            {"at": session_games.get("at"), "games": {name: [round(seconds, 3), running] for name, (seconds, running) in games}},
+            separators=(",", ":"),
+        ).encode("utf-8")
+        if limit is None or len(data) <= limit or not games:
+            return data
+        games.pop()
+
+
+def decode_session_games(data):
+    return json.loads(data) if data else {}
+
+
+class MemoryMonitorState:
+    """In-process state. Only correct when the app runs a single worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = dict(DEFAULT_STATE)
+
+    def load(self):
+        with self._lock:
+            return dict(self._state)
+
+    def update(self, mutator):
+        with self._lock:
+            state = dict(self._state)
+            result = mutator(state)
+            self._state = state
+            return result
+
+
+class MmapMonitorState:
+    """
+    State kept in a small memory-mapped file shared by every process on the host.
+
+    Readers never take a lock: the record is guarded by a sequence counter
+    (seqlock) that writers bump to an odd value before writing and back to an
+    even value afterwards, so a reader simply retries if it saw a write in
+    progress. Writers serialize with an OS file lock.
+    """
+
+    # seq, running, game_detected, has_started_at, started_at, elapsed, user_id,
+    # then two length-prefixed UTF-8 strings (game title, session game name)
+    # and the session_games JSON (appended last, so older files still decode)
+    _HEADER = struct.Struct("<QBBBxxxxxddq")
+    _TEXT_SIZE = 256
+    _TEXT = struct.Struct(f"<H{_TEXT_SIZE}s")
+    _GAMES_SIZE = 2048
+    _GAMES = struct.Struct(f"<H{_GAMES_SIZE}s")
+    SIZE = _HEADER.size + 2 * _TEXT.size + _GAMES.size
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._file = open(path, "a+b")
+        if os.path.getsize(path) < self.SIZE:
+            self._file.truncate(self.SIZE)
+        self._map = mmap.mmap(self._file.fileno(), self.SIZE)
+        if self._read_seq() == 0:
+            self.update(lambda state: None)
+
+    def _read_seq(self):
+        return struct.unpack_from("<Q", self._map, 0)[0]
+
+    def _lock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        else:
+            self._file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+
+    def _unlock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _decode(self, raw):
+        seq, running, detected, has_started, started_at, elapsed, user_id = self._HEADER.unpack_from(raw, 0)
+        title_len, title = self._TEXT.unpack_from(raw, self._HEADER.size)
+        game_len, game = self._TEXT.unpack_from(raw, self._HEADER.size + self._TEXT.size)
+        games_len, games = self._GAMES.unpack_from(raw, self._HEADER.size + 2 * self._TEXT.size)
+        return {
+            "running": bool(running),
+            "started_at": started_at if has_started else None,
+            "elapsed_seconds": elapsed,
+            "user_id": user_id or None,
+            "game_detected": bool(detected),
+            "game_title": title[:title_len].decode("utf-8", "ignore"),
+            "session_game_name": game[:game_len].decode("utf-8", "ignore") or None,
+            "session_games": decode_session_games(games[:games_len]),
+        }
+
+    def _encode_text(self, value):
+        data = (value or "").encode("utf-8")[: self._TEXT_SIZE]
+        return self._TEXT.pack(len(data), data)
+
+    def load(self):
+        while True:
+            seq = self._read_seq()
+            if seq & 1:
+                continue
+            raw = self._map[: self.SIZE]
+            if self._read_seq() == seq:
+                return self._decode(raw)
+
+    def update(self, mutator):
+        with self._thread_lock:
+            self._lock_file()
+            try:
+                seq = self._read_seq()
+                state = self._decode(self._map[: self.SIZE]) if seq else dict(DEFAULT_STATE)
+                # An odd counter means a writer died mid-write; round it up so
+                # readers see an even (stable) value again after this write.
+                seq += seq & 1
+                result = mutator(state)
+                started_at = state["started_at"]
+                payload = (
+                    self._HEADER.pack(
+                        seq + 1,
+                        1 if state["running"] else 0,
+                        1 if state["game_detected"] else 0,
+                        0 if started_at is None else 1,
+                        started_at or 0.0,
+                        float(state["elapsed_seconds"]),
+                        int(state["user_id"] or 0),
+                    )
+                    + self._encode_text(state["game_title"])
+                    + self._encode_text(state["session_game_name"])
+                )
+                games = encode_session_games(state["session_games"], self._GAMES_SIZE)
+                payload += self._GAMES.pack(len(games), games)
+                struct.pack_into("<Q", self._map, 0, seq + 1)
+                self._map[8 : self.SIZE] = payload[8:]
+                struct.pack_into("<Q", self._map, 0, seq + 2)
+                return result
+            finally:
+                self._unlock_file()
+
+
+class SqliteMonitorState:
+    """State kept in a single-row SQLite table, so it also survives a restart."""
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS monitor_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                running INTEGER NOT NULL DEFAULT 0,
+                started_at REAL,
+                elapsed_seconds REAL NOT NULL DEFAULT 0,
+                user_id INTEGER,
+                game_detected INTEGER NOT NULL DEFAULT 0,
+                game_title TEXT NOT NULL DEFAULT 'No game detected',
+                session_game_name TEXT,
+                session_games TEXT
+            )
+            """
+        )
+        if "session_games" not in {row[1] for row in conn.execute("PRAGMA table_info(monitor_state)")}:
+            conn.execute("ALTER TABLE monitor_state ADD COLUMN session_games TEXT")
+        conn.execute("INSERT OR IGNORE INTO monitor_state (id) VALUES (1)")
+
+    def _connect(self):
+        # One connection per thread keeps status polling to a single SELECT.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_name, isolation_level=None, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _row_to_state(self, row):
+        return {
+            "running": bool(row[0]),
+            "started_at": row[1],
+            "elapsed_seconds": row[2],
+            "user_id": row[3],
+            "game_detected": bool(row[4]),
+            "game_title": row[5],
+            "session_game_name": row[6],
+            "session_games": decode_session_games(row[7]),
+        }
+
+    def _select(self, conn):
+        row = conn.execute(
+            """SELECT running, started_at, elapsed_seconds, user_id,
+               game_detected, game_title, session_game_name, session_games
+               FROM monitor_state WHERE id = 1"""
+        ).fetchone()
+        return self._row_to_state(row) if row else dict(DEFAULT_STATE)
+
+    def load(self):
+        return self._select(self._connect())
+
+    def update(self, mutator):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state = self._select(conn)
+            result = mutator(state)
+            conn.execute(
+                """
+                UPDATE monitor_state SET running = ?, started_at = ?, elapsed_seconds = ?,
+                    user_id = ?, game_detected = ?, game_title = ?, session_game_name = ?,
+                    session_games = ?
+                WHERE id = 1
+                """,
+                (
+                    1 if state["running"] else 0,
+                    state["started_at"],
+                    float(state["elapsed_seconds"]),
+                    state["user_id"],
+                    1 if state["game_detected"] else 0,
+                    state["game_title"],
+                    state["session_game_name"],
+                    encode_session_games(state["session_games"]).decode("utf-8"),
+                ),
+            )
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def create_monitor_state(backend, db_name, mmap_path=None):
+    """Build the configured state backend ('memory', 'mmap' or 'sqlite')."""
+    backend = (backend or "memory").lower()
+    if backend == "mmap":
+        return MmapMonitorState(mmap_path or os.path.splitext(db_name)[0] + ".monitor")
+    if backend == "sqlite":
+        return SqliteMonitorState(db_name)
+    if backend == "memory":
+        return MemoryMonitorState()
+    raise ValueError(f"Unknown monitor state backend: {backend}")
@@ -0,0 +1,84 @@
+"""
+Password Hashing Pool
+=====================
+
+Runs password hashing for /login and /register on a small bounded pool of
+worker threads instead of the request thread.
+
+The key derivation functions used by Werkzeug (hashlib.scrypt and
+hashlib.pbkdf2_hmac) release the GIL while they run, so a pool of N threads
+uses at most N cores for hashing and leaves the rest for cheap routes such
+as status polling. When more than `max_pending` hashes are queued the pool
+refuses new work with HashPoolBusy instead of building an unbounded backlog.
+
+Configuration (environment variables read by app.py):
+   - PASSWORD_HASH_METHOD  : Werkzeug method string, e.g. "scrypt:32768:8:1"
+                             or "pbkdf2:sha256:600000" (default: "scrypt")
+   - PASSWORD_HASH_WORKERS : number of hashing threads (default: 2)
+   - PASSWORD_HASH_QUEUE   : max hashes queued or running (default: 32)
+
+Changing PASSWORD_HASH_METHOD does not invalidate existing accounts: stored
+hashes made with other parameters are still verified and are transparently
+re-hashed with the current parameters on the next successful login.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+DEFAULT_HASH_METHOD = "scrypt"
+
+
+class HashPoolBusy(Exception):
+    """Raised when the hashing queue is full."""
+
+
+class PasswordHasher:
+    """Bounded worker pool for password hashing and verification."""
+
+    def __init__(self, method=None, max_workers=2, max_pending=32, queue_timeout=5.0):
+        self.method = method or DEFAULT_HASH_METHOD
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        # Werkzeug expands short methods ("scrypt") to their full parameters
+        # ("scrypt:32768:8:1"); hash once so stored prefixes can be compared.
+        self.method_prefix = generate_password_hash("probe", method=self.method).split("$", 1)[0]
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HashPoolBusy("Too many password operations in progress")
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        """Hash a new password with the configured method."""
+        return self._run(generate_password_hash, password, self.method)
+
+    def needs_rehash(self, stored_hash):
+        """True if the stored hash was made with different parameters."""
+        return stored_hash.split("$", 1)[0] != self.method_prefix
+
+    def verify(self, stored_hash, password):
+        """
+        Check a password against its stored hash.
+
+        Returns (ok, new_hash). new_hash is only set when the password was
+        correct and the stored hash should be replaced with one using the
+        current parameters.
+        """
+
+        def verify_and_upgrade():
+            if not check_password_hash(stored_hash, password):
+                return False, None
+            if self.needs_rehash(stored_hash):
+                return True, generate_password_hash(password, method=self.method)
+            return True, None
+
+        return self._run(verify_and_upgrade)
@@ -0,0 +1,163 @@
+"""
+Recent Sessions
+===============
+
+Bounded in-memory buffer of each user's most recent game sessions, so the
+game history list and status sparkline are served without a SQLite query.
+
+Every user gets one ring of `capacity` slots in a single preallocated
+array('I') of interleaved (ended_at, game_id, play_seconds) uint32 values,
+held by a __slots__ object: a fixed 12 bytes per slot plus a constant
+overhead, whatever the user's history length (see bytes_per_user()).
+
+   - record() is called after a session is committed; sessions arriving
+     out of order (replayed spools, agents) are placed by end time.
+   - recent() warms a user's ring from game_history on first access.
+   - At most `max_users` rings are kept; the least recently used one is
+     dropped and warmed again when needed.
+   - capacity 0 disables the buffer (recent() returns nothing).
+"""
+
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+
+import shards
+
+
+FIELDS = 3  # ended_at, game_id, play_seconds
+
+
+class _Ring:
+    __slots__ = ("data", "start", "count")
+
+    def __init__(self, capacity):
+        self.data = array("I", bytes(4 * FIELDS * capacity))
+        self.start = 0  # slot of the oldest session
+        self.count = 0
+
+
+class RecentSessions:
+    """Per-user ring buffers of (ended_at, game_id, play_seconds), newest first on read."""
+
+    def __init__(self, db_name, capacity=32, max_users=100000):
+        self.db_name = db_name
+        self.capacity = capacity
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._rings = OrderedDict()
+        # user_id -> True once a session was recorded while the ring was being warmed
+        self._warming = {}
+        self.hits = 0
+        self.warms = 0
+
+    def _sessions(self, ring):
+        """Sessions of a ring, oldest first."""
+        return self._newest(ring, ring.count)[::-1]
+
+    def _newest(self, ring, limit):
+        """Up to `limit` sessions of a ring, newest first."""
+        data, capacity = ring.data, self.capacity
+        sessions = []
+        for index in range(ring.count - 1, max(-1, ring.count - 1 - limit), -1):
+            slot = (ring.start + index) % capacity * FIELDS
+            sessions.append((data[slot], data[slot + 1], data[slot + 2]))
+        return sessions
+
+    def _fill(self, ring, sessions):
+        """Replace the ring contents with `sessions` (oldest first, at most capacity)."""
+        ring.start = 0
+        ring.count = len(sessions)
+        for slot, session in enumerate(sessions):
+            ring.data[slot * FIELDS:slot * FIELDS + FIELDS] = array("I", session)
+
+    def _append(self, ring, session):
+        capacity = self.capacity
+        if ring.count:
+            newest = (ring.start + ring.count - 1) % capacity * FIELDS
+            if session[0] < ring.data[newest]:
+                # Late arrival: rebuild in end-time order, keeping the newest
+                sessions = sorted(self._sessions(ring) + [session], key=lambda item: item[0])
+                self._fill(ring, sessions[-capacity:])
+                return
+        if ring.count < capacity:
+            slot = (ring.start + ring.count) % capacity
+            ring.count += 1
+        else:
+            slot = ring.start
+            ring.start = (ring.start + 1) % capacity
+        ring.data[slot * FIELDS:slot * FIELDS + FIELDS] = array("I", session)
+
+    def record(self, user_id, ended_at, game_id, play_seconds):
+        """Add a committed session to the user's ring (if it is loaded)."""
+        if not user_id or not game_id or not self.capacity:
+            return
+        session = (int(ended_at), int(game_id), int(play_seconds))
+        with self._lock:
+            if user_id in self._warming:
+                self._warming[user_id] = True
+            ring = self._rings.get(user_id)
+            if ring is not None:
+                self._append(ring, session)
+
+    def _warm(self, user_id):
+        conn = shards.connect(self.db_name, user_id)
+        rows = conn.execute(
+            """
+            SELECT CAST(strftime('%s', played_at) AS INTEGER), game_id, play_seconds
+            FROM game_history
+            WHERE user_id = ? AND game_id IS NOT NULL
+            ORDER BY played_at DESC LIMIT ?
+            """,
+            (user_id, self.capacity),
+        ).fetchall()
+        conn.close()
+        ring = _Ring(self.capacity)
+        self._fill(ring, rows[::-1])
+        return ring
+
+    def recent(self, user_id, limit=None):
+        """Up to `limit` (default: capacity) most recent sessions, newest first."""
+        if not user_id or not self.capacity:
+            return []
+        limit = self.capacity if limit is None else limit
+        with self._lock:
+            ring = self._rings.get(user_id)
+            if ring is not None:
+                self._rings.move_to_end(user_id)
+                self.hits += 1
+                sessions = self._newest(ring, limit)
+            else:
+                self._warming.setdefault(user_id, False)
+
+        if ring is None:
+            ring = self._warm(user_id)
+            with self._lock:
+                self.warms += 1
+                sessions = self._newest(ring, limit)
+                # Skip caching if a session was recorded while we were reading
+                if self._warming.pop(user_id, True) is False and user_id not in self._rings:
+                    self._rings[user_id] = ring
+                    while len(self._rings) > self.max_users:
+                        self._rings.popitem(last=False)
+
+        return sessions
+
+    def bytes_per_user(self):
+        """Memory of one user's ring (record + array), not counting its dict entry."""
+        ring = _Ring(self.capacity)
+        return sys.getsizeof(ring) + sys.getsizeof(ring.data)
+
+    def stats(self):
+        with self._lock:
+            users = len(self._rings)
+        per_user = self.bytes_per_user()
+        return {
+            "users": users,
+            "capacity": self.capacity,
+            "bytes_per_user": per_user,
+            "approx_bytes": users * per_user,
+            "hits": self.hits,
+            "warms": self.warms,
+        }
@@ -0,0 +1,326 @@
+"""
+Weekly Reports
+==============
+
+Batch job that builds a weekly report for every user: play time totals,
+top games and the risk classification of GameAddictionAnalyzer over the
+week, rendered with templates/weekly_report.html.
+
+   1. The parent process reads user ids in chunks (keyset pagination on
+      users.id) and hands each chunk to a process pool.
+   2. A worker reads the chunk's game_aggregates and game_history rows in
+      two queries, replays them into a RollingRiskScorer, classifies every
+      user and writes <out_dir>/<week>/user-<id>.html.
+   3. Chunks are collected in submission order; after each one the parent
+      optionally e-mails the reports (--email) and records the last user id
+      in <out_dir>/<week>/checkpoint.json, then prints progress.
+
+Re-running the job for the same week resumes after the checkpoint, so an
+interrupted run neither rebuilds finished chunks nor e-mails them twice
+(at most the chunk in flight when it stopped is sent again).
+
+app.py starts this module as a subprocess once a week (WEEKLY_REPORTS=1),
+so pool workers never import the web app.
+
+Usage:
+   python reports.py users.db [--out reports] [--week-ending 2026-10-19]
+                              [--workers 4] [--chunk-size 500] [--email]
+"""
+
+import argparse
+import calendar
+import json
+import os
+import smtplib
+import sqlite3
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+import analytics
+import shards
+from model import GameAddictionAnalyzer, RollingRiskScorer
+
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+TOP_GAMES = 5
+PROGRESS_SECONDS = 5.0
+
+_template = None
+
+
+def week_bounds(week_ending=None):
+    """
+    (since, until, label) of the reporting week as UTC 'YYYY-MM-DD' dates.
+
+    `week_ending` is the Monday the week ends at (exclusive); by default the
+    most recent Monday, i.e. the last full Monday-Sunday week.
+    """
+    if week_ending is None:
+        today = time.gmtime()
+        until_epoch = calendar.timegm((today.tm_year, today.tm_mon, today.tm_mday, 0, 0, 0)) - today.tm_wday * 86400
+    else:
+        until_epoch = calendar.timegm(time.strptime(week_ending, "%Y-%m-%d"))
+    since_epoch = until_epoch - 7 * 86400
+    since = time.strftime("%Y-%m-%d", time.gmtime(since_epoch))
+    until = time.strftime("%Y-%m-%d", time.gmtime(until_epoch))
+    return since, until, time.strftime("%G-W%V", time.gmtime(since_epoch))
+
+
+def _format_hours(seconds):
+    return f"{seconds / 3600:.1f}"
+
+
+def _render(context):
+    global _template
+    if _template is None:
+        env = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(["html"]))
+        _template = env.get_template("weekly_report.html")
+    return _template.render(**context)
+
+
+def build_chunk(db_name, out_dir, user_ids, since, until, week):
+    """Worker: write the reports of one chunk of users; returns their summaries."""
+    placeholders = ",".join("?" * len(user_ids))
+    conn = shards.connect(db_name)
+    users = {
+        user_id: (name, email)
+        for user_id, name, email in conn.execute(
+            f"SELECT id, name, email FROM users WHERE id IN ({placeholders})", user_ids
+        )
+    }
+    top_games = {}
+    for user_id, title, seconds, sessions in conn.execute(
+        f"""SELECT a.user_id, g.title, SUM(a.total_seconds) AS seconds, SUM(a.session_count)
+            FROM game_aggregates a JOIN games g ON g.id = a.game_id
+            WHERE a.user_id IN ({placeholders}) AND a.day >= ? AND a.day < ?
+            GROUP BY a.user_id, a.game_id ORDER BY a.user_id, seconds DESC""",
+        (*user_ids, since, until),
+    ):
+        games = top_games.setdefault(user_id, [])
+        if len(games) < TOP_GAMES:
+            games.append({"title": title, "hours": _format_hours(seconds), "sessions": sessions})
+
+    scorer = RollingRiskScorer()
+    for user_id, play_seconds, played_at in conn.execute(
+        f"""SELECT user_id, play_seconds, played_at FROM game_history
+            WHERE user_id IN ({placeholders}) AND played_at >= ? AND played_at < ?
+            ORDER BY played_at""",
+        (*user_ids, since, until),
+    ):
+        scorer.record_session(user_id, play_seconds, calendar.timegm(time.strptime(played_at, "%Y-%m-%d %H:%M:%S")))
+    conn.close()
+
+    analyzer = GameAddictionAnalyzer(scorer=scorer)
+    week_end = calendar.timegm(time.strptime(until, "%Y-%m-%d"))
+    week_dir = os.path.join(out_dir, week)
+    summaries = []
+    for user_id in user_ids:
+        if user_id not in users:
+            continue
+        name, email = users[user_id]
+        result = analyzer.analyze_recent(user_id, now=week_end)
+        week_totals = result["windows"]["7d"]
+        user_data = {
+            "hours": round(week_totals["play_seconds"] / 3600 / 7, 1),
+            "sessions": round(week_totals["session_count"] / 7, 1),
+            "night_gaming": "yes" if week_totals["night_sessions"] else "no",
+        }
+        html = _render({
+            "name": name,
+            "week": week,
+            "since": since,
+            "until": until,
+            "total_hours": _format_hours(week_totals["play_seconds"]),
+            "total_sessions": week_totals["session_count"],
+            "night_sessions": week_totals["night_sessions"],
+            "top_games": top_games.get(user_id, []),
+            "user_data": user_data,
+            "result": result,
+        })
+        path = os.path.join(week_dir, f"user-{user_id}.html")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(html)
+        os.replace(path + ".tmp", path)
+        summaries.append({
+            "user_id": user_id,
+            "email": email,
+            "path": path,
+            "classification": result["classification"],
+            "risk_score": result["risk_score"],
+            "play_seconds": week_totals["play_seconds"],
+        })
+    return summaries
+
+
+class WeeklyReportJob:
+    """Builds one week's reports for all users on a process pool, resumable from a checkpoint."""
+
+    def __init__(self, db_name, out_dir="reports", week_ending=None, workers=None, chunk_size=500, deliver=None):
+        self.db_name = db_name
+        self.out_dir = out_dir
+        self.since, self.until, self.week = week_bounds(week_ending)
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        # deliver(summary) is called in this process for every report, in user id order
+        self.deliver = deliver
+        self.checkpoint_path = os.path.join(out_dir, self.week, "checkpoint.json")
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"week": self.week, "last_user_id": 0, "reports": 0, "finished": False}
+
+    def _save_checkpoint(self, state):
+        with open(self.checkpoint_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(self.checkpoint_path + ".tmp", self.checkpoint_path)
+
+    def _next_chunk(self, conn, after_id):
+        return [row[0] for row in conn.execute(
+            "SELECT id FROM users WHERE id > ? ORDER BY id LIMIT ?", (after_id, self.chunk_size)
+        )]
+
+    def run(self):
+        """Build (or finish building) the week's reports. Returns a report dict."""
+        os.makedirs(os.path.join(self.out_dir, self.week), exist_ok=True)
+        state = self.load_checkpoint()
+        resumed_from = state["last_user_id"]
+        if state["finished"]:
+            print(f"[REPORTS] {self.week} already complete ({state['reports']} reports)")
+            return dict(state, resumed_from=resumed_from, users_per_sec=0, duration_seconds=0.0)
+
+        conn = sqlite3.connect(self.db_name)
+        remaining = conn.execute("SELECT COUNT(*) FROM users WHERE id > ?", (resumed_from,)).fetchone()[0]
+        print(f"[REPORTS] {self.week}: {remaining} users left, {self.workers} workers"
+              + (f", resuming after user {resumed_from}" if resumed_from else ""))
+
+        started = last_progress = time.perf_counter()
+        built = 0
+        pending = deque()
+        next_after = resumed_from
+        exhausted = False
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            while pending or not exhausted:
+                # Keep every worker busy with a chunk queued behind it
+                while not exhausted and len(pending) < self.workers * 2:
+                    user_ids = self._next_chunk(conn, next_after)
+                    if not user_ids:
+                        exhausted = True
+                        break
+                    next_after = user_ids[-1]
+                    pending.append((user_ids[-1], executor.submit(
+                        build_chunk, self.db_name, self.out_dir, user_ids, self.since, self.until, self.week
+                    )))
+                if not pending:
+                    break
+
+                last_user_id, future = pending.popleft()
+                summaries = future.result()
+                if self.deliver:
+                    for summary in summaries:
+                        self.deliver(summary)
+                built += len(summaries)
+                state.update(last_user_id=last_user_id, reports=state["reports"] + len(summaries))
+                self._save_checkpoint(state)
+
+                now = time.perf_counter()
+                if now - last_progress >= PROGRESS_SECONDS:
+                    last_progress = now
+                    print(f"[REPORTS] {built}/{remaining} users, {built / (now - started):.0f} users/s")
+        except BaseException:
+            executor.shutdown(wait=True, cancel_futures=True)
+            conn.close()
+            print(f"[REPORTS] Interrupted after user {state['last_user_id']}; run again to resume")
+            raise
+        executor.shutdown()
+        conn.close()
+
+        duration = time.perf_counter() - started
+        state["finished"] = True
+        self._save_checkpoint(state)
+        print(f"[REPORTS] {self.week}: {built} reports in {duration:.1f}s ({built / duration if duration else 0:.0f} users/s)")
+        return dict(
+            state,
+            built=built,
+            resumed_from=resumed_from,
+            duration_seconds=round(duration, 3),
+            users_per_sec=round(built / duration) if duration else 0,
+        )
+
+
+def email_report(db_name):
+    """deliver() callback that mails each report to users with e-mail alerts enabled."""
+    from email_config import get_email_config
+
+    config = get_email_config()
+    if config is None:
+        raise SystemExit("Email not configured - see email_config.py")
+    conn = shards.connect(db_name)
+    opted_out = {row[0] for row in conn.execute("SELECT user_id FROM user_alert_settings WHERE email_alerts_enabled = 0")}
+    conn.close()
+
+    def deliver(summary):
+        if summary["user_id"] in opted_out or not summary["email"]:
+            return
+        with open(summary["path"], encoding="utf-8") as f:
+            html = f.read()
+        msg = MIMEMultipart()
+        msg["From"] = config["email"]
+        msg["To"] = summary["email"]
+        msg["Subject"] = f"Game Addiction Monitor: your weekly report ({summary['classification']})"
+        msg.attach(MIMEText(html, "html"))
+        try:
+            server = smtplib.SMTP("smtp.gmail.com", 587)
+            server.starttls()
+            server.login(config["email"], config["app_password"])
+            server.sendmail(config["email"], summary["email"], msg.as_string())
+            server.quit()
+            sent_at = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+            conn = shards.connect(db_name, summary["user_id"])
+            conn.execute(
+                "INSERT INTO alerts_log (user_id, alert_type, message, sent_via, sent_at) "
+                "VALUES (?, 'weekly_report', ?, 'email', ?)",
+                (summary["user_id"], f"Weekly report sent: {summary['classification']}", sent_at),
+            )
+            # Same change log write as app._send_alert, so the analytics store sees report alerts
+            analytics.log_alert(conn, summary["user_id"], "weekly_report", None, sent_at)
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"[EMAIL ERROR] Weekly report for user {summary['user_id']}: {e}")
+
+    return deliver
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build weekly per-user reports")
+    parser.add_argument("db", help="app database (users.db)")
+    parser.add_argument("--out", default="reports", help="output directory (default: reports)")
+    parser.add_argument("--week-ending", help="Monday (YYYY-MM-DD, UTC) the week ends at (default: the last one)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="users per chunk (default: 500)")
+    parser.add_argument("--email", action="store_true", help="also e-mail every report")
+    args = parser.parse_args(argv)
+
+    job = WeeklyReportJob(
+        args.db, args.out, args.week_ending, args.workers, args.chunk_size,
+        deliver=email_report(args.db) if args.email else None,
+    )
+    try:
+        print(json.dumps(job.run(), indent=2))
+    except KeyboardInterrupt:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+Retention and Archival
+======================
+
+Keeps alerts_log and game_history from growing forever.
+
+For every table with a retention window the engine:
+   1. reads rows older than the window in small batches (oldest first),
+   2. writes each batch to a compressed columnar archive file
+      (gzip'd JSON holding one list per column),
+   3. deletes exactly those rows in a short transaction, pausing between
+      batches so the monitor and alert writers are never blocked for long,
+then runs an incremental VACUUM and a bounded ANALYZE and reports rows
+archived, bytes reclaimed and duration.
+
+Archived rows stay queryable with query_archive(). Per-game totals shown on
+the dashboard come from the analytics store (analytics.py), which keeps its
+own copy of every session, so they are not affected.
+
+Configuration (environment variables read by app.py):
+   - RETENTION_ALERTS_DAYS   : days of alerts_log to keep (default: 90)
+   - RETENTION_HISTORY_DAYS  : days of game_history to keep (default: 365)
+   - RETENTION_INTERVAL_HOURS: how often the background job runs (default: 24, 0 = off)
+   - ARCHIVE_DIR             : where archive files are written (default: archive)
+
+Usage:
+   python retention.py users.db [archive_dir]
+"""
+
+import glob
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import shards
+
+
+# table -> (timestamp column, query returning the archived columns)
+ARCHIVE_QUERIES = {
+    "alerts_log": (
+        "sent_at",
+        """SELECT l.id, l.user_id, l.alert_type, l.message, l.game_id, g.title AS game_title, l.sent_via, l.sent_at
+           FROM alerts_log l LEFT JOIN games g ON g.id = l.game_id
+           WHERE l.sent_at < ? ORDER BY l.sent_at, l.id LIMIT ?""",
+    ),
+    "game_history": (
+        "played_at",
+        """SELECT h.id, h.user_id, h.game_id, g.title AS game_title, h.play_seconds, h.played_at
+           FROM game_history h LEFT JOIN games g ON g.id = h.game_id
+           WHERE h.played_at < ? ORDER BY h.played_at, h.id LIMIT ?""",
+    ),
+}
+
+DEFAULT_RETENTION_DAYS = {"alerts_log": 90, "game_history": 365}
+
+
+def _db_bytes(conn):
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return pages * size, free * size
+
+
+def write_archive(path, columns, rows):
+    """Write rows as a columnar gzip'd JSON file (atomically via rename)."""
+    data = {"columns": {name: [row[i] for row in rows] for i, name in enumerate(columns)}}
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def read_archive(path):
+    """Load one archive file as {column: [values]}."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)["columns"]
+
+
+def query_archive(archive_dir, table, user_id=None, since=None, until=None):
+    """
+    Rows (as dicts) from the archive of one table, optionally filtered by
+    user and by timestamp range ('YYYY-MM-DD HH:MM:SS' strings, UTC).
+    """
+    time_column = ARCHIVE_QUERIES[table][0]
+    seen = set()
+    results = []
+    for path in sorted(glob.glob(os.path.join(archive_dir, table, "*.json.gz"))):
+        columns = read_archive(path)
+        names = list(columns)
+        for values in zip(*columns.values()):
+            row = dict(zip(names, values))
+            if row["id"] in seen:
+                continue
+            if user_id is not None and row["user_id"] != user_id:
+                continue
+            if since is not None and row[time_column] < since:
+                continue
+            if until is not None and row[time_column] >= until:
+                continue
+            seen.add(row["id"])
+            results.append(row)
+    results.sort(key=lambda row: row[time_column])
+    return results
+
+
+class RetentionEngine:
+    """Archives and prunes aged rows, then compacts the database."""
+
+    def __init__(self, db_name, archive_dir="archive", retention_days=None,
+                 batch_size=500, pause_seconds=0.05, vacuum_pages=2000):
+        self.db_name = db_name
+        self.archive_dir = archive_dir
+        self.retention_days = dict(DEFAULT_RETENTION_DAYS, **(retention_days or {}))
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.vacuum_pages = vacuum_pages
+
+    def _archive_table(self, conn, table, days):
+        time_column, query = ARCHIVE_QUERIES[table]
+        cutoff = conn.execute("SELECT datetime('now', ?)", (f"-{int(days)} days",)).fetchone()[0]
+        os.makedirs(os.path.join(self.archive_dir, table), exist_ok=True)
+
+        archived = files = 0
+        while True:
+            cursor = conn.execute(query, (cutoff, self.batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            columns = [description[0] for description in cursor.description]
+            ids = [row[0] for row in rows]
+            path = os.path.join(self.archive_dir, table, f"{table}-{min(ids)}-{max(ids)}.json.gz")
+            write_archive(path, columns, rows)
+
+            # Deferred: the delete then locks only this file, not the core database attached to a shard
+            conn.execute("BEGIN")
+            conn.executemany(f"DELETE FROM {table} WHERE id = ?", [(row_id,) for row_id in ids])
+            conn.execute("COMMIT")
+
+            archived += len(rows)
+            files += 1
+            if len(rows) < self.batch_size:
+                break
+            time.sleep(self.pause_seconds)
+        return {"rows_archived": archived, "files_written": files, "cutoff": cutoff}
+
+    def run(self):
+        """One full retention pass (over every shard). Returns a report dict."""
+        started = time.perf_counter()
+        report = {"tables": {}}
+        for shard in range(len(shards.databases(self.db_name))):
+            conn = shards.connect_shard(self.db_name, shard, isolation_level=None, timeout=30)
+            try:
+                part = self._run_database(conn)
+            finally:
+                conn.close()
+            for table, counts in part.pop("tables").items():
+                total = report["tables"].setdefault(table, {"rows_archived": 0, "files_written": 0})
+                total["rows_archived"] += counts["rows_archived"]
+                total["files_written"] += counts["files_written"]
+                total["cutoff"] = counts["cutoff"]
+            for key, value in part.items():
+                report[key] = report.get(key, 0) + value
+        report["bytes_reclaimed"] = report["bytes_before"] - report["bytes_after"]
+        report["duration_seconds"] = round(time.perf_counter() - started, 3)
+        return report
+
+    def _run_database(self, conn):
+        size_before, _ = _db_bytes(conn)
+
+        tables = {}
+        for table, days in self.retention_days.items():
+            if days and days > 0:
+                tables[table] = self._archive_table(conn, table, days)
+
+        # Only databases created with auto_vacuum=INCREMENTAL can give pages back
+        # without a blocking full VACUUM (see enable_incremental_vacuum).
+        _, free_before = _db_bytes(conn)
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            # The pragma frees one page per step and execute() only steps once;
+            # executescript() runs it to completion.
+            conn.executescript(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)});")
+        conn.execute("PRAGMA analysis_limit=400")
+        conn.execute("ANALYZE main")
+        size_after, free_after = _db_bytes(conn)
+
+        return {
+            "tables": tables,
+            "bytes_before": size_before,
+            "bytes_after": size_after,
+            "free_bytes_reusable": free_after,
+            "free_bytes_before_vacuum": free_before,
+        }
+
+
+def enable_incremental_vacuum(db_name):
+    """
+    Switch an existing database to auto_vacuum=INCREMENTAL.
+
+    This needs one full VACUUM, which locks the database while it runs, so
+    it is a manual maintenance step rather than part of the scheduled job.
+    """
+    conn = sqlite3.connect(db_name, isolation_level=None)
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    conn.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python retention.py <db> [archive_dir]")
+    engine = RetentionEngine(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else "archive")
+    print(json.dumps(engine.run(), indent=2))
@@ -0,0 +1,248 @@
+"""
+Risk Snapshots
+==============
+
+Nightly job that re-scores every user and keeps one compact row per user
+per day in `risk_snapshots`, so risk can be followed over time and queried
+by class ("who was Addicted on 2026-10-18", "who moved to Addicted").
+
+A snapshot for day D uses the 7 days ending with D, the same window as
+GameAddictionAnalyzer.analyze_recent():
+
+   1. play seconds, session counts and night sessions are summed per user
+      from game_history (one row per session, whereas game_aggregates
+      has one per game played), read in fetchmany() batches
+      straight into NumPy arrays indexed by user id (np.bincount), never as
+      per-user Python objects
+   2. GameAddictionAnalyzer.score_batch() scores all users in one pass
+   3. rows are written ordered by (day, user_id) in one transaction
+
+Users without sessions get a row too (Normal), so a day's snapshot is the
+whole population. Re-running a day replaces its rows.
+
+Night sessions use the machine's current UTC offset for the whole window,
+where RollingRiskScorer looks up the offset per session; they only differ
+for sessions right at a daylight saving change.
+
+Usage:
+   python risk_snapshots.py run users.db [--day 2026-10-18]
+   python risk_snapshots.py moved users.db [--to Addicted] [--day 2026-10-18]
+"""
+
+import argparse
+import calendar
+import json
+import sqlite3
+import sys
+import time
+from itertools import repeat
+
+import numpy as np
+
+import shards
+from model import GameAddictionAnalyzer, RollingRiskScorer
+
+
+FETCH_ROWS = 100000
+INSERT_ROWS = 50000
+WINDOW_DAYS = 7
+CLASSIFICATIONS = GameAddictionAnalyzer.CLASSIFICATIONS
+
+
+def ensure_schema(conn):
+    # (day, user_id) keeps each night's insert an append at the end of the table;
+    # the class index covers "users by class on a day" without touching the rows.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS risk_snapshots (
+            day TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            classification INTEGER NOT NULL,
+            risk_score INTEGER NOT NULL,
+            play_seconds INTEGER NOT NULL,
+            session_count INTEGER NOT NULL,
+            night_sessions INTEGER NOT NULL,
+            PRIMARY KEY (day, user_id)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_risk_snapshots_class ON risk_snapshots(day, classification)")
+
+
+def default_day(now=None):
+    """Yesterday (UTC): the last complete day."""
+    now = time.time() if now is None else now
+    return time.strftime("%Y-%m-%d", time.gmtime(now - 86400))
+
+
+def _day_epoch(day):
+    return calendar.timegm(time.strptime(day, "%Y-%m-%d"))
+
+
+def _batches(cursor):
+    """fetchmany() batches of integer rows as 2-D int64 arrays."""
+    while True:
+        rows = cursor.fetchmany(FETCH_ROWS)
+        if not rows:
+            return
+        yield np.array(rows, dtype=np.int64)
+
+
+def night_mask(started_at, ended_at, utc_offset):
+    """RollingRiskScorer.is_night_session() for arrays of UTC epochs at a fixed offset."""
+    start_local = started_at + utc_offset
+    hour = start_local % 86400 // 3600
+    night_begins = start_local - start_local % 86400 + RollingRiskScorer.NIGHT_START_HOUR * 3600
+    return (
+        (hour >= RollingRiskScorer.NIGHT_START_HOUR)
+        | (hour < RollingRiskScorer.NIGHT_END_HOUR)
+        | (ended_at + utc_offset >= night_begins)
+    )
+
+
+def compute_features(conn, day):
+    """(user_ids, play_seconds, session_count, night_sessions) arrays for the window ending with `day`."""
+    max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0]
+    play_seconds = np.zeros(max_id + 1, dtype=np.float64)
+    session_count = np.zeros(max_id + 1, dtype=np.float64)
+    night_sessions = np.zeros(max_id + 1, dtype=np.float64)
+
+    until = _day_epoch(day) + 86400
+    first_day = time.strftime("%Y-%m-%d", time.gmtime(until - WINDOW_DAYS * 86400))
+    utc_offset = time.localtime().tm_gmtoff
+    for batch in _batches(conn.execute(
+        "SELECT user_id, play_seconds, CAST(strftime('%s', played_at) AS INTEGER) FROM game_history "
+        "WHERE played_at >= ? AND played_at < ? AND user_id <= ?",
+        (first_day, time.strftime("%Y-%m-%d", time.gmtime(until)), max_id),
+    )):
+        play_seconds += np.bincount(batch[:, 0], weights=batch[:, 1], minlength=max_id + 1)
+        session_count += np.bincount(batch[:, 0], minlength=max_id + 1)
+        night = night_mask(batch[:, 2] - batch[:, 1], batch[:, 2], utc_offset)
+        night_sessions += np.bincount(batch[night, 0], minlength=max_id + 1)
+
+    user_ids = np.fromiter((row[0] for row in conn.execute("SELECT id FROM users ORDER BY id")), dtype=np.int64)
+    return (
+        user_ids,
+        play_seconds[user_ids].astype(np.int64),
+        session_count[user_ids].astype(np.int64),
+        night_sessions[user_ids].astype(np.int64),
+    )
+
+
+class RiskSnapshotJob:
+    """Scores every user for one day and stores the result in risk_snapshots."""
+
+    def __init__(self, db_name, analyzer=None):
+        self.db_name = db_name
+        self.analyzer = analyzer or GameAddictionAnalyzer()
+
+    def run(self, day=None):
+        """Snapshot `day` (default: yesterday, UTC). Returns a report dict."""
+        day = day or default_day()
+        started = time.perf_counter()
+        conn = shards.connect(self.db_name)
+        user_ids, play_seconds, session_count, night_sessions = compute_features(conn, day)
+        conn.close()
+        features_done = time.perf_counter()
+        risk_scores, classes = self.analyzer.score_batch(
+            play_seconds / 3600 / WINDOW_DAYS, session_count / WINDOW_DAYS, night_sessions
+        )
+        scored = time.perf_counter()
+
+        columns = [user_ids, classes, risk_scores, play_seconds, session_count, night_sessions]
+        # Separate connection: BEGIN IMMEDIATE on the one above would lock every shard
+        conn = sqlite3.connect(self.db_name)
+        ensure_schema(conn)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM risk_snapshots WHERE day = ?", (day,))
+            for start in range(0, len(user_ids), INSERT_ROWS):
+                conn.executemany(
+                    "INSERT INTO risk_snapshots (day, user_id, classification, risk_score, play_seconds, "
+                    "session_count, night_sessions) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    zip(repeat(day), *(column[start:start + INSERT_ROWS].tolist() for column in columns)),
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        finished = time.perf_counter()
+        counts = np.bincount(classes, minlength=len(CLASSIFICATIONS))
+        return {
+            "day": day,
+            "users": len(user_ids),
+            "classes": {name: int(count) for name, count in zip(CLASSIFICATIONS, counts)},
+            "features_seconds": round(features_done - started, 3),
+            "score_seconds": round(scored - features_done, 3),
+            "write_seconds": round(finished - scored, 3),
+            "duration_seconds": round(finished - started, 3),
+            "users_per_sec": round(len(user_ids) / (finished - started)) if finished > started else 0,
+        }
+
+
+def users_by_class(conn, day, classification):
+    """User ids in `classification` (a name from CLASSIFICATIONS) on `day`."""
+    return [row[0] for row in conn.execute(
+        "SELECT user_id FROM risk_snapshots WHERE day = ? AND classification = ?",
+        (day, CLASSIFICATIONS.index(classification)),
+    )]
+
+
+def moved_to(conn, day, classification, previous_day=None):
+    """Users in `classification` on `day` who were in a lower class (or unscored) on `previous_day`."""
+    previous_day = previous_day or time.strftime("%Y-%m-%d", time.gmtime(_day_epoch(day) - 86400))
+    target = CLASSIFICATIONS.index(classification)
+    return [row[0] for row in conn.execute(
+        """SELECT t.user_id FROM risk_snapshots t
+           LEFT JOIN risk_snapshots p ON p.day = ? AND p.user_id = t.user_id
+           WHERE t.day = ? AND t.classification = ? AND (p.classification IS NULL OR p.classification < ?)""",
+        (previous_day, day, target, target),
+    )]
+
+
+def user_history(conn, user_id, days=30, until=None):
+    """One user's snapshots for the last `days` days, oldest first."""
+    last = _day_epoch(until or default_day())
+    # One primary key lookup per day instead of a range scan over every user
+    wanted = [time.strftime("%Y-%m-%d", time.gmtime(last - offset * 86400)) for offset in range(days - 1, -1, -1)]
+    rows = conn.execute(
+        f"""SELECT day, classification, risk_score, play_seconds, session_count, night_sessions
+            FROM risk_snapshots WHERE day IN ({",".join("?" * len(wanted))}) AND user_id = ? ORDER BY day""",
+        (*wanted, user_id),
+    ).fetchall()
+    return [
+        {
+            "day": day,
+            "classification": CLASSIFICATIONS[classification],
+            "risk_score": risk_score,
+            "hours_per_day": round(play_seconds / 3600 / WINDOW_DAYS, 2),
+            "sessions_per_day": round(session_count / WINDOW_DAYS, 2),
+            "night_sessions": night,
+        }
+        for day, classification, risk_score, play_seconds, session_count, night in rows
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nightly risk snapshots")
+    parser.add_argument("command", choices=("run", "moved"))
+    parser.add_argument("db", help="app database (users.db)")
+    parser.add_argument("--day", help="UTC day YYYY-MM-DD (default: yesterday)")
+    parser.add_argument("--to", default="Addicted", choices=CLASSIFICATIONS, help="class for `moved` (default: Addicted)")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        print(json.dumps(RiskSnapshotJob(args.db).run(args.day), indent=2))
+    else:
+        conn = sqlite3.connect(args.db)
+        for user_id in moved_to(conn, args.day or default_day(), args.to):
+            print(user_id)
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,401 @@
+"""
+Full-Text Search
+================
+
+FTS5 indexes over alert messages and game names, so searches such as
+"all alerts mentioning valorant last month" do not scan every row with
+LIKE '%...%'.
+
+   - alerts_fts  external-content index on alerts_log (message, user_id,
+                 month of sent_at) through the alerts_search view; the rows
+                 live only in alerts_log, the index holds tokens
+   - games_fts   title + known process aliases per game; game_history
+                 stores game ids, so history is searched by matching games
+                 first and then reading the user's rows by game id
+
+Triggers on alerts_log, games and game_aliases keep both indexes in sync
+with every insert, update and delete (including retention pruning). The
+user id and the month ("m202603") are indexed as tokens of their own
+columns, so a per-user or date-limited search only walks the entries of
+that user / those months instead of every match in the table; exact date
+bounds are then checked on the few rows left.
+
+In a sharded database (see shards.py) alerts_fts lives in each shard next to
+its alerts_log and games_fts in users.db; search_database() searches one
+user's shard or merges the pages of all of them.
+
+Queries are plain words and all of them must match. Words match whole
+tokens; a trailing * asks for a prefix match ("valo*" finds Valorant).
+Prefix terms read every matching entry in the index, so they are slower
+than whole words. Other FTS5 operators in user
+input are not interpreted.
+
+Usage:
+   python search.py rebuild users.db
+   python search.py alerts users.db "valorant" [--user 7] [--since 2026-09-01]
+   python search.py history users.db "league" [--user 7] [--until 2026-09-30]
+"""
+
+import argparse
+import calendar
+import json
+import re
+import sqlite3
+import sys
+import time
+
+import shards
+
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+_ALERT_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS alerts_fts_insert AFTER INSERT ON alerts_log BEGIN
+           INSERT INTO alerts_fts (rowid, message, user_id, month)
+           VALUES (new.id, new.message, new.user_id, 'm' || strftime('%Y%m', new.sent_at));
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS alerts_fts_delete AFTER DELETE ON alerts_log BEGIN
+           INSERT INTO alerts_fts (alerts_fts, rowid, message, user_id, month)
+           VALUES ('delete', old.id, old.message, old.user_id, 'm' || strftime('%Y%m', old.sent_at));
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS alerts_fts_update AFTER UPDATE OF message, user_id, sent_at ON alerts_log BEGIN
+           INSERT INTO alerts_fts (alerts_fts, rowid, message, user_id, month)
+           VALUES ('delete', old.id, old.message, old.user_id, 'm' || strftime('%Y%m', old.sent_at));
+           INSERT INTO alerts_fts (rowid, message, user_id, month)
+           VALUES (new.id, new.message, new.user_id, 'm' || strftime('%Y%m', new.sent_at));
+       END""",
+)
+_GAME_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS games_fts_insert AFTER INSERT ON games BEGIN
+           INSERT INTO games_fts (rowid, title, aliases) VALUES (new.id, new.title, '');
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS games_fts_delete AFTER DELETE ON games BEGIN
+           DELETE FROM games_fts WHERE rowid = old.id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS games_fts_update AFTER UPDATE OF title ON games BEGIN
+           UPDATE games_fts SET title = new.title WHERE rowid = new.id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS game_aliases_fts_insert AFTER INSERT ON game_aliases BEGIN
+           UPDATE games_fts SET aliases = trim(aliases || ' ' || new.alias) WHERE rowid = new.game_id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS game_aliases_fts_delete AFTER DELETE ON game_aliases BEGIN
+           UPDATE games_fts SET aliases = COALESCE(
+               (SELECT group_concat(alias, ' ') FROM game_aliases WHERE game_id = old.game_id), ''
+           ) WHERE rowid = old.game_id;
+       END""",
+)
+
+
+def _exists(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+
+def ensure_schema(conn):
+    """Create the indexes and triggers; indexes created here are filled from the existing rows."""
+    ensure_alerts_schema(conn)
+    ensure_games_schema(conn)
+
+
+def ensure_alerts_schema(conn):
+    """alerts_fts and its triggers (in every database holding alerts_log, i.e. each shard)."""
+    created = not _exists(conn, "alerts_fts")
+    # What alerts_fts indexes (and reads back for rebuild)
+    conn.execute(
+        """
+        CREATE VIEW IF NOT EXISTS alerts_search AS
+        SELECT id, message, user_id, 'm' || strftime('%Y%m', sent_at) AS month FROM alerts_log
+        """
+    )
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS alerts_fts USING fts5(
+            message, user_id, month,
+            content='alerts_search', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """
+    )
+    for sql in _ALERT_TRIGGERS:
+        conn.execute(sql)
+    if created:
+        rebuild_alerts(conn)
+
+
+def ensure_games_schema(conn):
+    """games_fts and its triggers (in the core database, next to games)."""
+    created = not _exists(conn, "games_fts")
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS games_fts USING fts5(
+            title, aliases,
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """
+    )
+    for sql in _GAME_TRIGGERS:
+        conn.execute(sql)
+    if created:
+        rebuild_games(conn)
+
+
+def rebuild(conn):
+    """Re-index both tables from scratch (after bulk loads or if an index is suspect)."""
+    rebuild_alerts(conn)
+    rebuild_games(conn)
+
+
+def rebuild_alerts(conn):
+    conn.execute("INSERT INTO alerts_fts (alerts_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO alerts_fts (alerts_fts) VALUES ('optimize')")
+
+
+def rebuild_games(conn):
+    conn.execute("DELETE FROM games_fts")
+    conn.execute(
+        """INSERT INTO games_fts (rowid, title, aliases)
+           SELECT g.id, g.title, COALESCE((SELECT group_concat(alias, ' ') FROM game_aliases WHERE game_id = g.id), '')
+           FROM games g"""
+    )
+
+
+def _words(text):
+    """Lower-case words of a query, keeping a trailing * (prefix search)."""
+    return re.findall(r"\w+\*?", text.lower())
+
+
+def match_expression(text):
+    """FTS5 query for free text: every word as a quoted term, all required. None if no words."""
+    words = _words(text)
+    if not words:
+        return None
+    return " ".join(f'"{word[:-1]}"*' if word.endswith("*") else f'"{word}"' for word in words)
+
+
+def _matches(token, words):
+    return any(token.startswith(word[:-1]) if word.endswith("*") else token == word for word in words)
+
+
+def highlight(message, words, before="<mark>", after="</mark>"):
+    """Wrap the tokens of `message` that a search for `words` matched."""
+    # FTS5's highlight() would re-run the match for every row on the page
+    return re.sub(
+        r"\w+",
+        lambda token: f"{before}{token.group()}{after}" if _matches(token.group().lower(), words) else token.group(),
+        message,
+    )
+
+
+def _day_bounds(since, until):
+    """[since, until] UTC days as timestamp strings comparable with sent_at / played_at ('until' is inclusive)."""
+    low = high = None
+    if since:
+        low = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(calendar.timegm(time.strptime(since, "%Y-%m-%d"))))
+    if until:
+        high = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(calendar.timegm(time.strptime(until, "%Y-%m-%d")) + 86400))
+    return low, high
+
+
+def _months(low, high):
+    """Month tokens ('m202603') from timestamp `low` up to `high`."""
+    year, month = int(low[:4]), int(low[5:7])
+    months = []
+    while f"{year:04d}-{month:02d}" <= high[:7]:
+        months.append(f"m{year:04d}{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def _page(total, page, per_page, results):
+    return {"total": total, "page": page, "per_page": per_page, "pages": -(-total // per_page), "results": results}
+
+
+def search_alerts(conn, text, user_id=None, since=None, until=None, page=1, per_page=PAGE_SIZE):
+    """
+    Alerts whose message matches `text`, best match first (bm25).
+    `since` / `until` are inclusive UTC days (YYYY-MM-DD); user_id=None searches everyone.
+    """
+    expression = match_expression(text)
+    if expression is None:
+        return _page(0, page, per_page, [])
+    expression = f"message : ({expression})"
+    if user_id is not None:
+        expression = f'user_id : "{int(user_id)}" AND {expression}'
+
+    low, high = _day_bounds(since, until)
+    where = "alerts_fts MATCH ?"
+    params = []
+    if low or high:
+        # Two subqueries: SQLite only answers a lone MIN() / MAX() from the index
+        first, last = conn.execute(
+            "SELECT (SELECT MIN(sent_at) FROM alerts_log), (SELECT MAX(sent_at) FROM alerts_log)"
+        ).fetchone()
+        if first is None:
+            return _page(0, page, per_page, [])
+        # `high` is exclusive: the last second it lets through decides the last month
+        until_second = high and time.strftime(
+            "%Y-%m-%d %H:%M:%S", time.gmtime(calendar.timegm(time.strptime(high, "%Y-%m-%d %H:%M:%S")) - 1)
+        )
+        months = _months(max(low or first, first), min(until_second or last, last))
+        if not months:
+            return _page(0, page, per_page, [])
+        expression = f"month : ({' OR '.join(months)}) AND {expression}"
+    if low:
+        where += " AND l.sent_at >= ?"
+        params.append(low)
+    if high:
+        where += " AND l.sent_at < ?"
+        params.append(high)
+    params.insert(0, expression)
+
+    total = conn.execute(
+        f"SELECT COUNT(*) FROM alerts_fts JOIN alerts_log l ON l.id = alerts_fts.rowid WHERE {where}", params
+    ).fetchone()[0]
+    rows = conn.execute(
+        f"""SELECT l.id, l.user_id, l.alert_type, l.message, g.title, l.sent_via, l.sent_at,
+                   bm25(alerts_fts, 1.0, 0.0, 0.0) AS score
+            FROM alerts_fts JOIN alerts_log l ON l.id = alerts_fts.rowid
+            LEFT JOIN games g ON g.id = l.game_id
+            WHERE {where} ORDER BY score, l.sent_at DESC LIMIT ? OFFSET ?""",
+        (*params, per_page, (page - 1) * per_page),
+    ).fetchall()
+    words = _words(text)
+    return _page(total, page, per_page, [
+        {
+            "id": row[0],
+            "user_id": row[1],
+            "alert_type": row[2],
+            "message": row[3],
+            "game_name": row[4],
+            "sent_via": row[5],
+            "sent_at": row[6],
+            "highlight": highlight(row[3], words),
+            "score": round(-row[7], 3),
+        }
+        for row in rows
+    ])
+
+
+def matching_games(conn, text, limit=50):
+    """(game_id, title) pairs whose title or process aliases match `text`, best match first."""
+    expression = match_expression(text)
+    if expression is None:
+        return []
+    return conn.execute(
+        "SELECT rowid, title FROM games_fts WHERE games_fts MATCH ? ORDER BY bm25(games_fts, 2.0, 1.0) LIMIT ?",
+        (expression, limit),
+    ).fetchall()
+
+
+def search_history(conn, text, user_id=None, since=None, until=None, page=1, per_page=PAGE_SIZE):
+    """
+    Game sessions of games matching `text`, most recent first.
+    The matched games (ranked) are returned under "games".
+    """
+    games = matching_games(conn, text)
+    if not games:
+        result = _page(0, page, per_page, [])
+        result["games"] = []
+        return result
+
+    titles = dict(games)
+    low, high = _day_bounds(since, until)
+    where = f"game_id IN ({','.join('?' * len(games))})"
+    params = list(titles)
+    if user_id is not None:
+        where += " AND user_id = ?"
+        params.append(user_id)
+    if low:
+        where += " AND played_at >= ?"
+        params.append(low)
+    if high:
+        where += " AND played_at < ?"
+        params.append(high)
+
+    total = conn.execute(f"SELECT COUNT(*) FROM game_history WHERE {where}", params).fetchone()[0]
+    rows = conn.execute(
+        f"""SELECT id, user_id, game_id, play_seconds, played_at FROM game_history
+            WHERE {where} ORDER BY played_at DESC LIMIT ? OFFSET ?""",
+        (*params, per_page, (page - 1) * per_page),
+    ).fetchall()
+    result = _page(total, page, per_page, [
+        {"id": row[0], "user_id": row[1], "game_name": titles[row[2]], "play_seconds": row[3], "played_at": row[4]}
+        for row in rows
+    ])
+    result["games"] = [title for _, title in games]
+    return result
+
+
+def search_database(db_name, what, text, user_id=None, since=None, until=None, page=1, per_page=PAGE_SIZE):
+    """
+    search_alerts() / search_history() on a users.db that may be split into shards:
+    one user's shard, or (user_id=None) every shard with the pages merged.
+    """
+    find = search_alerts if what == "alerts" else search_history
+    if user_id is not None:
+        conn = shards.connect(db_name, user_id)
+        try:
+            return find(conn, text, user_id, since, until, page, per_page)
+        finally:
+            conn.close()
+
+    # The first `page` pages of each shard hold every row of the merged page
+    results, total, games = [], 0, []
+    for shard in range(len(shards.databases(db_name))):
+        conn = shards.connect_shard(db_name, shard)
+        try:
+            found = find(conn, text, None, since, until, 1, page * per_page)
+        finally:
+            conn.close()
+        results += found["results"]
+        total += found["total"]
+        games = found.get("games", games)
+    if what == "alerts":
+        results.sort(key=lambda row: row["sent_at"], reverse=True)
+        results.sort(key=lambda row: row["score"], reverse=True)
+    else:
+        results.sort(key=lambda row: row["played_at"], reverse=True)
+    result = _page(total, page, per_page, results[(page - 1) * per_page:page * per_page])
+    if what == "history":
+        result["games"] = games
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Full-text search over alerts and game history")
+    parser.add_argument("command", choices=("rebuild", "alerts", "history"))
+    parser.add_argument("db", help="app database (users.db)")
+    parser.add_argument("query", nargs="?", default="")
+    parser.add_argument("--user", type=int, help="only this user's rows (default: everyone)")
+    parser.add_argument("--since", help="first UTC day, YYYY-MM-DD")
+    parser.add_argument("--until", help="last UTC day, YYYY-MM-DD")
+    parser.add_argument("--page", type=int, default=1)
+    parser.add_argument("--per-page", type=int, default=PAGE_SIZE)
+    args = parser.parse_args(argv)
+
+    if args.command == "rebuild":
+        started = time.perf_counter()
+        conn = sqlite3.connect(args.db)
+        ensure_games_schema(conn)
+        rebuild_games(conn)
+        conn.commit()
+        conn.close()
+        rows = 0
+        for path in shards.databases(args.db):
+            conn = sqlite3.connect(path)
+            ensure_alerts_schema(conn)
+            rebuild_alerts(conn)
+            conn.commit()
+            rows += conn.execute("SELECT COUNT(*) FROM alerts_log").fetchone()[0]
+            conn.close()
+        print(f"[SEARCH] Re-indexed {rows} alerts in {time.perf_counter() - started:.1f}s")
+    else:
+        print(json.dumps(
+            search_database(args.db, args.command, args.query, args.user, args.since, args.until, args.page, args.per_page),
+            indent=2,
+        ))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
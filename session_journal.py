@@ -0,0 +1,149 @@
+"""
+Session Journal
+===============
+
+Crash-safe checkpoints of monitoring sessions that are still in progress.
+
+Elapsed time normally reaches the database only when a session is stopped.
+The journal keeps one row per user in the monitor_journal table with the
+elapsed seconds and game seen so far (plus the per-game split of a session
+that ran several games, as JSON), so a crash or a closed desktop window
+loses at most one checkpoint interval instead of the whole session.
+
+   - checkpoint() is cheap to call on every monitor tick: it writes only if
+     `min_interval` seconds have passed since the last write for that user
+     (or when forced, e.g. on pause), so writes stay bounded whatever the
+     tick rate.
+   - clear() removes the row; app.py calls it inside the transaction that
+     records the finished session, so a session is never counted twice.
+   - orphans() lists rows left behind by a process that died; app.py
+     finalizes them on start-up.
+
+Configuration (environment variable read by app.py):
+   - MONITOR_CHECKPOINT_SECONDS : minimum seconds between writes (default: 30)
+"""
+
+import json
+import threading
+import time
+
+import shards
+
+
+def ensure_schema(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS monitor_journal (
+            user_id INTEGER PRIMARY KEY,
+            elapsed_seconds REAL NOT NULL,
+            game_name TEXT,
+            checkpoint_at REAL NOT NULL,
+            games TEXT,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+        """
+    )
+    if "games" not in [row[1] for row in conn.execute("PRAGMA table_info(monitor_journal)")]:
+        conn.execute("ALTER TABLE monitor_journal ADD COLUMN games TEXT")
+
+
+class SessionJournal:
+    """Throttled checkpoints of running sessions in the monitor_journal table."""
+
+    def __init__(self, db_name, min_interval=30.0, clock=time.time):
+        self.db_name = db_name
+        self.min_interval = min_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._last_write = {}
+        self._cleared_at = {}
+        self.ticks = 0
+        self.writes = 0
+
+    def checkpoint(self, user_id, elapsed_seconds, game_name=None, force=False, observed_at=None, games=None):
+        """
+        Journal the session if the interval has passed. Returns True if written.
+
+        `games` maps process name -> seconds played so far
+        (monitor_core.game_seconds) when the session ran several games.
+
+        `observed_at` is when the caller read the session state; a checkpoint
+        taken before the session was cleared is dropped instead of bringing
+        the finished session back.
+        """
+        if not user_id:
+            return False
+        now = self.clock()
+        with self._lock:
+            self.ticks += 1
+            if observed_at is not None and self._cleared_at.get(user_id, float("-inf")) >= observed_at:
+                return False
+            last = self._last_write.get(user_id)
+            if not force and last is not None and now - last < self.min_interval:
+                return False
+            self._last_write[user_id] = now
+            self.writes += 1
+
+            conn = shards.connect(self.db_name, user_id)
+            conn.execute(
+                """
+                INSERT INTO monitor_journal (user_id, elapsed_seconds, game_name, checkpoint_at, games)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    elapsed_seconds = excluded.elapsed_seconds,
+                    game_name = excluded.game_name,
+                    checkpoint_at = excluded.checkpoint_at,
+                    games = excluded.games
+                """,
+                (user_id, float(elapsed_seconds), game_name, now, json.dumps(games) if games else None),
+            )
+            conn.commit()
+            conn.close()
+        return True
+
+    def clear(self, user_id, conn=None):
+        """
+        Drop the journal row of a finished session.
+
+        Pass `conn` to delete inside a transaction that is already open;
+        otherwise a short-lived connection is used and committed.
+        Returns True if a row was removed.
+        """
+        with self._lock:
+            self._last_write.pop(user_id, None)
+            self._cleared_at[user_id] = self.clock()
+        own_conn = conn is None
+        conn = conn or shards.connect(self.db_name, user_id)
+        removed = conn.execute("DELETE FROM monitor_journal WHERE user_id = ?", (user_id,)).rowcount
+        if own_conn:
+            conn.commit()
+            conn.close()
+        return removed > 0
+
+    def clear_through(self, user_id, ended_at, conn):
+        """
+        Drop a journal row checkpointed no later than `ended_at`, inside the
+        caller's transaction: used when a spooled session reaches the
+        database after the fact, without touching a newer running session.
+        """
+        return conn.execute(
+            "DELETE FROM monitor_journal WHERE user_id = ? AND checkpoint_at <= ?", (user_id, ended_at)
+        ).rowcount > 0
+
+    def orphans(self):
+        """Journaled sessions as (user_id, elapsed_seconds, game_name, checkpoint_at, games or None) tuples."""
+        conn = shards.connect(self.db_name)
+        rows = conn.execute(
+            "SELECT user_id, elapsed_seconds, game_name, checkpoint_at, games FROM monitor_journal ORDER BY user_id"
+        ).fetchall()
+        conn.close()
+        return [(*row[:4], json.loads(row[4]) if row[4] else None) for row in rows]
+
+    def stats(self):
+        """Checkpoint calls vs. rows actually written since start-up."""
+        with self._lock:
+            return {
+                "ticks": self.ticks,
+                "writes": self.writes,
+                "write_ratio": round(self.writes / self.ticks, 4) if self.ticks else 0.0,
+            }
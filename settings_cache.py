@@ -0,0 +1,145 @@
+"""
+Settings Cache
+==============
+
+In-process copy of what the alert path reads on every detected game: the
+user's alert settings, the user's email address and the SMTP sender
+configuration. With it the detection -> alert path only touches SQLite to
+insert the alerts_log row.
+
+   - user(): settings + recipient of one user, loaded together in one query
+     (user_alert_settings LEFT JOIN users) on a miss. At most `max_users`
+     users are kept, least recently used dropped first; max_users 0 turns
+     per-user caching off.
+   - email_config(): get_email_config() result (None when unconfigured),
+     read once instead of re-reading the environment and logging per email.
+   - invalidate(user_id) after settings or user changes, and
+     invalidate_email_config() after the SMTP config changes. A load that
+     raced with an invalidation is returned but not cached.
+
+Entries are per process: with several workers a change made in one is not
+seen by the others, so the app only caches users with the single-worker
+memory backend (like recent_sessions.py).
+"""
+
+import threading
+from collections import OrderedDict
+
+import shards
+
+
+DEFAULT_ALERT_SETTINGS = {
+    "phone_number": "",
+    "email_alerts_enabled": True,
+    "sms_alerts_enabled": False,
+    "alert_on_game_detect": True,
+    "alert_threshold_minutes": 30,
+}
+
+_UNSET = object()
+
+
+class SettingsCache:
+    """Per-user alert settings and recipient, plus the sender email config."""
+
+    def __init__(self, db_name, max_users=100000):
+        self.db_name = db_name
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._users = OrderedDict()  # user_id -> (settings, email)
+        self._email_config = _UNSET
+        # Bumped by every invalidation; loads that started before it are not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _load(self, user_id):
+        conn = shards.connect(self.db_name, user_id)
+        row = conn.execute(
+            """
+            SELECT u.email, s.user_id, s.phone_number, s.email_alerts_enabled, s.sms_alerts_enabled,
+                   s.alert_on_game_detect, s.alert_threshold_minutes
+            FROM users u LEFT JOIN user_alert_settings s ON s.user_id = u.id
+            WHERE u.id = ?
+            """,
+            (user_id,),
+        ).fetchone()
+        conn.close()
+        if not row or row[1] is None:
+            return dict(DEFAULT_ALERT_SETTINGS), row[0] if row else None
+        settings = {
+            "phone_number": row[2] or "",
+            "email_alerts_enabled": bool(row[3]),
+            "sms_alerts_enabled": bool(row[4]),
+            "alert_on_game_detect": bool(row[5]),
+            "alert_threshold_minutes": row[6],
+        }
+        return settings, row[0]
+
+    def user(self, user_id):
+        """(alert settings, email address or None) of a user; the settings dict is a copy."""
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                self._users.move_to_end(user_id)
+                self.hits += 1
+                return dict(entry[0]), entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        entry = self._load(user_id)
+        if self.max_users:
+            with self._lock:
+                if generation == self._generation:
+                    self._users[user_id] = entry
+                    while len(self._users) > self.max_users:
+                        self._users.popitem(last=False)
+        return dict(entry[0]), entry[1]
+
+    def alert_settings(self, user_id):
+        return self.user(user_id)[0]
+
+    def recipient(self, user_id):
+        return self.user(user_id)[1]
+
+    def email_config(self):
+        """Sender config ({'email', 'app_password'}) or None when email is not configured."""
+        with self._lock:
+            if self._email_config is not _UNSET:
+                self.hits += 1
+                return self._email_config
+            self.misses += 1
+            generation = self._generation
+
+        from email_config import get_email_config
+        config = get_email_config()
+        with self._lock:
+            if generation == self._generation:
+                self._email_config = config
+        return config
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+            self._generation += 1
+            self.invalidations += 1
+
+    def invalidate_email_config(self):
+        with self._lock:
+            self._email_config = _UNSET
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "users": len(self._users),
+                "max_users": self.max_users,
+                "email_config_cached": self._email_config is not _UNSET,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "invalidations": self.invalidations,
+            }
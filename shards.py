@@ -0,0 +1,451 @@
+"""
+Shards
+======
+
+Partitions the per-user tables across N SQLite files so writes for users on
+different shards no longer wait for one database lock.
+
+   - users.db stays the core database: users, games, risk snapshots, the
+     shard list and everything else that is not per user
+   - the tables in SHARDED_TABLES live in users.shard0.db ... users.shardN-1.db
+   - a user lives on shard user_id % N unless user_shards (core) says
+     otherwise; overrides exist while a rebalance is moving users and for
+     users moved by hand
+
+Routing (every helper opens its connection through these):
+   connect(db_name, user_id)   that user's shard, with the core database
+                               attached as "core" so unqualified users / games
+                               still resolve in joins
+   connect(db_name)            the core database with every shard attached and
+                               TEMP views (UNION ALL) named after the sharded
+                               tables, for cross-user reads (risk snapshots,
+                               reports, rebuilding in-memory views); read-only
+   connect_shard(db_name, k)   one shard; pass attach_core=False for write
+                               transactions that must lock only the shard
+                               (BEGIN IMMEDIATE locks every attached file)
+   databases(db_name)          every file holding per-user tables, for jobs
+                               that write them all (schema, retention)
+
+A database that was never split (no rows in `shards`) routes everything to
+users.db, so nothing changes until `split` is run.
+
+Each shard numbers AUTOINCREMENT ids from its own range (shard k from
+(k + 1) << 40) and rows moved between shards get new ids there, so ids stay
+unique across shards. The event dedup table (ingested_events) has no user
+column; a rebalance copies its last DEDUP_COPY_DAYS to the shards that
+receive users.
+
+split / rebalance / move run with the app (and agents' ingestion) stopped.
+Moves are committed in batches together with the users' routing entries, so
+an interrupted rebalance is finished by running it again.
+
+Usage:
+   python shards.py split users.db --shards 4
+   python shards.py rebalance users.db --shards 8
+   python shards.py move users.db --user 42 --to 3
+   python shards.py status users.db
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import search
+
+
+SHARDED_TABLES = (
+    "user_monitor_stats",
+    "user_alert_settings",
+    "game_history",
+    "game_aggregates",
+    "alerts_log",
+    "detection_events",
+    "monitor_journal",
+    "change_log",
+    "ingested_events",
+)
+# ingested_events has no user column, so it is not moved with users
+USER_TABLES = SHARDED_TABLES[:-1]
+# SQLite attaches at most 10 databases to one connection (cross-shard reads attach them all)
+MAX_SHARDS = 10
+ID_RANGE_BITS = 40
+DEDUP_COPY_DAYS = 7
+MOVE_BATCH_USERS = 1000
+
+
+def ensure_schema(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS shards (
+            shard INTEGER PRIMARY KEY,
+            path TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_shards (
+            user_id INTEGER PRIMARY KEY,
+            shard INTEGER NOT NULL
+        )
+        """
+    )
+
+
+def shard_file(db_name, shard):
+    """File name of shard `shard` next to the core database: users.db -> users.shard3.db."""
+    base, ext = os.path.splitext(os.path.basename(db_name))
+    return f"{base}.shard{shard}{ext or '.db'}"
+
+
+class ShardRouter:
+    """Shard files and user -> shard overrides of one core database, cached in memory."""
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self.paths = []
+        self._overrides = {}
+        self.load()
+
+    def load(self):
+        conn = sqlite3.connect(self.db_name)
+        try:
+            shards = conn.execute("SELECT shard, path FROM shards ORDER BY shard").fetchall()
+            overrides = conn.execute("SELECT user_id, shard FROM user_shards").fetchall()
+        except sqlite3.OperationalError:
+            shards, overrides = [], []  # never split (or not an app database)
+        finally:
+            conn.close()
+        folder = os.path.dirname(self.db_name)
+        self.paths = [os.path.join(folder, path) for _, path in shards]
+        self._overrides = dict(overrides)
+
+    @property
+    def count(self):
+        return len(self.paths)
+
+    def shard_of(self, user_id):
+        return self._overrides.get(user_id, user_id % self.count) if self.paths else 0
+
+    def path_of(self, user_id):
+        return self.paths[self.shard_of(user_id)] if self.paths else self.db_name
+
+    def databases(self):
+        return list(self.paths) or [self.db_name]
+
+
+_routers = {}
+_routers_lock = threading.Lock()
+
+
+def router(db_name):
+    """The (cached) ShardRouter of a core database."""
+    key = os.path.abspath(db_name)
+    with _routers_lock:
+        found = _routers.get(key)
+        if found is None:
+            found = _routers[key] = ShardRouter(db_name)
+        return found
+
+
+def reload(db_name):
+    """Re-read the shard list (after split / rebalance in this process)."""
+    router(db_name).load()
+
+
+def databases(db_name):
+    return router(db_name).databases()
+
+
+def group_by_shard(db_name, user_ids):
+    """{shard: [user ids]} for a batch of users (one group, shard 0, if never split)."""
+    groups = {}
+    route = router(db_name)
+    for user_id in user_ids:
+        groups.setdefault(route.shard_of(user_id), []).append(user_id)
+    return groups
+
+
+def _attach_core(conn, db_name):
+    conn.execute("ATTACH DATABASE ? AS core", (db_name,))
+    return conn
+
+
+def connect_shard(db_name, shard, attach_core=True, **kwargs):
+    """Connection to one shard (users.db itself if never split)."""
+    route = router(db_name)
+    if not route.paths:
+        return sqlite3.connect(db_name, **kwargs)
+    conn = sqlite3.connect(route.paths[shard], **kwargs)
+    return _attach_core(conn, db_name) if attach_core else conn
+
+
+def connect(db_name, user_id=None, **kwargs):
+    """Connection for one user's rows, or (user_id=None) a read-only view over all shards."""
+    route = router(db_name)
+    if not route.paths:
+        return sqlite3.connect(db_name, **kwargs)
+    if user_id is not None:
+        return _attach_core(sqlite3.connect(route.path_of(user_id), **kwargs), db_name)
+
+    conn = sqlite3.connect(db_name, **kwargs)
+    for shard, path in enumerate(route.paths):
+        conn.execute(f"ATTACH DATABASE ? AS shard{shard}", (path,))
+    for table in SHARDED_TABLES:
+        union = " UNION ALL ".join(f"SELECT * FROM shard{shard}.{table}" for shard in range(route.count))
+        conn.execute(f"CREATE TEMP VIEW {table} AS {union}")
+    return conn
+
+
+# ==========================
+# SPLIT / REBALANCE
+# ==========================
+
+def _columns(conn, schema, table):
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _create_shard(path, shard, template_db):
+    """New shard file with the sharded tables and indexes of `template_db`."""
+    source = sqlite3.connect(template_db)
+    statements = source.execute(
+        f"""SELECT type, sql FROM sqlite_master
+            WHERE tbl_name IN ({",".join("?" * len(SHARDED_TABLES))}) AND type IN ('table', 'index') AND sql IS NOT NULL
+            ORDER BY type = 'index'""",
+        SHARDED_TABLES,
+    ).fetchall()
+    source.close()
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    for _, sql in statements:
+        conn.execute(sql)
+    first_id = (shard + 1) << ID_RANGE_BITS
+    for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND sql LIKE '%AUTOINCREMENT%'").fetchall():
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, first_id))
+    conn.commit()
+    conn.close()
+
+
+def _ensure_search(path):
+    conn = sqlite3.connect(path)
+    search.ensure_alerts_schema(conn)
+    conn.commit()
+    conn.close()
+
+
+def _check_backfill(db_name):
+    """An analytics backfill row covers ids of the file it is in, so it cannot move (see analytics.py)."""
+    for path in databases(db_name):
+        conn = sqlite3.connect(path)
+        try:
+            pending = conn.execute("SELECT 1 FROM change_log WHERE kind = 'backfill' LIMIT 1").fetchone()
+        except sqlite3.OperationalError:
+            pending = None
+        finally:
+            conn.close()
+        if pending:
+            raise ValueError(f"{path} has an analytics backfill pending; run `python analytics.py consume` first")
+
+
+def split(db_name, count):
+    """Move the per-user tables of an unsharded users.db into `count` shard files."""
+    if not 1 <= count <= MAX_SHARDS:
+        raise ValueError(f"shard count must be between 1 and {MAX_SHARDS}")
+    if router(db_name).paths:
+        raise ValueError(f"{db_name} is already split; use rebalance")
+    _check_backfill(db_name)
+    started = time.perf_counter()
+    folder = os.path.dirname(db_name)
+    files = [shard_file(db_name, shard) for shard in range(count)]
+    for name in files:
+        if os.path.exists(os.path.join(folder, name)):
+            raise ValueError(f"{name} already exists")
+    for shard, name in enumerate(files):
+        _create_shard(os.path.join(folder, name), shard, db_name)
+
+    conn = sqlite3.connect(db_name, isolation_level=None)
+    rows = {}
+    try:
+        for shard, name in enumerate(files):
+            conn.execute(f"ATTACH DATABASE ? AS shard{shard}", (os.path.join(folder, name),))
+        # One transaction over all files: either every row moved or none
+        conn.execute("BEGIN IMMEDIATE")
+        for table in USER_TABLES:
+            columns = ", ".join(_columns(conn, "main", table))
+            for shard in range(count):
+                conn.execute(
+                    f"INSERT INTO shard{shard}.{table} ({columns}) SELECT {columns} FROM main.{table} "
+                    f"WHERE user_id % ? = ? ORDER BY rowid",
+                    (count, shard),
+                )
+            rows[table] = conn.execute(f"SELECT COUNT(*) FROM main.{table}").fetchone()[0]
+        for shard in range(count):
+            conn.execute(
+                f"INSERT INTO shard{shard}.ingested_events SELECT * FROM main.ingested_events "
+                f"WHERE received_at >= datetime('now', ?)",
+                (f"-{DEDUP_COPY_DAYS} days",),
+            )
+        conn.execute("DROP TABLE IF EXISTS main.alerts_fts")
+        conn.execute("DROP VIEW IF EXISTS main.alerts_search")
+        for table in SHARDED_TABLES:
+            conn.execute(f"DROP TABLE main.{table}")
+        conn.executemany("INSERT INTO shards (shard, path) VALUES (?, ?)", enumerate(files))
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        conn.close()
+        for name in files:
+            os.remove(os.path.join(folder, name))
+        raise
+    conn.execute("VACUUM")
+    conn.close()
+
+    for name in files:
+        _ensure_search(os.path.join(folder, name))
+    reload(db_name)
+    return {"shards": count, "rows": rows, "duration_seconds": round(time.perf_counter() - started, 3)}
+
+
+def _move_users(db_name, paths, src, dst, user_ids):
+    """Move users' rows src -> dst and their routing entries, in one transaction per batch."""
+    moved = 0
+    conn = sqlite3.connect(paths[src], isolation_level=None, timeout=30)
+    conn.execute("ATTACH DATABASE ? AS dst", (paths[dst],))
+    conn.execute("ATTACH DATABASE ? AS core", (db_name,))
+    conn.execute("CREATE TEMP TABLE moving (user_id INTEGER PRIMARY KEY)")
+    try:
+        for start in range(0, len(user_ids), MOVE_BATCH_USERS):
+            batch = user_ids[start:start + MOVE_BATCH_USERS]
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM temp.moving")
+            conn.executemany("INSERT INTO temp.moving (user_id) VALUES (?)", [(user_id,) for user_id in batch])
+            for table in USER_TABLES:
+                # New ids from the destination's range; relative order is kept
+                columns = ", ".join(column for column in _columns(conn, "main", table) if column != "id")
+                moved += conn.execute(
+                    f"INSERT INTO dst.{table} ({columns}) SELECT {columns} FROM main.{table} "
+                    f"WHERE user_id IN (SELECT user_id FROM temp.moving) ORDER BY rowid"
+                ).rowcount
+                conn.execute(f"DELETE FROM main.{table} WHERE user_id IN (SELECT user_id FROM temp.moving)")
+            conn.execute("INSERT OR REPLACE INTO core.user_shards (user_id, shard) SELECT user_id, ? FROM temp.moving", (dst,))
+            conn.execute("COMMIT")
+        conn.execute(
+            "INSERT OR IGNORE INTO dst.ingested_events SELECT * FROM main.ingested_events WHERE received_at >= datetime('now', ?)",
+            (f"-{DEDUP_COPY_DAYS} days",),
+        )
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return moved
+
+
+def rebalance(db_name, count):
+    """Change the number of shards, moving every user to shard user_id % count."""
+    if not 1 <= count <= MAX_SHARDS:
+        raise ValueError(f"shard count must be between 1 and {MAX_SHARDS}")
+    route = ShardRouter(db_name)
+    if not route.paths:
+        raise ValueError(f"{db_name} is not split yet; use split")
+    _check_backfill(db_name)
+    started = time.perf_counter()
+    folder = os.path.dirname(db_name)
+    # Files of every shard old or new; new ones may exist from an interrupted run
+    paths = [os.path.join(folder, shard_file(db_name, shard)) for shard in range(max(count, route.count))]
+    for shard in range(route.count, count):
+        if not os.path.exists(paths[shard]):
+            _create_shard(paths[shard], shard, route.paths[0])
+            _ensure_search(paths[shard])
+
+    conn = sqlite3.connect(db_name)
+    moves = {}
+    for (user_id,) in conn.execute("SELECT id FROM users"):
+        source, target = route.shard_of(user_id), user_id % count
+        if source != target:
+            moves.setdefault((source, target), []).append(user_id)
+    conn.close()
+
+    rows = 0
+    for (source, target), user_ids in sorted(moves.items()):
+        rows += _move_users(db_name, paths, source, target, user_ids)
+        print(f"[SHARDS] shard {source} -> {target}: {len(user_ids)} users")
+
+    conn = sqlite3.connect(db_name)
+    conn.execute("DELETE FROM shards")
+    conn.executemany("INSERT INTO shards (shard, path) VALUES (?, ?)", [(shard, shard_file(db_name, shard)) for shard in range(count)])
+    # Everyone is on user_id % count now
+    conn.execute("DELETE FROM user_shards")
+    conn.commit()
+    conn.close()
+    for path in paths[count:]:
+        os.remove(path)
+    reload(db_name)
+    return {
+        "shards": count,
+        "previous_shards": route.count,
+        "users_moved": sum(len(user_ids) for user_ids in moves.values()),
+        "rows_moved": rows,
+        "duration_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def move_user(db_name, user_id, shard):
+    """Pin one (e.g. very active) user to `shard`; kept until the next rebalance."""
+    route = ShardRouter(db_name)
+    if not 0 <= shard < route.count:
+        raise ValueError(f"no shard {shard}")
+    source = route.shard_of(user_id)
+    rows = 0 if source == shard else _move_users(db_name, route.paths, source, shard, [user_id])
+    reload(db_name)
+    return {"user_id": user_id, "from": source, "to": shard, "rows_moved": rows}
+
+
+def status(db_name):
+    """Users, rows and file size per shard."""
+    route = ShardRouter(db_name)
+    result = []
+    for shard, path in enumerate(route.databases()):
+        conn = sqlite3.connect(path)
+        result.append({
+            "shard": shard,
+            "path": path,
+            "users": conn.execute("SELECT COUNT(*) FROM user_monitor_stats").fetchone()[0],
+            "game_history": conn.execute("SELECT COUNT(*) FROM game_history").fetchone()[0],
+            "alerts_log": conn.execute("SELECT COUNT(*) FROM alerts_log").fetchone()[0],
+            "bytes": os.path.getsize(path),
+        })
+        conn.close()
+    return {"shards": route.count, "overrides": len(route._overrides), "files": result}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split users.db into per-user shards and rebalance them")
+    parser.add_argument("command", choices=("split", "rebalance", "move", "status"))
+    parser.add_argument("db", help="core database (users.db)")
+    parser.add_argument("--shards", type=int, help="shard count for split / rebalance")
+    parser.add_argument("--user", type=int, help="user id for move")
+    parser.add_argument("--to", type=int, help="target shard for move")
+    args = parser.parse_args(argv)
+
+    if args.command == "split":
+        report = split(args.db, args.shards)
+    elif args.command == "rebalance":
+        report = rebalance(args.db, args.shards)
+    elif args.command == "move":
+        report = move_user(args.db, args.user, args.to)
+    else:
+        report = status(args.db)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+"""
+Quantile Sketches
+=================
+
+Mergeable KLL quantile sketches used to rank a user's play time against
+everyone else without sorting the history tables.
+
+   - KLLSketch: constant-size summary of a stream of numbers. rank() and
+     quantile() answer with a bounded relative rank error (~1.7% for k=200).
+   - PopulationSketches: the sketches kept by the app
+       * "session_length"  - every recorded session length (seconds)
+       * "daily_total"     - each user's total play seconds per finished day
+       * per-user session length sketches for personal distributions
+     They are updated in memory on every recorded session. flush(), run
+     periodically by the app, merges the sessions recorded since the last
+     flush into the quantile_sketches table (users.db) and reloads what
+     other workers merged meanwhile, so no session is lost to a last writer
+     and the hot path never writes the core database.
+"""
+
+import json
+import math
+import random
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+import shards
+
+
+class KLLSketch:
+    """KLL sketch (Karnin, Lang, Liberty 2016) over numeric values."""
+
+    def __init__(self, k=200, c=2 / 3, seed=None):
+        self.k = k
+        self.c = c
+        self.compactors = [[]]
+        self.count = 0
+        self._random = random.Random(seed)
+        self._size = 0
+        self._max_size = 0
+        self._cdf = None
+        self._update_max_size()
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(self.k * self.c ** depth)) + 1
+
+    def _update_max_size(self):
+        self._max_size = sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def _grow(self):
+        self.compactors.append([])
+        self._update_max_size()
+
+    def _compress(self):
+        for level in range(len(self.compactors)):
+            items = self.compactors[level]
+            if len(items) < self._capacity(level):
+                continue
+            if level + 1 == len(self.compactors):
+                self._grow()
+            items.sort()
+            # Keep one item back if the count is odd, promote every other item.
+            keep = [items.pop()] if len(items) % 2 else []
+            offset = self._random.randint(0, 1)
+            self.compactors[level + 1].extend(items[offset::2])
+            self.compactors[level] = keep
+            self._size = sum(len(items) for items in self.compactors)
+            if self._size < self._max_size:
+                break
+
+    def update(self, value):
+        self.compactors[0].append(value)
+        self.count += 1
+        self._size += 1
+        self._cdf = None
+        if self._size >= self._max_size:
+            self._compress()
+
+    def merge(self, other):
+        """Fold another sketch into this one."""
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.count += other.count
+        self._size = sum(len(items) for items in self.compactors)
+        self._cdf = None
+        while self._size >= self._max_size:
+            self._compress()
+
+    def _build_cdf(self):
+        weighted = sorted(
+            (value, 1 << level) for level, items in enumerate(self.compactors) for value in items
+        )
+        values, cumulative, total = [], [], 0
+        for value, weight in weighted:
+            total += weight
+            values.append(value)
+            cumulative.append(total)
+        self._cdf = (values, cumulative, total)
+        return self._cdf
+
+    def rank(self, value):
+        """Approximate fraction of recorded values <= value (0.0 - 1.0)."""
+        values, cumulative, total = self._cdf or self._build_cdf()
+        if not total:
+            return 0.0
+        index = bisect_right(values, value)
+        return cumulative[index - 1] / total if index else 0.0
+
+    def quantile(self, q):
+        """Approximate value at quantile q (0.0 - 1.0), or None if empty."""
+        values, cumulative, total = self._cdf or self._build_cdf()
+        if not total:
+            return None
+        target = q * total
+        index = bisect_left(cumulative, target)
+        return values[min(index, len(values) - 1)]
+
+    def to_dict(self):
+        return {"k": self.k, "c": self.c, "count": self.count, "compactors": self.compactors}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(k=data["k"], c=data["c"])
+        sketch.compactors = [list(items) for items in data["compactors"]] or [[]]
+        sketch.count = data["count"]
+        sketch._size = sum(len(items) for items in sketch.compactors)
+        sketch._update_max_size()
+        return sketch
+
+
+class PopulationSketches:
+    """Population and per-user sketches maintained from recorded sessions."""
+
+    USER_SKETCH_K = 64
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self._lock = threading.Lock()
+        self.session_length = KLLSketch()
+        self.daily_total = KLLSketch()
+        self._user_sessions = {}
+        # Totals for the day still in progress; flushed into daily_total as
+        # one sample per user when the first session of a later day arrives.
+        self._open_day = None
+        self._open_totals = {}
+        # Sessions recorded since the last flush, replayed onto the stored sketches
+        self._pending = []
+        self._flushed_at = None
+
+    def _ensure_table(self, conn):
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS quantile_sketches (
+                name TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+
+    def _user_sketch(self, user_id):
+        sketch = self._user_sessions.get(user_id)
+        if sketch is None:
+            sketch = self._user_sessions[user_id] = KLLSketch(k=self.USER_SKETCH_K)
+        return sketch
+
+    def _add(self, user_id, play_seconds, day):
+        self.session_length.update(play_seconds)
+        self._user_sketch(user_id).update(play_seconds)
+        self._roll_day(day)
+        self._open_totals[user_id] = self._open_totals.get(user_id, 0) + play_seconds
+
+    def _roll_day(self, day):
+        if self._open_day is None or day > self._open_day:
+            for seconds in self._open_totals.values():
+                self.daily_total.update(seconds)
+            self._open_day = day
+            self._open_totals = {}
+
+    def _population_payload(self):
+        return json.dumps({
+            "session_length": self.session_length.to_dict(),
+            "daily_total": self.daily_total.to_dict(),
+            "open_day": self._open_day,
+            "open_totals": {str(user_id): seconds for user_id, seconds in self._open_totals.items()},
+        })
+
+    def record_session(self, user_id, play_seconds, day=None):
+        """Update the sketches with one session (persisted by the next flush())."""
+        self.record_sessions([(user_id, play_seconds, day)])
+
+    def record_sessions(self, sessions):
+        """Update the sketches with (user_id, play_seconds, day) tuples (persisted by the next flush())."""
+        today = time.strftime("%Y-%m-%d", time.gmtime())
+        sessions = sorted(
+            ((user_id, int(play_seconds), day or today) for user_id, play_seconds, day in sessions
+             if user_id and play_seconds > 0),
+            key=lambda item: item[2],
+        )
+        if not sessions:
+            return
+        with self._lock:
+            for user_id, play_seconds, day in sessions:
+                self._add(user_id, play_seconds, day)
+            self._pending.extend(sessions)
+
+    def _load_rows(self, rows):
+        """Replace sketches with persisted (name, payload) rows; call with the lock held."""
+        for name, payload in rows:
+            data = json.loads(payload)
+            if name == "population":
+                self.session_length = KLLSketch.from_dict(data["session_length"])
+                self.daily_total = KLLSketch.from_dict(data["daily_total"])
+                self._open_day = data["open_day"]
+                self._open_totals = {int(user_id): seconds for user_id, seconds in data["open_totals"].items()}
+            elif name.startswith("user:"):
+                self._user_sessions[int(name[5:])] = KLLSketch.from_dict(data)
+
+    def load(self):
+        """Load persisted sketches; rebuild from game_history if none were saved yet."""
+        conn = sqlite3.connect(self.db_name)
+        self._ensure_table(conn)
+        self._flushed_at = conn.execute("SELECT CURRENT_TIMESTAMP").fetchone()[0]
+        rows = conn.execute("SELECT name, payload FROM quantile_sketches").fetchall()
+        conn.close()
+        if not rows:
+            return self.rebuild_from_db()
+
+        with self._lock:
+            self._load_rows(rows)
+        return len(rows)
+
+    def flush(self):
+        """
+        Merge the sessions recorded since the last flush into quantile_sketches.
+
+        The stored sketches are read, updated with this process's sessions
+        and written back in one transaction, then adopted in memory together
+        with user sketches other workers changed since the last flush.
+        Returns the number of sessions merged.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        conn = sqlite3.connect(self.db_name, timeout=30)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._ensure_table(conn)
+            flushed_at = conn.execute("SELECT CURRENT_TIMESTAMP").fetchone()[0]
+            users = sorted({user_id for user_id, _, _ in pending})
+            names = ["population"] + [f"user:{user_id}" for user_id in users]
+            rows = conn.execute(
+                f"""SELECT name, payload FROM quantile_sketches
+                    WHERE name IN ({",".join("?" * len(names))}) OR (name LIKE 'user:%' AND updated_at >= ?)""",
+                (*names, self._flushed_at or ""),
+            ).fetchall()
+
+            merged = PopulationSketches(self.db_name)
+            merged._load_rows(rows)
+            for user_id, play_seconds, day in pending:
+                merged._add(user_id, play_seconds, day)
+            if pending:
+                payloads = [("population", merged._population_payload())]
+                payloads += [(f"user:{user_id}", json.dumps(merged._user_sketch(user_id).to_dict())) for user_id in users]
+                conn.executemany(
+                    """INSERT INTO quantile_sketches (name, payload, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+                       ON CONFLICT(name) DO UPDATE SET payload = excluded.payload, updated_at = CURRENT_TIMESTAMP""",
+                    payloads,
+                )
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            with self._lock:
+                self._pending[:0] = pending  # retried by the next flush
+            raise
+        finally:
+            conn.close()
+
+        with self._lock:
+            self._flushed_at = flushed_at
+            self.session_length, self.daily_total = merged.session_length, merged.daily_total
+            self._open_day, self._open_totals = merged._open_day, merged._open_totals
+            self._user_sessions.update(merged._user_sessions)
+            # Sessions recorded while the transaction ran go on top of the merged state
+            for user_id, play_seconds, day in self._pending:
+                self._add(user_id, play_seconds, day)
+        return len(pending)
+
+    def rebuild_from_db(self):
+        """One full pass over game_history, then persist everything."""
+        conn = shards.connect(self.db_name)
+        self._ensure_table(conn)
+        rows = conn.execute(
+            "SELECT user_id, play_seconds, date(played_at) FROM game_history ORDER BY played_at"
+        ).fetchall()
+
+        with self._lock:
+            self.session_length = KLLSketch()
+            self.daily_total = KLLSketch()
+            self._user_sessions = {}
+            self._open_day = None
+            self._open_totals = {}
+            for user_id, play_seconds, day in rows:
+                self._add(user_id, play_seconds, day)
+            self._roll_day(time.strftime("%Y-%m-%d", time.gmtime()))
+            payloads = [("population", self._population_payload())]
+            payloads += [
+                (f"user:{user_id}", json.dumps(sketch.to_dict())) for user_id, sketch in self._user_sessions.items()
+            ]
+
+        conn.execute("DELETE FROM quantile_sketches")
+        conn.executemany("INSERT INTO quantile_sketches (name, payload) VALUES (?, ?)", payloads)
+        conn.commit()
+        conn.close()
+        return len(rows)
+
+    def user_percentiles(self, user_id, last_session_seconds=0):
+        """Where the user's play today and last session rank in the population."""
+        today = time.strftime("%Y-%m-%d", time.gmtime())
+        with self._lock:
+            self._roll_day(today)
+            today_seconds = self._open_totals.get(user_id, 0)
+            personal = self._user_sessions.get(user_id)
+            result = {
+                "today_play_seconds": today_seconds,
+                "today_percentile": round(self.daily_total.rank(today_seconds) * 100, 1),
+                "last_session_seconds": last_session_seconds,
+                "last_session_percentile": round(self.session_length.rank(last_session_seconds) * 100, 1),
+                "population_days": self.daily_total.count,
+                "population_sessions": self.session_length.count,
+                "session_length_distribution": {},
+            }
+            if personal is not None and personal.count:
+                result["session_length_distribution"] = {
+                    f"p{int(q * 100)}": personal.quantile(q) for q in (0.1, 0.25, 0.5, 0.75, 0.9)
+                }
+            return result
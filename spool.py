@@ -0,0 +1,275 @@
+"""
+Event Spool
+===========
+
+Durable offline queue for session / detection events (the same dicts that
+/api/ingest/events accepts) while their sink - the SQLite database or the
+central server - cannot be reached.
+
+The spool is one fixed-size file, memory-mapped and used as a ring:
+
+   header (64 bytes)  magic, capacity, head, tail, event count, dropped
+   data region        records of [length u32][crc32 u32][JSON payload]
+
+head and tail are ever-growing byte positions (offset = position %
+capacity). append() copies the payload straight into the mapping and only
+then moves tail in the header, so a process killed mid-write leaves the
+previous tail and the half-written record is ignored; pages written to the
+mapping survive a process crash (pass fsync=True to also survive a power
+loss, at the cost of a flush per event). On open, records between head and
+tail are checked against their CRC and the spool is cut at the first bad
+one.
+
+replay() hands the oldest events to a sink callable in batches and moves
+head past a batch only after the sink returned, so delivery is
+at-least-once; sinks dedupe retries by event_id. When the ring is full the
+oldest events are dropped (counted in stats()["dropped_events"]). Events
+the sink refuses for good (validation) are not dropped either: reject()
+appends them with the reason to a JSON-lines dead-letter file next to the
+spool (<path>.rejected.jsonl) for inspection or a manual re-import.
+
+Processes sharing a spool file serialize through flock() where available
+(not on Windows, where each process should use its own file).
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+MAGIC = b"GMSPOOL1"
+HEADER = struct.Struct("<8sQQQQQ")  # magic, capacity, head, tail, events, dropped
+HEADER_SIZE = 64
+RECORD = struct.Struct("<II")  # payload length, crc32
+WRAP_MARKER = 0xFFFFFFFF
+
+
+class EventSpool:
+    """Append-only ring of JSON events in a memory-mapped file."""
+
+    def __init__(self, path, capacity_bytes=4 * 1024 * 1024, fsync=False):
+        self.path = path
+        self.rejected_path = path + ".rejected.jsonl"
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self.appended = 0
+        self.replayed = 0
+        self.rejected = 0
+        self.last_replay = None
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._file = os.fdopen(fd, "r+b")
+        with self._locked(read_header=False):
+            self._file.seek(0, os.SEEK_END)
+            size = self._file.tell()
+            if size >= HEADER_SIZE:
+                self._file.seek(0)
+                magic, capacity = HEADER.unpack(self._file.read(HEADER.size))[:2]
+                if magic != MAGIC or size != HEADER_SIZE + capacity:
+                    raise ValueError(f"{path} is not an event spool")
+            else:
+                capacity = capacity_bytes
+                self._file.truncate(HEADER_SIZE + capacity)
+            self.capacity = capacity
+            self._mm = mmap.mmap(self._file.fileno(), HEADER_SIZE + capacity)
+            if size < HEADER_SIZE:
+                self.head = self.tail = self.events = self.dropped = 0
+                self._write_header()
+            else:
+                self._read_header()
+                self._recover()
+
+    # ---- file state ----
+
+    @contextmanager
+    def _locked(self, read_header=True):
+        with self._lock:
+            if fcntl:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            try:
+                if read_header:
+                    self._read_header()  # another process may have moved head / tail
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def _read_header(self):
+        _, _, self.head, self.tail, self.events, self.dropped = HEADER.unpack_from(self._mm, 0)
+
+    def _write_header(self):
+        HEADER.pack_into(self._mm, 0, MAGIC, self.capacity, self.head, self.tail, self.events, self.dropped)
+        if self.fsync:
+            self._mm.flush()
+
+    def _record_at(self, position):
+        """(payload memoryview, next position) of the record at `position`, skipping a wrap."""
+        offset = position % self.capacity
+        if self.capacity - offset < RECORD.size:
+            position += self.capacity - offset
+            offset = 0
+        length, crc = RECORD.unpack_from(self._mm, HEADER_SIZE + offset)
+        if length == WRAP_MARKER:
+            position += self.capacity - offset
+            offset = 0
+            length, crc = RECORD.unpack_from(self._mm, HEADER_SIZE + offset)
+        start = HEADER_SIZE + offset + RECORD.size
+        if length > self.capacity - offset - RECORD.size:
+            raise ValueError("record length out of range")
+        payload = memoryview(self._mm)[start:start + length]
+        if zlib.crc32(payload) != crc:
+            payload.release()
+            raise ValueError("record checksum mismatch")
+        return payload, position + RECORD.size + length
+
+    def _recover(self):
+        """Cut the spool at the first damaged record after a crash."""
+        position, events = self.head, 0
+        while position < self.tail:
+            try:
+                payload, next_position = self._record_at(position)
+            except (ValueError, struct.error):
+                break
+            payload.release()
+            if next_position > self.tail:
+                break
+            position, events = next_position, events + 1
+        if (position, events) != (self.tail, self.events):
+            print(f"[SPOOL] {self.path}: kept {events} events, discarded a damaged tail")
+            self.tail, self.events = position, events
+            self._write_header()
+
+    # ---- public API ----
+
+    def append(self, event):
+        """Add one event (a JSON-serializable dict) at the tail."""
+        payload = json.dumps(event, separators=(",", ":")).encode("utf-8")
+        size = RECORD.size + len(payload)
+        if size > self.capacity:
+            raise ValueError(f"event of {size} bytes does not fit a {self.capacity} byte spool")
+        with self._locked():
+            offset = self.tail % self.capacity
+            padding = self.capacity - offset if self.capacity - offset < size else 0
+            if padding and self.head == self.tail:
+                # Empty ring: start the next lap instead of padding
+                self.head = self.tail = self.tail + padding
+                offset, padding = 0, 0
+            while self.capacity - (self.tail - self.head) < padding + size:
+                payload_view, self.head = self._record_at(self.head)
+                payload_view.release()
+                self.events -= 1
+                self.dropped += 1
+            if padding:
+                if padding >= RECORD.size:
+                    RECORD.pack_into(self._mm, HEADER_SIZE + offset, WRAP_MARKER, 0)
+                offset = 0
+            start = HEADER_SIZE + offset
+            RECORD.pack_into(self._mm, start, len(payload), zlib.crc32(payload))
+            self._mm[start + RECORD.size:start + size] = payload
+            if self.fsync:
+                self._mm.flush()
+            self.tail += padding + size
+            self.events += 1
+            self._write_header()
+            self.appended += 1
+
+    def peek(self, max_events=500):
+        """Up to `max_events` oldest events and the position just after them."""
+        with self._locked():
+            return self._peek(max_events)
+
+    def _peek(self, max_events):
+        events, position = [], self.head
+        while position < self.tail and len(events) < max_events:
+            payload, position = self._record_at(position)
+            events.append(json.loads(bytes(payload)))
+            payload.release()
+        return events, position
+
+    def replay(self, sink, batch_size=500, max_batches=None):
+        """
+        Deliver spooled events to `sink(events)` oldest first.
+
+        Stops at the first batch the sink raises on (the batch stays
+        spooled). Returns {"events", "batches", "seconds", "events_per_sec",
+        "error"}.
+        """
+        started = time.perf_counter()
+        delivered = batches = 0
+        error = None
+        while max_batches is None or batches < max_batches:
+            with self._locked():
+                head = self.head
+                events, position = self._peek(batch_size)
+            if not events:
+                break
+            try:
+                sink(events)
+            except Exception as e:
+                error = str(e) or e.__class__.__name__
+                break
+            with self._locked():
+                # Another process may have delivered (or a full ring dropped) these already
+                if self.head == head:
+                    self.head = position
+                    self.events -= len(events)
+                    self._write_header()
+            delivered += len(events)
+            batches += 1
+        seconds = time.perf_counter() - started
+        report = {
+            "events": delivered,
+            "batches": batches,
+            "seconds": round(seconds, 4),
+            "events_per_sec": round(delivered / seconds) if delivered and seconds else 0,
+            "error": error,
+        }
+        with self._lock:
+            self.replayed += delivered
+            if delivered:
+                self.last_replay = report
+        return report
+
+    def reject(self, event, error):
+        """Keep an event the sink refused in the dead-letter file, with the reason."""
+        line = json.dumps({"error": error, "rejected_at": time.time(), "event": event}, separators=(",", ":"))
+        with self._locked(read_header=False):
+            with open(self.rejected_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            self.rejected += 1
+
+    def stats(self):
+        with self._locked():
+            return {
+                "backlog_events": self.events,
+                "backlog_bytes": self.tail - self.head,
+                "capacity_bytes": self.capacity,
+                "dropped_events": self.dropped,
+                "appended": self.appended,
+                "replayed": self.replayed,
+                "rejected": self.rejected,
+                "last_replay_events_per_sec": self.last_replay["events_per_sec"] if self.last_replay else None,
+            }
+
+    def __len__(self):
+        with self._locked():
+            return self.events
+
+    def close(self):
+        with self._lock:
+            self._mm.flush()
+            self._mm.close()
+            self._file.close()
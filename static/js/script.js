@@ -89,6 +89,8 @@ document.addEventListener("DOMContentLoaded", () => {
                 if (sessionCountMetric && typeof data.total_sessions !== "undefined") {
                     sessionCountMetric.textContent = String(data.total_sessions);
                 }
+                loadGameTime();
+                loadActivity();
             }
             showToast(data.message, "success");
             if (action === "start") {
@@ -142,22 +144,25 @@ document.addEventListener("DOMContentLoaded", () => {
         }
     }
 
+    function applyMonitorStatus(data) {
+        setStatusPill(data.status);
+        if (monitorTimerDisplay && data.elapsed_display) {
+            monitorTimerDisplay.textContent = data.elapsed_display;
+        }
+        if (totalPlayTimeMetric && data.total_play_time_display) {
+            totalPlayTimeMetric.textContent = data.total_play_time_display;
+        }
+        if (sessionCountMetric && typeof data.total_sessions !== "undefined") {
+            sessionCountMetric.textContent = String(data.total_sessions);
+        }
+        applyGameState(data.game_detected, data.game_title, true);
+    }
+
     async function syncMonitorStatus() {
         try {
             const res = await fetch("/api/monitor/status");
             if (!res.ok) return;
-            const data = await res.json();
-            setStatusPill(data.status);
-            if (monitorTimerDisplay && data.elapsed_display) {
-                monitorTimerDisplay.textContent = data.elapsed_display;
-            }
-            if (totalPlayTimeMetric && data.total_play_time_display) {
-                totalPlayTimeMetric.textContent = data.total_play_time_display;
-            }
-            if (sessionCountMetric && typeof data.total_sessions !== "undefined") {
-                sessionCountMetric.textContent = String(data.total_sessions);
-            }
-            applyGameState(data.game_detected, data.game_title, true);
+            applyMonitorStatus(await res.json());
         } catch (e) {
             // Ignore sync failures.
         }
@@ -235,76 +240,175 @@ document.addEventListener("DOMContentLoaded", () => {
         });
     });
 
-    syncMonitorStatus();
     setInterval(syncMonitorStatus, 1000);
 
-    // Demo weekly chart. Replace with backend API values from Flask.
-    // Example: fetch('/weekly-data').then(...) and redraw.
-    if (chartCanvas) {
-        const values = [3.2, 4.1, 2.9, 5.6, 4.8, 6.2, 3.7];
-        const labels = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"];
-
-        function drawChart() {
-            const dpr = window.devicePixelRatio || 1;
-            const width = chartCanvas.clientWidth;
-            const height = 220;
-            chartCanvas.width = Math.floor(width * dpr);
-            chartCanvas.height = Math.floor(height * dpr);
-
-            const ctx = chartCanvas.getContext("2d");
-            ctx.setTransform(dpr, 0, 0, dpr, 0, 0);
-            ctx.clearRect(0, 0, width, height);
-
-            const maxValue = Math.max(...values);
-            const left = 16;
-            const right = 12;
-            const top = 16;
-            const bottom = 28;
-            const chartWidth = width - left - right;
-            const chartHeight = height - top - bottom;
-            const slot = chartWidth / values.length;
-            const barWidth = Math.min(30, slot * 0.56);
-
-            ctx.font = "12px Inter";
-            ctx.textAlign = "center";
-
-            values.forEach((value, index) => {
-                const barHeight = (value / maxValue) * chartHeight;
-                const x = left + slot * index + (slot - barWidth) / 2;
-                const y = top + (chartHeight - barHeight);
-
-                ctx.fillStyle = "#2563eb";
-                ctx.fillRect(x, y, barWidth, barHeight);
-
+    // Activity chart (served from /weekly-data)
+    const activityRange = document.getElementById("activityRange");
+    const activityGranularity = document.getElementById("activityGranularity");
+    let activityData = { labels: [], hours: [] };
+
+    function drawChart() {
+        if (!chartCanvas) return;
+        const dpr = window.devicePixelRatio || 1;
+        const width = chartCanvas.clientWidth;
+        const height = 220;
+        chartCanvas.width = Math.floor(width * dpr);
+        chartCanvas.height = Math.floor(height * dpr);
+
+        const ctx = chartCanvas.getContext("2d");
+        ctx.setTransform(dpr, 0, 0, dpr, 0, 0);
+        ctx.clearRect(0, 0, width, height);
+
+        const values = activityData.hours;
+        const labels = activityData.labels;
+        if (values.length === 0) return;
+
+        const maxValue = Math.max(...values) || 1;
+        const left = 16;
+        const right = 12;
+        const top = 16;
+        const bottom = 28;
+        const chartWidth = width - left - right;
+        const chartHeight = height - top - bottom;
+        const slot = chartWidth / values.length;
+        const barWidth = Math.max(1, Math.min(30, slot * 0.56));
+        // Hourly buckets over 30-90 days are too many to label each one
+        const labelEvery = Math.ceil(values.length / Math.max(1, Math.floor(chartWidth / 48)));
+
+        ctx.font = "12px Inter";
+        ctx.textAlign = "center";
+
+        values.forEach((value, index) => {
+            const barHeight = (value / maxValue) * chartHeight;
+            const x = left + slot * index + (slot - barWidth) / 2;
+            const y = top + (chartHeight - barHeight);
+
+            ctx.fillStyle = "#2563eb";
+            ctx.fillRect(x, y, barWidth, barHeight);
+
+            if (index % labelEvery === 0) {
                 ctx.fillStyle = "#6b7280";
                 ctx.fillText(labels[index], x + barWidth / 2, height - 10);
-            });
+            }
+        });
+    }
+
+    async function loadActivity() {
+        if (!chartCanvas) return;
+        const days = activityRange ? activityRange.value : "7";
+        const granularity = activityGranularity ? activityGranularity.value : "day";
+        const utcOffset = -new Date().getTimezoneOffset();
+        try {
+            const response = await fetch(`/weekly-data?days=${days}&granularity=${granularity}&utc_offset=${utcOffset}`);
+            if (!response.ok) return;
+            activityData = await response.json();
+            drawChart();
+        } catch (error) {
+            console.error("Error loading activity chart:", error);
+        }
+    }
+
+    if (activityRange) {
+        activityRange.addEventListener("change", loadActivity);
+    }
+    if (activityGranularity) {
+        activityGranularity.addEventListener("change", loadActivity);
+    }
+    window.addEventListener("resize", drawChart);
+    loadActivity();
+
+    // Time per game (served from /api/analytics/games)
+    const gameTimeChart = document.getElementById("gameTimeChart");
+    const gameTimePeriod = document.getElementById("gameTimePeriod");
+    const gameTimeEmpty = document.getElementById("gameTimeEmpty");
+    let gameTimeData = [];
+
+    function drawGameTimeChart() {
+        if (!gameTimeChart) return;
+        const dpr = window.devicePixelRatio || 1;
+        const width = gameTimeChart.clientWidth;
+        const rowHeight = 28;
+        const height = Math.max(80, gameTimeData.length * rowHeight + 16);
+        gameTimeChart.width = Math.floor(width * dpr);
+        gameTimeChart.height = Math.floor(height * dpr);
+        gameTimeChart.style.height = height + "px";
+
+        const ctx = gameTimeChart.getContext("2d");
+        ctx.setTransform(dpr, 0, 0, dpr, 0, 0);
+        ctx.clearRect(0, 0, width, height);
+        if (gameTimeData.length === 0) return;
+
+        const labelWidth = 170;
+        const valueWidth = 70;
+        const maxSeconds = Math.max(...gameTimeData.map((game) => game.total_seconds));
+        const barArea = width - labelWidth - valueWidth - 16;
+
+        ctx.font = "12px Inter";
+        ctx.textBaseline = "middle";
+        gameTimeData.forEach((game, index) => {
+            const y = 8 + index * rowHeight;
+            const barWidth = maxSeconds ? (game.total_seconds / maxSeconds) * barArea : 0;
+
+            ctx.fillStyle = "#374151";
+            ctx.textAlign = "left";
+            ctx.fillText(game.game_name.slice(0, 26), 8, y + 10);
+
+            ctx.fillStyle = "#2563eb";
+            ctx.fillRect(labelWidth, y, barWidth, 20);
+
+            ctx.fillStyle = "#6b7280";
+            ctx.fillText(game.play_time, labelWidth + barWidth + 8, y + 10);
+        });
+    }
+
+    async function loadGameTime() {
+        if (!gameTimeChart) return;
+        const period = gameTimePeriod ? gameTimePeriod.value : "week";
+        try {
+            const response = await fetch(`/api/analytics/games?period=${period}`);
+            if (!response.ok) return;
+            const data = await response.json();
+            gameTimeData = data.games || [];
+            if (gameTimeEmpty) {
+                gameTimeEmpty.style.display = gameTimeData.length ? "none" : "block";
+            }
+            drawGameTimeChart();
+        } catch (error) {
+            console.error("Error loading game analytics:", error);
         }
+    }
 
-        drawChart();
-        window.addEventListener("resize", drawChart);
+    if (gameTimePeriod) {
+        gameTimePeriod.addEventListener("change", loadGameTime);
     }
+    window.addEventListener("resize", drawGameTimeChart);
+    loadGameTime();
 
     // Game History
     const gameHistoryList = document.getElementById("gameHistoryList");
     const refreshGameHistoryBtn = document.getElementById("refreshGameHistoryBtn");
 
+    function renderGameHistory(history) {
+        if (!gameHistoryList) return;
+        if (history && history.length > 0) {
+            let html = '<table style="width:100%;border-collapse:collapse;margin-top:12px;">';
+            html += '<tr style="text-align:left;border-bottom:1px solid var(--border);"><th style="padding:8px;">Game</th><th style="padding:8px;">Play Time</th><th style="padding:8px;">Date</th></tr>';
+            history.forEach(function(item) {
+                html += '<tr style="border-bottom:1px solid var(--border);"><td style="padding:8px;">' + item.game_name + '</td><td style="padding:8px;">' + item.play_time + '</td><td style="padding:8px;">' + item.played_at + '</td></tr>';
+            });
+            html += '</table>';
+            gameHistoryList.innerHTML = html;
+        } else {
+            gameHistoryList.innerHTML = '<p class="muted">No game history yet.</p>';
+        }
+    }
+
     async function loadGameHistory() {
         if (!gameHistoryList) return;
         try {
             const response = await fetch("/api/monitor/game-history");
             const data = await response.json();
-            if (data.history && data.history.length > 0) {
-                let html = '<table style="width:100%;border-collapse:collapse;margin-top:12px;">';
-                html += '<tr style="text-align:left;border-bottom:1px solid var(--border);"><th style="padding:8px;">Game</th><th style="padding:8px;">Play Time</th><th style="padding:8px;">Date</th></tr>';
-                data.history.forEach(function(item) {
-                    html += '<tr style="border-bottom:1px solid var(--border);"><td style="padding:8px;">' + item.game_name + '</td><td style="padding:8px;">' + item.play_time + '</td><td style="padding:8px;">' + item.played_at + '</td></tr>';
-                });
-                html += '</table>';
-                gameHistoryList.innerHTML = html;
-            } else {
-                gameHistoryList.innerHTML = '<p class="muted">No game history yet.</p>';
-            }
+            renderGameHistory(data.history);
         } catch (error) {
             console.error("Error loading game history:", error);
         }
@@ -314,8 +418,6 @@ document.addEventListener("DOMContentLoaded", () => {
         refreshGameHistoryBtn.addEventListener("click", loadGameHistory);
     }
 
-    loadGameHistory();
-
     // ==========================
     // ALERT SYSTEM JAVASCRIPT
     // ==========================
@@ -324,6 +426,26 @@ document.addEventListener("DOMContentLoaded", () => {
     const refreshAlertsBtn = document.getElementById("refreshAlertsBtn");
     const alertsHistoryList = document.getElementById("alertsHistoryList");
 
+    function renderAlertHistory(alerts) {
+        if (!alertsHistoryList) return;
+        if (alerts && alerts.length > 0) {
+            let html = "";
+            alerts.forEach(function(alert) {
+                html += '<div class="alert-history-item">';
+                html += '<div class="alert-type">' + alert.alert_type + '</div>';
+                html += '<div class="alert-message">' + alert.message + '</div>';
+                html += '<div class="alert-meta">';
+                if (alert.sent_via) html += 'Via: ' + alert.sent_via + ' | ';
+                html += 'Time: ' + alert.sent_at;
+                html += '</div>';
+                html += '</div>';
+            });
+            alertsHistoryList.innerHTML = html;
+        } else {
+            alertsHistoryList.innerHTML = '<p class="muted">No alerts yet.</p>';
+        }
+    }
+
     // Load alert history
     async function loadAlertHistory() {
         if (!alertsHistoryList) return;
@@ -331,23 +453,7 @@ document.addEventListener("DOMContentLoaded", () => {
         try {
             const response = await fetch("/api/alerts/log");
             const data = await response.json();
-            
-            if (data.alerts && data.alerts.length > 0) {
-                let html = "";
-                data.alerts.forEach(function(alert) {
-                    html += '<div class="alert-history-item">';
-                    html += '<div class="alert-type">' + alert.alert_type + '</div>';
-                    html += '<div class="alert-message">' + alert.message + '</div>';
-                    html += '<div class="alert-meta">';
-                    if (alert.sent_via) html += 'Via: ' + alert.sent_via + ' | ';
-                    html += 'Time: ' + alert.sent_at;
-                    html += '</div>';
-                    html += '</div>';
-                });
-                alertsHistoryList.innerHTML = html;
-            } else {
-                alertsHistoryList.innerHTML = '<p class="muted">No alerts yet.</p>';
-            }
+            renderAlertHistory(data.alerts);
         } catch (error) {
             console.error("Error loading alert history:", error);
             alertsHistoryList.innerHTML = '<p class="muted">Error loading alerts.</p>';
@@ -394,9 +500,6 @@ document.addEventListener("DOMContentLoaded", () => {
         refreshAlertsBtn.addEventListener("click", loadAlertHistory);
     }
 
-    // Initial load of alert history
-    loadAlertHistory();
-
     // ==========================
     // EMAIL CONFIGURATION SYSTEM
     // ==========================
@@ -413,28 +516,31 @@ document.addEventListener("DOMContentLoaded", () => {
     const cancelEmailConfigBtn = document.getElementById("cancelEmailConfigBtn");
 
     // Load email configuration status
+    function renderEmailStatus(data) {
+        if (data.configured) {
+            if (emailStatusCard) {
+                emailStatusCard.classList.remove("not-configured");
+                emailStatusCard.classList.add("configured");
+            }
+            if (emailStatusIcon) emailStatusIcon.textContent = "✅";
+            if (emailStatusText) emailStatusText.textContent = "Email configured: " + data.email;
+            if (testEmailConnectionBtn) testEmailConnectionBtn.style.display = "inline-block";
+        } else {
+            if (emailStatusCard) {
+                emailStatusCard.classList.remove("configured");
+                emailStatusCard.classList.add("not-configured");
+            }
+            if (emailStatusIcon) emailStatusIcon.textContent = "⚠️";
+            if (emailStatusText) emailStatusText.textContent = "Email is not configured. Configure your Gmail to receive alerts.";
+            if (testEmailConnectionBtn) testEmailConnectionBtn.style.display = "none";
+        }
+    }
+
     async function loadEmailStatus() {
         try {
             const response = await fetch("/api/alerts/email-status");
             const data = await response.json();
-            
-            if (data.configured) {
-                if (emailStatusCard) {
-                    emailStatusCard.classList.remove("not-configured");
-                    emailStatusCard.classList.add("configured");
-                }
-                if (emailStatusIcon) emailStatusIcon.textContent = "✅";
-                if (emailStatusText) emailStatusText.textContent = "Email configured: " + data.email;
-                if (testEmailConnectionBtn) testEmailConnectionBtn.style.display = "inline-block";
-            } else {
-                if (emailStatusCard) {
-                    emailStatusCard.classList.remove("configured");
-                    emailStatusCard.classList.add("not-configured");
-                }
-                if (emailStatusIcon) emailStatusIcon.textContent = "⚠️";
-                if (emailStatusText) emailStatusText.textContent = "Email is not configured. Configure your Gmail to receive alerts.";
-                if (testEmailConnectionBtn) testEmailConnectionBtn.style.display = "none";
-            }
+            renderEmailStatus(data);
         } catch (error) {
             console.error("Error loading email status:", error);
         }
@@ -537,6 +643,29 @@ document.addEventListener("DOMContentLoaded", () => {
         });
     }
 
-    // Initial load of email status
-    loadEmailStatus();
+    // ==========================
+    // INITIAL LOAD
+    // ==========================
+
+    // One request for everything the dashboard shows first; the individual
+    // endpoints above are still used for refreshes.
+    async function loadDashboard() {
+        try {
+            const response = await fetch("/api/dashboard/bootstrap");
+            if (!response.ok) throw new Error("bootstrap failed: " + response.status);
+            const data = await response.json();
+            applyMonitorStatus(data.status);
+            renderGameHistory(data.history);
+            renderAlertHistory(data.alerts);
+            renderEmailStatus(data.email);
+        } catch (error) {
+            console.error("Error loading dashboard:", error);
+            syncMonitorStatus();
+            loadGameHistory();
+            loadAlertHistory();
+            loadEmailStatus();
+        }
+    }
+
+    loadDashboard();
 });
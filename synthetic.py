@@ -0,0 +1,444 @@
+"""
+Synthetic Workloads
+===================
+
+Seeded fixtures for benchmarks and load tests: the same seed always
+produces the same users, sessions and alerts.
+
+   - generate_database(): bulk-loads N users with months of play into a
+     fresh database (created by app.py). Users follow a casual / regular /
+     heavy profile with weekend peaks, evening and night play, log-normal
+     session lengths, favourite games and a slow drift in how much they
+     play, so some users escalate over the months. game_history,
+     alerts_log (game detected + 30 minute threshold alerts),
+     game_aggregates and user_monitor_stats are filled in time order with
+     the secondary indexes dropped during the load.
+   - SimulatedClock: a time.time() replacement that only moves when the
+     simulation advances it.
+   - ScriptedProcesses: a process-list source for detect_games_running()
+     that shows a game's process during planned play sessions.
+   - MonitorSimulator: drives app.py's monitor (start, detection polls,
+     threshold alerts, journal checkpoints, stop) on the simulated clock
+     through app.set_monitor_sources(), so weeks of live monitoring run in
+     seconds.
+
+Processes that already imported app.py keep their in-memory views (risk
+windows, sketches, caches) from start-up; reload them after a bulk load.
+
+Usage:
+   python synthetic.py generate users.db [--users 1000] [--days 90] [--seed 1]
+   python synthetic.py simulate [--days 14] [--seed 1] [--profile heavy]
+"""
+
+import argparse
+import bisect
+import calendar
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import analytics
+import search
+import shards
+
+
+# Process names as tasklist shows them, most popular first
+GAME_PROCESSES = (
+    "minecraft.exe",
+    "robloxplayerbeta.exe",
+    "fortnite.exe",
+    "valorant.exe",
+    "cs2.exe",
+    "leagueclient.exe",
+    "gta5.exe",
+    "dota2.exe",
+    "pubg.exe",
+    "fifa23.exe",
+    "efootball.exe",
+    "steam.exe",
+)
+BACKGROUND_PROCESSES = ("explorer.exe", "chrome.exe", "discord.exe")
+
+# name: (share of users, P(play) weekday, P(play) weekend, sessions per play day,
+#        median session minutes, share of sessions started at night)
+PROFILES = {
+    "casual": (0.55, 0.30, 0.55, 1.2, 35, 0.05),
+    "regular": (0.30, 0.60, 0.85, 1.8, 60, 0.15),
+    "heavy": (0.15, 0.90, 0.97, 3.0, 100, 0.40),
+}
+SESSION_SIGMA = 0.6
+THRESHOLD_MINUTES = 30  # default alert_threshold_minutes
+INSERT_ROWS = 50000
+DEFAULT_START = "2026-01-05"
+
+
+def _day_epoch(day):
+    return calendar.timegm(time.strptime(day, "%Y-%m-%d"))
+
+
+def _utc(epochs):
+    return np.char.replace(np.datetime_as_string(np.asarray(epochs, dtype="datetime64[s]")), "T", " ").tolist()
+
+
+def _profile_arrays(profiles):
+    table = np.array([PROFILES[name][1:] for name in PROFILES])
+    return table[profiles]
+
+
+class PlayModel:
+    """Per-user profiles, favourite games and drift; sessions(day) draws one day for everyone."""
+
+    def __init__(self, users, days, seed=1, profile=None):
+        self.rng = np.random.default_rng(seed)
+        self.days = days
+        names = list(PROFILES)
+        if profile is None:
+            shares = np.array([PROFILES[name][0] for name in names])
+            self.profiles = self.rng.choice(len(names), users, p=shares / shares.sum())
+        else:
+            self.profiles = np.full(users, names.index(profile))
+        self.params = _profile_arrays(self.profiles)
+        popularity = 1.0 / np.arange(1, len(GAME_PROCESSES) + 1)
+        self.popularity = popularity / popularity.sum()
+        self.favourite = self.rng.choice(len(GAME_PROCESSES), users, p=self.popularity)
+        # log-intensity drifts linearly over the whole period: a few users double their play
+        self.drift = self.rng.normal(0.0, 0.35, users)
+
+    def sessions(self, day_index, day_start, utc_offset=0):
+        """(user_index, start, seconds, game_index) arrays of the sessions started on one day."""
+        rng, params = self.rng, self.params
+        intensity = np.exp(self.drift * day_index / max(self.days - 1, 1))
+        weekend = time.gmtime(day_start).tm_wday >= 5
+        play = rng.random(len(params)) < np.minimum(params[:, 1 if weekend else 0] * intensity, 0.99)
+        counts = np.where(play, 1 + rng.poisson(np.maximum(params[:, 2] * intensity - 1, 0)), 0)
+        users = np.repeat(np.arange(len(params)), counts)
+
+        count = len(users)
+        night = rng.random(count) < params[users, 4]
+        # Evenings peak around 19:30 local time; night sessions start 22:00-02:30
+        hour = np.where(night, rng.uniform(22.0, 26.5, count), np.clip(rng.normal(19.5, 2.5, count), 8.0, 23.5))
+        start = day_start - utc_offset + (hour * 3600).astype(np.int64)
+        minutes = np.exp(rng.normal(np.log(params[users, 3] * np.sqrt(intensity[users])), SESSION_SIGMA))
+        seconds = np.clip(minutes * 60, 120, 8 * 3600).astype(np.int64)
+        games = np.where(
+            rng.random(count) < 0.8,
+            self.favourite[users],
+            rng.choice(len(GAME_PROCESSES), count, p=self.popularity),
+        )
+        return users, start, seconds, games
+
+
+def _drop_indexes(conn, tables):
+    """Drop the tables' indexes and triggers (search index upkeep); returns their CREATE statements."""
+    indexes = conn.execute(
+        f"SELECT type, name, sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND sql IS NOT NULL "
+        f"AND tbl_name IN ({','.join('?' * len(tables))})",
+        tables,
+    ).fetchall()
+    for kind, name, _ in indexes:
+        conn.execute(f"DROP {kind.upper()} {name}")
+    return [sql for _, _, sql in indexes]
+
+
+def generate_database(db_name, users=1000, days=90, seed=1, start=DEFAULT_START, catalog=None, password_hash=None):
+    """
+    Bulk-load `users` users with `days` days of play starting at `start` (UTC date).
+
+    The database must already have the app's schema (start app.py once) and
+    no users. Pass the app's GameCatalog as `catalog` to keep its cache in
+    sync. Every user's password is "password" unless `password_hash` is given.
+    Returns a report dict.
+    """
+    started = time.perf_counter()
+    if catalog is None:
+        from games import GameCatalog
+
+        catalog = GameCatalog(db_name)
+        catalog.load()
+    game_ids = np.array([catalog.resolve(process) for process in GAME_PROCESSES])
+    if password_hash is None:
+        from werkzeug.security import generate_password_hash
+
+        password_hash = generate_password_hash("password")
+
+    if shards.router(db_name).paths:
+        raise ValueError(f"{db_name} is split into shards; generate into an unsharded database, then split it")
+    conn = sqlite3.connect(db_name)
+    if conn.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+        conn.close()
+        raise ValueError(f"{db_name} already has users; generate into a fresh database")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA journal_mode = MEMORY")
+    index_sql = _drop_indexes(conn, ("game_history", "alerts_log", "game_aggregates"))
+
+    conn.executemany(
+        "INSERT INTO users (id, name, email, password) VALUES (?, ?, ?, ?)",
+        ((user_id, f"Player {user_id}", f"player{user_id}@example.com", password_hash) for user_id in range(1, users + 1)),
+    )
+    conn.commit()
+
+    model = PlayModel(users, days, seed)
+    first_day = _day_epoch(start)
+    utc_offset = time.localtime(first_day).tm_gmtoff
+    total_seconds = np.zeros(users, dtype=np.int64)
+    total_sessions = np.zeros(users, dtype=np.int64)
+    last_seconds = np.zeros(users, dtype=np.int64)
+    last_played = np.zeros(users, dtype=np.int64)
+    sessions = alerts = 0
+    threshold_message = (
+        f"Play time threshold of {THRESHOLD_MINUTES} minutes reached "
+        f"({time.strftime('%H:%M:%S', time.gmtime(THRESHOLD_MINUTES * 60))} this session)"
+    )
+
+    for day_index in range(days):
+        user_index, session_start, seconds, games = model.sessions(day_index, first_day + day_index * 86400, utc_offset)
+        ended = session_start + seconds
+        order = np.argsort(ended, kind="stable")
+        user_index, session_start, seconds, games, ended = (
+            user_index[order], session_start[order], seconds[order], games[order], ended[order]
+        )
+        user_ids = (user_index + 1).tolist()
+        game_list = game_ids[games].tolist()
+        for first in range(0, len(user_ids), INSERT_ROWS):
+            chunk = slice(first, first + INSERT_ROWS)
+            conn.executemany(
+                "INSERT INTO game_history (user_id, game_id, play_seconds, played_at) VALUES (?, ?, ?, ?)",
+                zip(user_ids[chunk], game_list[chunk], seconds[chunk].tolist(), _utc(ended[chunk])),
+            )
+
+        # The alerts the monitor would have logged: every detection, and each session past the threshold
+        over = seconds >= THRESHOLD_MINUTES * 60
+        alert_at = np.concatenate([session_start, session_start[over] + THRESHOLD_MINUTES * 60])
+        alert_rows = np.concatenate([np.arange(len(user_ids)), np.flatnonzero(over)])
+        alert_order = np.argsort(alert_at, kind="stable")
+        detected = len(user_ids)
+        rows = []
+        for position, sent_at in zip(alert_order.tolist(), _utc(alert_at[alert_order])):
+            row = alert_rows[position]
+            if position < detected:
+                local = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(session_start[row] + utc_offset))
+                rows.append((user_ids[row], "game_detected", f"Game detected: {GAME_PROCESSES[games[row]]} at {local}",
+                             game_list[row], "email", sent_at))
+            else:
+                rows.append((user_ids[row], "time_threshold", threshold_message, game_list[row], "email", sent_at))
+        conn.executemany(
+            "INSERT INTO alerts_log (user_id, alert_type, message, game_id, sent_via, sent_at) VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.commit()
+
+        total_seconds += np.bincount(user_index, weights=seconds, minlength=users).astype(np.int64)
+        total_sessions += np.bincount(user_index, minlength=users)
+        if len(user_index):
+            # Sorted by end time, so the last occurrence of a user is their latest session
+            latest, position = np.unique(user_index[::-1], return_index=True)
+            last_seconds[latest] = seconds[::-1][position]
+            last_played[latest] = ended[::-1][position]
+        sessions += detected
+        alerts += len(rows)
+
+    played = np.flatnonzero(total_sessions)
+    conn.executemany(
+        "INSERT INTO user_monitor_stats (user_id, total_play_seconds, total_sessions, last_session_seconds, updated_at) "
+        "VALUES (?, ?, ?, ?, ?)",
+        zip((played + 1).tolist(), total_seconds[played].tolist(), total_sessions[played].tolist(),
+            last_seconds[played].tolist(), _utc(last_played[played])),
+    )
+    conn.execute(
+        """INSERT INTO game_aggregates (user_id, game_id, day, total_seconds, session_count, last_played)
+           SELECT user_id, game_id, date(played_at), SUM(play_seconds), COUNT(*), MAX(played_at)
+           FROM game_history GROUP BY date(played_at), user_id, game_id"""
+    )
+    conn.commit()
+    for sql in index_sql:
+        conn.execute(sql)
+    # One bulk re-index instead of a trigger call per alert row
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'alerts_fts'").fetchone():
+        search.rebuild(conn)
+    # Bulk-loaded rows skip the change log; the analytics store exports them in one pass
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'change_log'").fetchone():
+        analytics.mark_backfill(conn)
+    conn.commit()
+    conn.close()
+
+    duration = time.perf_counter() - started
+    return {
+        "users": users,
+        "days": days,
+        "start": start,
+        "seed": seed,
+        "sessions": sessions,
+        "alerts": alerts,
+        "duration_seconds": round(duration, 3),
+        "rows_per_sec": round((users + sessions + alerts) / duration) if duration else 0,
+        "db_bytes": os.path.getsize(db_name),
+    }
+
+
+class SimulatedClock:
+    """Epoch seconds that only move when advanced; call it like time.time."""
+
+    def __init__(self, start):
+        self.now = float(start)
+
+    def __call__(self):
+        return self.now
+
+    time = __call__
+
+    def advance(self, seconds):
+        self.now += seconds
+
+    sleep = advance
+
+    def advance_to(self, when):
+        self.now = max(self.now, float(when))
+
+
+class ScriptedProcesses:
+    """Process list that shows a game's process while one of the planned sessions is running."""
+
+    def __init__(self, clock, sessions, background=BACKGROUND_PROCESSES):
+        self.clock = clock
+        self.sessions = sorted(sessions)
+        self._starts = [session[0] for session in self.sessions]
+        self.background = list(background)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        now = self.clock()
+        index = bisect.bisect_right(self._starts, now) - 1
+        if index >= 0 and now < self.sessions[index][1]:
+            return self.background + [self.sessions[index][2]]
+        return list(self.background)
+
+
+def plan_sessions(days, seed=1, start=DEFAULT_START, profile="heavy"):
+    """One user's non-overlapping (start, end, process) play sessions."""
+    model = PlayModel(1, days, seed, profile)
+    first_day = _day_epoch(start)
+    utc_offset = time.localtime(first_day).tm_gmtoff
+    sessions = []
+    for day_index in range(days):
+        _, starts, seconds, games = model.sessions(day_index, first_day + day_index * 86400, utc_offset)
+        for begin, length, game in sorted(zip(starts.tolist(), seconds.tolist(), games.tolist())):
+            # A later session of the same evening starts after a break
+            begin = max(begin, sessions[-1][1] + 900) if sessions else begin
+            sessions.append((begin, begin + length, GAME_PROCESSES[game]))
+    return sessions
+
+
+class MonitorSimulator:
+    """Replays planned sessions through app.py's live monitor on a simulated clock."""
+
+    def __init__(self, app_module, user_id, days=14, seed=1, start=DEFAULT_START, profile="heavy", quiet=True):
+        self.app = app_module
+        self.user_id = user_id
+        self.seed = seed
+        self.days = days
+        self.sessions = plan_sessions(days, seed, start, profile)
+        self.clock = SimulatedClock(_day_epoch(start))
+        self.processes = ScriptedProcesses(self.clock, self.sessions)
+        self.quiet = quiet
+
+    def run(self):
+        """Simulate every planned session. Returns a report dict."""
+        app, clock = self.app, self.clock
+        rng = np.random.default_rng(self.seed)
+        poll = app.MONITOR_POLL_SECONDS
+        polls = 0
+        started = time.perf_counter()
+        simulated_from = clock()
+        output = io.StringIO() if self.quiet else sys.stdout
+        app.set_monitor_sources(clock, self.processes)
+        try:
+            with contextlib.redirect_stdout(output):
+                for begin, end, _ in self.sessions:
+                    # The user starts monitoring a little before playing and stops a little after
+                    lead, lag = rng.integers(0, 600, 2).tolist()
+                    clock.advance_to(begin - lead)
+                    app._monitor_start(self.user_id)
+                    while clock() < end + lag:
+                        clock.advance(poll)
+                        app._monitor_detection_step()
+                        app._threshold_scheduler.run_pending()
+                        polls += 1
+                    app._monitor_stop()
+        finally:
+            app.set_monitor_sources()
+
+        wall = time.perf_counter() - started
+        simulated = clock() - simulated_from
+        conn = shards.connect(app.DB_NAME, self.user_id)
+        recorded = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(play_seconds), 0) FROM game_history WHERE user_id = ?", (self.user_id,)
+        ).fetchone()
+        game_seconds = conn.execute(
+            "SELECT COALESCE(SUM(total_seconds), 0) FROM game_aggregates WHERE user_id = ?", (self.user_id,)
+        ).fetchone()[0]
+        alerts = dict(conn.execute(
+            "SELECT alert_type, COUNT(*) FROM alerts_log WHERE user_id = ? GROUP BY alert_type", (self.user_id,)
+        ).fetchall())
+        conn.close()
+        return {
+            "seed": self.seed,
+            "simulated_days": round(simulated / 86400, 2),
+            "wall_seconds": round(wall, 3),
+            "speedup": round(simulated / wall) if wall else 0,
+            "planned_sessions": len(self.sessions),
+            "polls": polls,
+            "polls_per_sec": round(polls / wall) if wall else 0,
+            "sessions_recorded": recorded[0],
+            "hours_planned": round(sum(end - begin for begin, end, _ in self.sessions) / 3600, 1),
+            "hours_recorded": round(recorded[1] / 3600, 1),
+            "game_hours_recorded": round(game_seconds / 3600, 1),
+            "alerts": alerts,
+            "journal": app._session_journal.stats(),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic users, sessions and monitor simulations")
+    sub = parser.add_subparsers(dest="command", required=True)
+    generate = sub.add_parser("generate", help="bulk-load users and play history into a fresh database")
+    generate.add_argument("db", help="database created by app.py, without users")
+    generate.add_argument("--users", type=int, default=1000)
+    generate.add_argument("--days", type=int, default=90)
+    generate.add_argument("--seed", type=int, default=1)
+    generate.add_argument("--start", default=DEFAULT_START, help=f"first day, UTC (default: {DEFAULT_START})")
+    simulate = sub.add_parser("simulate", help="run the live monitor on a simulated clock (throw-away database)")
+    simulate.add_argument("--days", type=int, default=14)
+    simulate.add_argument("--seed", type=int, default=1)
+    simulate.add_argument("--profile", choices=list(PROFILES), default="heavy")
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        print(json.dumps(generate_database(args.db, args.users, args.days, args.seed, args.start), indent=2))
+        return 0
+
+    os.chdir(tempfile.mkdtemp(prefix="monitor_sim_"))
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app
+
+    conn = sqlite3.connect(app.DB_NAME)
+    user_id = conn.execute(
+        "INSERT INTO users (name, email, password) VALUES ('Simulated Player', 'sim@example.com', 'x')"
+    ).lastrowid
+    conn.commit()
+    conn.close()
+    # Alerts are logged as SMS so the simulation never tries to reach an SMTP server
+    app.save_user_alert_settings(user_id, {"email_alerts_enabled": False, "sms_alerts_enabled": True, "phone_number": "+10000000000"})
+    print(json.dumps(MonitorSimulator(app, user_id, args.days, args.seed, profile=args.profile).run(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
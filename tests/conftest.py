@@ -0,0 +1,35 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """app.py imported once, with its database in a throw-away directory."""
+    os.chdir(tmp_path_factory.mktemp("app"))
+    os.environ.setdefault("RISK_SNAPSHOTS", "0")
+    os.environ.setdefault("RETENTION_INTERVAL_HOURS", "0")
+    os.environ.setdefault("ANALYTICS_CONSUME_SECONDS", "0")
+    os.environ.setdefault("SKETCH_FLUSH_SECONDS", "0")
+    import app
+
+    return app
+
+
+@pytest.fixture
+def user_id(app_module):
+    """A new user with SMS alerts only, so no test sends email."""
+    conn = sqlite3.connect(app_module.DB_NAME)
+    count = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    cursor = conn.execute("INSERT INTO users (name, email, password) VALUES ('Test', ?, 'x')", (f"test{count}@example.com",))
+    conn.commit()
+    conn.close()
+    app_module.save_user_alert_settings(
+        cursor.lastrowid, {"email_alerts_enabled": False, "sms_alerts_enabled": True, "phone_number": "+10000000000"}
+    )
+    return cursor.lastrowid
@@ -0,0 +1,35 @@
+import os
+
+from activity import ActivityCache
+
+
+def test_activity_is_memoized_only_with_the_memory_backend(app_module):
+    backend = os.environ.get("MONITOR_STATE_BACKEND", "memory")
+    assert app_module._activity_cache.enabled == (backend == "memory")
+
+
+def test_disabled_cache_reads_the_database_every_time(app_module, user_id):
+    cache = ActivityCache(app_module.DB_NAME, enabled=False)
+    assert cache.get(user_id)["sessions"] == 0
+    assert cache.get(user_id)["sessions"] == 0
+    assert cache.stats() == {"enabled": False, "entries": 0, "hits": 0, "misses": 2}
+
+
+def test_memo_keeps_the_most_recently_used_entries(app_module, user_id):
+    cache = ActivityCache(app_module.DB_NAME, max_entries=2)
+    cache.get(user_id, utc_offset_minutes=0)
+    cache.get(user_id, utc_offset_minutes=60)
+    cache.get(user_id, utc_offset_minutes=0)
+    cache.get(user_id, utc_offset_minutes=120)
+    assert [key[3] for key in cache._cache] == [0, 120]
+    assert cache.stats()["entries"] == 2
+
+
+def test_weekly_data_only_accepts_real_utc_offsets(app_module, user_id):
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session["user"] = {"id": user_id}
+    for offset in (-720, -210, 0, 345, 840):
+        assert client.get(f"/weekly-data?utc_offset={offset}").status_code == 200
+    for offset in (-721, 841, 7, -839):
+        assert client.get(f"/weekly-data?utc_offset={offset}").status_code == 400
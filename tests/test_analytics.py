@@ -0,0 +1,43 @@
+def test_game_totals_include_a_session_just_recorded(app_module, user_id):
+    # ANALYTICS_CONSUME_SECONDS=0 in the tests: nothing exports the change log in the background
+    app_module._record_monitor_session(user_id, 600, "fortnite.exe")
+
+    games = app_module.get_game_analytics(user_id, "today")
+    assert [(game["game_name"], game["total_seconds"], game["session_count"]) for game in games] == [
+        ("Fortnite", 600, 1)
+    ]
+    assert not app_module._analytics_consumer.pending(user_id)
+
+
+def test_game_aggregates_and_the_store_agree_per_game(app_module, user_id, tmp_path):
+    import time
+
+    import agent
+    import shards
+    from monitor_core import new_session_event
+    from spool import EventSpool
+
+    # The app's stop path, a spooled / ingested event and the agent's --db sink, each with two games
+    app_module._record_monitor_session(user_id, 900, "cs2.exe", games={"cs2.exe": 600, "dota2.exe": 300})
+    app_module._store_events(
+        [new_session_event(user_id, "cs2.exe", 500, time.time(), games={"cs2.exe": 400, "dota2.exe": 100})]
+    )
+    sink = agent.SqliteSink(app_module.DB_NAME, EventSpool(str(tmp_path / "spool.bin"), capacity_bytes=65536))
+    sink.record(new_session_event(user_id, "dota2.exe", 300, time.time(), games={"steam.exe": 0, "dota2.exe": 300}))
+
+    conn = shards.connect(app_module.DB_NAME, user_id)
+    aggregates = {
+        app_module._game_catalog.title(game_id): (seconds, sessions)
+        for game_id, seconds, sessions in conn.execute(
+            """SELECT game_id, SUM(total_seconds), SUM(session_count) FROM game_aggregates
+               WHERE user_id = ? GROUP BY game_id""",
+            (user_id,),
+        )
+    }
+    conn.close()
+    store = {
+        game["game_name"]: (game["total_seconds"], game["session_count"])
+        for game in app_module.get_game_analytics(user_id, "today")
+    }
+    # reports.py reads the first, the dashboard the second
+    assert aggregates == store == {"Counter-Strike 2": (1000, 2), "Dota 2": (700, 3)}
@@ -0,0 +1,104 @@
+import os
+import signal
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHECKPOINT_SECONDS = 30
+
+# Monitors one user on a simulated clock, printing the session's elapsed seconds after every poll
+MONITOR = """
+import sqlite3
+import time
+
+import app
+from synthetic import SimulatedClock
+
+conn = sqlite3.connect(app.DB_NAME)
+user_id = conn.execute("INSERT INTO users (name, email, password) VALUES ('Crash', 'crash@example.com', 'x')").lastrowid
+conn.commit()
+conn.close()
+app.save_user_alert_settings(user_id, {"email_alerts_enabled": False, "sms_alerts_enabled": True, "phone_number": "+10000000000"})
+
+clock = SimulatedClock(time.time())
+app.set_monitor_sources(clock, lambda: ["minecraft.exe"])
+app._monitor_start(user_id)
+print("USER", user_id, flush=True)
+while True:
+    clock.advance(app.MONITOR_POLL_SECONDS)
+    app._monitor_detection_step()
+    print("ELAPSED", app._get_elapsed_seconds(app._monitor_state.load()), flush=True)
+"""
+
+# Start-up recovers the orphaned session; print the last checkpoint and what game_history got
+RESTART = """
+import sys
+import time
+
+import shards
+
+user_id = int(sys.argv[1])
+conn = shards.connect("users.db")
+checkpoint_at = conn.execute("SELECT checkpoint_at FROM monitor_journal WHERE user_id = ?", (user_id,)).fetchone()[0]
+conn.close()
+print("CHECKPOINT", time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(checkpoint_at)))
+
+import app
+
+conn = shards.connect(app.DB_NAME, user_id)
+seconds, played_at = conn.execute("SELECT play_seconds, played_at FROM game_history WHERE user_id = ?", (user_id,)).fetchone()
+print("RECOVERED", seconds)
+print("PLAYED_AT", played_at.replace(" ", "T"))
+"""
+
+
+def _tagged(lines, tag):
+    """Values of the `tag` lines printed by a script (the app logs in between)."""
+    for line in lines:
+        if line.startswith(tag + " "):
+            yield line.split()[1]
+
+
+def _env():
+    env = dict(os.environ)
+    env.update(
+        PYTHONPATH=ROOT,
+        MONITOR_STATE_BACKEND="memory",
+        MONITOR_CHECKPOINT_SECONDS=str(CHECKPOINT_SECONDS),
+        RISK_SNAPSHOTS="0",
+        RETENTION_INTERVAL_HOURS="0",
+        ANALYTICS_CONSUME_SECONDS="0",
+        SKETCH_FLUSH_SECONDS="0",
+    )
+    return env
+
+
+def test_killed_app_loses_at_most_one_checkpoint_interval(tmp_path):
+    monitor = subprocess.Popen(
+        [sys.executable, "-c", MONITOR], cwd=tmp_path, env=_env(), stdout=subprocess.PIPE, text=True
+    )
+    try:
+        user_id = int(next(_tagged(monitor.stdout, "USER")))
+        for value in _tagged(monitor.stdout, "ELAPSED"):
+            elapsed = float(value)
+            if elapsed >= 1000:  # mid-session, between two checkpoints
+                break
+        monitor.send_signal(signal.SIGKILL)
+        monitor.wait(timeout=10)
+        # Polls that ran before the kill landed count as played time too
+        for value in _tagged(monitor.stdout.read().splitlines(), "ELAPSED"):
+            elapsed = max(elapsed, float(value))
+    finally:
+        monitor.kill()
+        monitor.stdout.close()
+
+    restart = subprocess.run(
+        [sys.executable, "-c", RESTART, str(user_id)],
+        cwd=tmp_path, env=_env(), capture_output=True, text=True, timeout=60, check=True,
+    )
+    lines = restart.stdout.splitlines()
+    recovered = int(next(_tagged(lines, "RECOVERED")))
+    assert 0 < recovered <= elapsed
+    assert elapsed - recovered <= CHECKPOINT_SECONDS + 1  # +1: play_seconds is stored as whole seconds
+    # Dated by the last checkpoint (simulated clock, well ahead of the restart), not the restart time
+    assert next(_tagged(lines, "PLAYED_AT")) == next(_tagged(lines, "CHECKPOINT"))
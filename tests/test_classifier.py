@@ -0,0 +1,46 @@
+import time
+
+import numpy as np
+
+import shards
+from classifier import CLASSES, load_training_data
+from model import GameAddictionAnalyzer, RollingRiskScorer
+from monitor_core import record_session
+
+DAY = 24 * 3600
+
+
+class _RecordingModel:
+    def classify(self, *features):
+        self.features = features
+        return "Normal", 1.0
+
+
+def test_training_rows_match_what_analyze_recent_scores(app_module, user_id):
+    game_id = app_module._game_catalog.resolve("dota2.exe")
+    noon = (int(time.time()) // DAY - 10) * DAY + 12 * 3600
+    sessions = [(noon, 3 * 3600), (noon + DAY, 5400), (noon + DAY + 11 * 3600, 2 * 3600), (noon + 4 * DAY, 4 * 3600)]
+    conn = shards.connect(app_module.DB_NAME, user_id)
+    for ended_at, seconds in sessions:
+        record_session(conn, user_id, seconds, game_id, time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(ended_at)))
+    conn.commit()
+    conn.close()
+
+    X, y = load_training_data(app_module.DB_NAME)
+    days_played = len({time.strftime("%Y-%m-%d", time.localtime(ended_at)) for ended_at, _ in sessions})
+    rows, labels = X[-days_played:], y[-days_played:]
+
+    # Each day's row is the window analyze_recent() sees right after that day's last session
+    day_ends = [sessions[0][0], sessions[2][0], sessions[3][0]]
+    for row, label, day_end in zip(rows, labels, day_ends):
+        scorer = RollingRiskScorer()
+        for ended_at, seconds in sessions:
+            if ended_at <= day_end:
+                scorer.record_session(user_id, seconds, ended_at)
+        model = _RecordingModel()
+        result = GameAddictionAnalyzer(scorer=scorer, model=model).analyze_recent(user_id, now=day_end)
+        np.testing.assert_allclose(row, model.features, rtol=1e-6)
+        assert label == CLASSES.index(result["classification"])
+
+    # 7-day averages, not the day's own totals: three sessions in the window by the second day
+    np.testing.assert_allclose(rows[1][:2], [(3 * 3600 + 5400 + 2 * 3600) / 3600 / 7, 3 / 7], rtol=1e-6)
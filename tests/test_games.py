@@ -0,0 +1,66 @@
+import sqlite3
+
+import games
+from games import GameCatalog, migrate_game_names
+
+
+def test_title_reads_games_registered_by_another_process(tmp_path):
+    db_name = str(tmp_path / "games.db")
+    worker, other = GameCatalog(db_name), GameCatalog(db_name)
+    worker.load()
+    other.load()
+
+    game_id = other.resolve("Valorant-Win64-Shipping.exe")
+    assert worker.title(game_id) == "Valorant"
+    assert worker.title(game_id + 1) == "Unknown"
+    assert worker.title(None) is None
+
+
+def test_missing_titles_are_not_looked_up_on_every_call(tmp_path, monkeypatch):
+    db_name = str(tmp_path / "games.db")
+    catalog = GameCatalog(db_name)
+    catalog.load()
+    lookups = []
+    connect = sqlite3.connect
+    monkeypatch.setattr(games.sqlite3, "connect", lambda *args: lookups.append(args) or connect(*args))
+
+    assert [catalog.title(404) for _ in range(3)] == ["Unknown"] * 3
+    assert len(lookups) == 1
+
+    # The id shows up once this catalog registers it, and after the TTL otherwise
+    game_id = catalog.resolve("dota2.exe")
+    assert catalog.title(game_id) == "Dota 2"
+    assert catalog.title(game_id + 1) == "Unknown"
+    other = GameCatalog(db_name)
+    other.load()
+    other.resolve("cs2.exe")
+    assert catalog.title(game_id + 1) == "Unknown"
+    monkeypatch.setattr(games, "MISSING_TITLE_TTL_SECONDS", 0)
+    assert catalog.title(game_id + 1) == "Counter-Strike 2"
+
+
+def test_migration_keeps_rows_sql_would_not_normalize(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "games.db"))
+    conn.execute("CREATE TABLE game_history (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+                 "game_name TEXT NOT NULL, play_seconds INTEGER NOT NULL, played_at TEXT)")
+    conn.execute("CREATE TABLE alerts_log (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, alert_type TEXT NOT NULL, "
+                 "message TEXT NOT NULL, game_name TEXT, sent_via TEXT, sent_at TEXT)")
+    conn.execute("CREATE TABLE game_aggregates (user_id INTEGER NOT NULL, game_name TEXT NOT NULL, day TEXT NOT NULL, "
+                 "total_seconds INTEGER NOT NULL, session_count INTEGER NOT NULL, last_played TEXT, "
+                 "PRIMARY KEY (user_id, game_name, day))")
+    names = ["Dota2.exe", "\tdota2.exe\n", "ÉLDEN RING.exe", "élden ring.exe", ""]
+    conn.executemany("INSERT INTO game_history (user_id, game_name, play_seconds, played_at) VALUES (1, ?, 60, '2026-01-01')",
+                     [(name,) for name in names])
+    conn.executemany("INSERT INTO game_aggregates VALUES (1, ?, '2026-01-01', 60, 1, '2026-01-01')", [(name,) for name in names])
+    conn.execute("INSERT INTO alerts_log (user_id, alert_type, message, game_name) VALUES (1, 'game_detected', 'x', 'ÉLDEN RING.exe')")
+    catalog = GameCatalog(str(tmp_path / "games.db"))
+    catalog.load(conn)
+
+    assert migrate_game_names(conn, catalog) == ["game_history", "alerts_log", "game_aggregates"]
+
+    history = conn.execute("SELECT game_id, COUNT(*) FROM game_history GROUP BY game_id").fetchall()
+    assert {catalog.title(game_id): count for game_id, count in history} == {"Dota 2": 2, "élden ring": 2, "Unknown": 1}
+    aggregates = conn.execute("SELECT game_id, total_seconds, session_count FROM game_aggregates").fetchall()
+    assert {catalog.title(game_id): (seconds, count) for game_id, seconds, count in aggregates} == {
+        "Dota 2": (120, 2), "élden ring": (120, 2), "Unknown": (60, 1)}
+    assert [catalog.title(game_id) for (game_id,) in conn.execute("SELECT game_id FROM alerts_log")] == ["élden ring"]
@@ -0,0 +1,49 @@
+import gzip
+import os
+
+import pytest
+
+import http_cache
+
+
+@pytest.fixture
+def static_dir(app_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module.app, "static_folder", str(tmp_path))
+    monkeypatch.setattr(app_module._static_assets, "static_folder", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def _write_css(static_dir, name, revision=0):
+    asset = static_dir / name
+    asset.write_text(f"/* revision {revision} */\n" + "body { color: #333; }\n" * 200)
+    os.utime(asset, ns=(revision * 10**9, revision * 10**9))
+
+
+@pytest.mark.parametrize("accept, gzipped", [
+    ("gzip", True),
+    ("br, gzip;q=0.5", True),
+    ("*", True),
+    ("gzip;q=0", False),
+    ("gzip;q=0, *", False),
+    ("identity", False),
+])
+def test_gzip_follows_accept_encoding_q_values(static_dir, client, accept, gzipped):
+    _write_css(static_dir, "site.css")
+    response = client.get("/static/site.css", headers={"Accept-Encoding": accept})
+    assert response.status_code == 200
+    assert (response.headers.get("Content-Encoding") == "gzip") == gzipped
+
+
+def test_compressed_static_cache_keeps_one_version_per_file(static_dir, client):
+    for revision in range(1, 6):
+        _write_css(static_dir, "edited.css", revision)
+        response = client.get("/static/edited.css", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert f"revision {revision}".encode() in gzip.decompress(response.get_data())
+    assert "edited.css" in http_cache._compressed_static
+    assert not any(isinstance(key, tuple) for key in http_cache._compressed_static)
@@ -0,0 +1,102 @@
+import time
+
+import pytest
+
+import shards
+from monitor_core import attribute_games, detect_games_running, game_seconds, new_session_event
+from synthetic import SimulatedClock
+
+
+def test_detect_games_running_one_per_keyword():
+    processes = ["explorer.exe", "steam.exe", "steamwebhelper.exe", "cs2.exe"]
+    assert detect_games_running(lambda: processes) == ["steam.exe", "cs2.exe"]
+
+
+def test_concurrent_games_split_and_launcher_waits():
+    games = attribute_games({}, ["steam.exe"], 0.0)
+    games = attribute_games(games, ["steam.exe", "cs2.exe", "dota2.exe"], 60.0)
+    games = attribute_games(games, [], 660.0)
+    # Steam alone for 60 s, then nothing while the two games split 600 s
+    assert game_seconds(games, 700.0) == {"steam.exe": 60.0, "cs2.exe": 300.0, "dota2.exe": 300.0}
+
+
+@pytest.fixture
+def simulated_monitor(app_module):
+    clock = SimulatedClock(time.time())
+    processes = ["explorer.exe"]
+    app_module.set_monitor_sources(clock, lambda: list(processes))
+    yield clock, processes
+    app_module.set_monitor_sources()
+
+
+def test_overlapping_games_are_one_session(app_module, user_id, simulated_monitor):
+    clock, processes = simulated_monitor
+    processes += ["steam.exe", "cs2.exe"]
+    app_module._monitor_start(user_id)
+    for _ in range(int(3600 / app_module.MONITOR_POLL_SECONDS)):
+        clock.advance(app_module.MONITOR_POLL_SECONDS)
+        app_module._monitor_detection_step()
+    app_module._monitor_stop()
+
+    week = app_module._risk_scorer.get_windows(user_id, now=clock())["7d"]
+    assert (week["play_seconds"], week["session_count"]) == (3600, 1)
+    if app_module._recent_sessions.capacity:  # off with the multi-worker backends
+        assert [seconds for _, _, seconds in app_module._recent_sessions.recent(user_id)] == [3600]
+
+    conn = shards.connect(app_module.DB_NAME, user_id)
+    stats = conn.execute(
+        "SELECT total_play_seconds, total_sessions FROM user_monitor_stats WHERE user_id = ?", (user_id,)
+    ).fetchone()
+    history = conn.execute("SELECT game_id, play_seconds FROM game_history WHERE user_id = ?", (user_id,)).fetchall()
+    per_game = dict(conn.execute(
+        "SELECT game_id, total_seconds FROM game_aggregates WHERE user_id = ?", (user_id,)
+    ).fetchall())
+    conn.close()
+    cs2 = app_module._game_catalog.resolve("cs2.exe")
+    assert stats == (3600, 1)
+    assert history == [(cs2, 3600)]
+    # The first poll only sees the games; the launcher is not charged next to CS2
+    assert per_game == {cs2: 3600 - app_module.MONITOR_POLL_SECONDS}
+
+
+def _per_game(app_module, user_id):
+    conn = shards.connect(app_module.DB_NAME, user_id)
+    per_game = dict(conn.execute(
+        "SELECT game_id, total_seconds FROM game_aggregates WHERE user_id = ?", (user_id,)
+    ).fetchall())
+    conn.close()
+    return per_game
+
+
+def test_recovered_session_keeps_the_game_split(app_module, user_id, simulated_monitor):
+    clock, processes = simulated_monitor
+    processes += ["cs2.exe", "dota2.exe"]
+    app_module._monitor_start(user_id)
+    for _ in range(int(1200 / app_module.MONITOR_POLL_SECONDS)):
+        clock.advance(app_module.MONITOR_POLL_SECONDS)
+        app_module._monitor_detection_step()
+
+    # The process dies: live state is gone, the journal row is left behind
+    def crash(state):
+        state.update(running=False, started_at=None, elapsed_seconds=0.0, user_id=None, session_games={})
+
+    app_module._monitor_state.update(crash)
+    app_module._recover_orphaned_sessions()
+
+    cs2, dota2 = app_module._game_catalog.resolve("cs2.exe"), app_module._game_catalog.resolve("dota2.exe")
+    per_game = _per_game(app_module, user_id)
+    assert set(per_game) == {cs2, dota2}
+    assert per_game[cs2] == per_game[dota2] > 500
+
+
+def test_spooled_session_keeps_the_game_split(app_module, user_id):
+    event = new_session_event(user_id, "cs2.exe", 1200, time.time(), games={"cs2.exe": 800, "dota2.exe": 400})
+    app_module._store_events([event])
+
+    cs2, dota2 = app_module._game_catalog.resolve("cs2.exe"), app_module._game_catalog.resolve("dota2.exe")
+    assert _per_game(app_module, user_id) == {cs2: 800, dota2: 400}
+    conn = shards.connect(app_module.DB_NAME, user_id)
+    assert conn.execute("SELECT game_id, play_seconds FROM game_history WHERE user_id = ?", (user_id,)).fetchall() == [
+        (cs2, 1200)
+    ]
+    conn.close()
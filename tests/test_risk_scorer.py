@@ -0,0 +1,51 @@
+import os
+import time
+
+from model import DatabaseRiskScorer, RollingRiskScorer
+
+DAY = 24 * 3600
+
+
+def test_late_sessions_are_placed_by_end_time():
+    now = 1_700_000_000
+    scorer = RollingRiskScorer()
+    scorer.record_session(1, 600, now)
+    scorer.record_session(1, 300, now - 2 * DAY)  # replayed from a spool
+    scorer.record_session(1, 900, now - 40 * DAY)  # older than every window
+
+    windows = scorer.get_windows(1, now)
+    assert (windows["24h"]["play_seconds"], windows["24h"]["session_count"]) == (600, 1)
+    assert (windows["7d"]["play_seconds"], windows["7d"]["session_count"]) == (900, 2)
+    assert windows["30d"]["session_count"] == 2
+
+    # Expiry still drops the oldest sessions first after the late insert
+    windows = scorer.get_windows(1, now + DAY + 1)
+    assert windows["24h"]["session_count"] == 0
+    assert windows["7d"]["session_count"] == 2
+    windows = scorer.get_windows(1, now + 5 * DAY + 1)
+    assert (windows["7d"]["play_seconds"], windows["7d"]["session_count"]) == (600, 1)
+
+
+def test_scorer_is_per_process_only_with_the_memory_backend(app_module):
+    backend = os.environ.get("MONITOR_STATE_BACKEND", "memory")
+    expected = RollingRiskScorer if backend == "memory" else DatabaseRiskScorer
+    assert type(app_module._risk_scorer) is expected
+
+
+def test_database_scorer_reads_game_history(app_module, user_id):
+    from monitor_core import record_session
+    import shards
+
+    def utc(seconds_ago):
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() - seconds_ago))
+
+    game_id = app_module._game_catalog.resolve("minecraft.exe")
+    conn = shards.connect(app_module.DB_NAME, user_id)
+    record_session(conn, user_id, 1800, game_id, utc(60))
+    record_session(conn, user_id, 600, game_id, utc(3 * DAY))
+    conn.commit()
+    conn.close()
+
+    windows = DatabaseRiskScorer(app_module.DB_NAME).get_windows(user_id)
+    assert (windows["24h"]["play_seconds"], windows["24h"]["session_count"]) == (1800, 1)
+    assert (windows["7d"]["play_seconds"], windows["7d"]["session_count"]) == (2400, 2)
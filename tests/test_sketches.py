@@ -0,0 +1,35 @@
+import sqlite3
+
+from sketches import PopulationSketches
+
+
+def _stored(db_name):
+    conn = sqlite3.connect(db_name)
+    rows = dict(conn.execute("SELECT name, payload FROM quantile_sketches").fetchall())
+    conn.close()
+    return rows
+
+
+def test_record_does_not_write_and_workers_flush_without_losing_updates(app_module, user_id):
+    other_id = user_id + 1000
+    first, second = PopulationSketches(app_module.DB_NAME), PopulationSketches(app_module.DB_NAME)
+    first.load()
+    second.load()
+    sessions_before = first.session_length.count
+    stored_before = _stored(app_module.DB_NAME)
+
+    first.record_session(user_id, 600)
+    second.record_session(other_id, 1200)
+    assert _stored(app_module.DB_NAME) == stored_before
+
+    assert first.flush() == 1
+    assert second.flush() == 1
+    assert second.session_length.count == sessions_before + 2
+    assert second._user_sessions[user_id].count == 1  # merged in by the other worker
+
+    restarted = PopulationSketches(app_module.DB_NAME)
+    restarted.load()
+    assert restarted.session_length.count == sessions_before + 2
+    assert restarted._user_sessions[user_id].count == 1
+    assert restarted._user_sessions[other_id].count == 1
+    assert restarted.user_percentiles(other_id)["today_play_seconds"] == 1200
@@ -0,0 +1,103 @@
+import json
+import time
+
+import pytest
+
+from spool import HEADER_SIZE, RECORD, EventSpool
+
+
+def _event(number):
+    return {"event_id": f"e{number:03d}", "user_id": 1, "play_seconds": number}
+
+
+def _record_size(event):
+    return RECORD.size + len(json.dumps(event, separators=(",", ":")))
+
+
+@pytest.fixture
+def spool_path(tmp_path):
+    return str(tmp_path / "events.bin")
+
+
+def test_ring_wraps_around_and_drops_oldest_when_full(spool_path):
+    size = _record_size(_event(0))
+    spool = EventSpool(spool_path, capacity_bytes=size * 4 + size // 2)
+
+    for number in range(3):
+        spool.append(_event(number))
+    assert spool.replay(lambda events: None, batch_size=2, max_batches=1)["events"] == 2
+    # e003 still fits before the end of the data region, e004 wraps to its start
+    for number in range(3, 6):
+        spool.append(_event(number))
+    assert spool.tail // spool.capacity == spool.head // spool.capacity + 1
+    assert [event["event_id"] for event in spool.peek()[0]] == ["e002", "e003", "e004", "e005"]
+
+    spool.append(_event(6))  # full: the oldest event makes room
+    assert [event["event_id"] for event in spool.peek()[0]] == ["e003", "e004", "e005", "e006"]
+    assert spool.stats()["dropped_events"] == 1
+    spool.close()
+
+    reopened = EventSpool(spool_path)
+    assert [event["event_id"] for event in reopened.peek()[0]] == ["e003", "e004", "e005", "e006"]
+    reopened.close()
+
+
+@pytest.mark.parametrize("damage", ["corrupt", "torn"])
+def test_damaged_tail_is_cut_on_open(spool_path, damage):
+    spool = EventSpool(spool_path, capacity_bytes=4096)
+    for number in range(3):
+        spool.append(_event(number))
+    spool.close()
+
+    last = HEADER_SIZE + 2 * _record_size(_event(0))
+    with open(spool_path, "r+b") as f:
+        if damage == "corrupt":
+            f.seek(last + RECORD.size + 5)
+            f.write(b"X")  # the CRC no longer matches
+        else:
+            f.seek(last)
+            f.write(RECORD.pack(10_000, 0))  # length runs past the header's tail
+
+    reopened = EventSpool(spool_path)
+    assert len(reopened) == 2
+    assert [event["event_id"] for event in reopened.peek()[0]] == ["e000", "e001"]
+    reopened.append(_event(3))  # writing resumes where the good records end
+    assert [event["event_id"] for event in reopened.peek()[0]] == ["e000", "e001", "e003"]
+    reopened.close()
+
+
+def test_failed_replay_keeps_the_batch(spool_path):
+    spool = EventSpool(spool_path, capacity_bytes=4096)
+    for number in range(5):
+        spool.append(_event(number))
+
+    def failing_sink(events):
+        raise OSError("database is locked")
+
+    report = spool.replay(failing_sink, batch_size=2)
+    assert (report["events"], report["error"]) == (0, "database is locked")
+    assert len(spool) == 5
+    assert spool.head == 0
+
+    delivered = []
+    report = spool.replay(delivered.extend, batch_size=2)
+    assert (report["events"], report["batches"], report["error"]) == (5, 3, None)
+    assert [event["event_id"] for event in delivered] == [f"e{number:03d}" for number in range(5)]
+    assert len(spool) == 0
+    spool.close()
+
+
+def test_app_replays_sessions_the_direct_path_would_store(app_module, user_id):
+    import shards
+    from monitor_core import new_session_event
+
+    # Spooled while the database was down: a 30 h session, and one under a second (0 whole seconds)
+    app_module._event_spool.append(new_session_event(user_id, "roblox.exe", 30 * 3600, time.time() - 60))
+    app_module._event_spool.append(new_session_event(user_id, "roblox.exe", 0.4, time.time()))
+    app_module._replay_spool()
+
+    assert len(app_module._event_spool) == 0
+    conn = shards.connect(app_module.DB_NAME, user_id)
+    rows = conn.execute("SELECT play_seconds FROM game_history WHERE user_id = ? ORDER BY id", (user_id,)).fetchall()
+    conn.close()
+    assert rows == [(30 * 3600,), (0,)]